@@ -0,0 +1,38 @@
+from dataclasses import dataclass
+
+import numpy as np
+import numpy.typing as npt
+
+from locast.candle.exchange import Exchange
+from locast.candle.exchange_resolution import ResolutionDetail
+
+
+@dataclass
+class CandleFrame:
+    """
+    Columnar representation of a cluster, ordered newest-first like a retrieved List[Candle].
+
+    started_at holds epoch seconds and trades holds integers. All other columns hold float64 values, or int64
+    fixed point values if scale is set, in which case a value of x represents x / 10**scale.
+    """
+
+    exchange: Exchange
+    market: str
+    resolution: ResolutionDetail
+
+    started_at: npt.NDArray[np.int64]
+
+    open: npt.NDArray[np.float64 | np.int64]
+    high: npt.NDArray[np.float64 | np.int64]
+    low: npt.NDArray[np.float64 | np.int64]
+    close: npt.NDArray[np.float64 | np.int64]
+
+    base_token_volume: npt.NDArray[np.float64 | np.int64]
+    trades: npt.NDArray[np.int64]
+    usd_volume: npt.NDArray[np.float64 | np.int64]
+    starting_open_interest: npt.NDArray[np.float64 | np.int64]
+
+    scale: int | None = None
+
+    def __len__(self) -> int:
+        return len(self.started_at)
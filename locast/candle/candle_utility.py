@@ -1,9 +1,14 @@
 from enum import Enum
-from typing import List, TypeVar
+from typing import List, Tuple, TypeVar
 from zoneinfo import ZoneInfo
 from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import numpy.typing as npt
+
 from locast.candle.candle import Candle
 from locast.candle.exchange_resolution import ResolutionDetail
+from locast.candle.gap import Gap
 
 EnumType = TypeVar("EnumType", bound=Enum)
 
@@ -137,25 +142,135 @@ class CandleUtility:
         candle_dates: List[datetime],
         resolution: ResolutionDetail,
     ) -> List[datetime]:
-        missing: List[datetime] = []
+        # Expects newest-first dates, like find_gaps
+        started_at = np.array([date.timestamp() for date in candle_dates], np.int64)
 
-        if len(candle_dates) <= 1:
-            return missing
-
-        diff_ok = resolution.seconds
-        for i, candle_date in enumerate(candle_dates):
-            if i > 0:
-                new = candle_dates[i - 1]
-                old = candle_date
-                if new - old != diff_ok:
-                    missing_dates = cls.missing_dates_between(
-                        old,
-                        new,
-                        resolution,
-                    )
-                    missing.extend(missing_dates)
+        missing: List[datetime] = []
+        for gap in cls.find_gaps(started_at, resolution):
+            step = timedelta(seconds=resolution.seconds)
+            missing.extend(gap.start + step * i for i in range(gap.count))
         return missing
 
+    @classmethod
+    def find_gaps(
+        cls,
+        started_at: npt.NDArray[np.int64],
+        resolution: ResolutionDetail,
+    ) -> List[Gap]:
+        """
+        Finds the ranges of candles missing in between the given started_at values, in a single vectorized pass.
+
+        Args:
+            started_at (npt.NDArray[np.int64]): Epoch seconds of a cluster's candles, newest-first (like CandleFrame).
+            resolution (ResolutionDetail): The resolution of the candles.
+
+        Returns:
+            List[Gap]: The gaps, newest-first. Candles missing before the oldest or after the newest one are no gap.
+        """
+        steps = started_at[:-1] - started_at[1:]
+        indices = np.flatnonzero(steps > resolution.seconds)
+
+        starts = started_at[indices + 1] + resolution.seconds
+        counts = steps[indices] // resolution.seconds - 1
+        return [
+            Gap(datetime.fromtimestamp(start, timezone.utc), count)
+            for start, count in zip(starts.tolist(), counts.tolist())
+        ]
+
+    @classmethod
+    def resample(
+        cls,
+        candles: List[Candle],
+        resolution: ResolutionDetail,
+    ) -> List[Candle]:
+        """
+        Aggregates candles into candles of a coarser resolution, each starting at a multiple of it (see norm_date).
+        Bucket boundaries are found on int64 epochs and the decimals are reduced per bucket by numpy, which keeps
+        them exact.
+
+        Args:
+            candles (List[Candle]): Newest-first candles of one cluster, in a resolution that divides resolution.
+            resolution (ResolutionDetail): The resolution to aggregate into.
+
+        Returns:
+            List[Candle]: Newest-first candles with open and starting_open_interest of the first, close of the last,
+            the highest high and lowest low of each bucket's candles, and their volumes and trades summed up.
+        """
+        if not candles:
+            return []
+
+        base_resolution = candles[0].resolution
+        assert resolution.seconds % base_resolution.seconds == 0, (
+            f"{resolution.notation} is no multiple of {base_resolution.notation}."
+        )
+
+        oldest_first = candles[::-1]
+        started_at = np.array(
+            [c.started_at.timestamp() for c in oldest_first], np.int64
+        )
+        buckets = started_at - started_at % resolution.seconds
+
+        # Index of the first and the last candle of each bucket
+        firsts = np.flatnonzero(np.diff(buckets, prepend=buckets[0] - 1))
+        lasts = np.append(firsts[1:], len(oldest_first)) - 1
+
+        def column(key: str) -> npt.NDArray[np.object_]:
+            return np.array([getattr(c, key) for c in oldest_first], dtype=object)
+
+        first, last = column("open")[firsts], column("close")[lasts]
+        high = np.maximum.reduceat(column("high"), firsts)
+        low = np.minimum.reduceat(column("low"), firsts)
+        base_token_volume = np.add.reduceat(column("base_token_volume"), firsts)
+        trades = np.add.reduceat(column("trades"), firsts)
+        usd_volume = np.add.reduceat(column("usd_volume"), firsts)
+        open_interest = column("starting_open_interest")[firsts]
+
+        exchange, market = candles[0].exchange, candles[0].market
+        resampled = [
+            Candle(
+                id=None,
+                exchange=exchange,
+                market=market,
+                resolution=resolution,
+                started_at=datetime.fromtimestamp(bucket, timezone.utc),
+                open=first[i],
+                high=high[i],
+                low=low[i],
+                close=last[i],
+                base_token_volume=base_token_volume[i],
+                trades=trades[i],
+                usd_volume=usd_volume[i],
+                starting_open_interest=open_interest[i],
+            )
+            for i, bucket in enumerate(buckets[firsts].tolist())
+        ]
+        return resampled[::-1]
+
+    @classmethod
+    def coalesce_gaps(
+        cls,
+        gaps: List[Gap],
+        resolution: ResolutionDetail,
+        max_size: int,
+    ) -> List[Tuple[datetime, datetime]]:
+        """
+        Coalesces gaps into as few fetch windows as possible. Neighbouring gaps share a window, as long as it spans
+        at most max_size candles (the candles in between are fetched again). Larger gaps get a window of their own.
+
+        Returns:
+            List[Tuple[datetime, datetime]]: The windows as (start_date, end_date) in the sense of fetch_candles,
+            newest-first.
+        """
+        step = timedelta(seconds=resolution.seconds)
+        windows: List[Tuple[datetime, datetime]] = []
+        for gap in sorted(gaps, key=lambda gap: gap.start):
+            end_date = gap.start + step * gap.count
+            if windows and (end_date - windows[-1][0]) // step <= max_size:
+                windows[-1] = (windows[-1][0], end_date)
+            else:
+                windows.append((gap.start, end_date))
+        return windows[::-1]
+
     @classmethod
     def amount_of_candles_in_range(
         cls,
@@ -184,12 +299,9 @@ class CandleUtility:
         end_date: datetime,
         resolution: ResolutionDetail,
     ) -> List[datetime]:
-        missing_dates: List[datetime] = []
-        current_date = start_date + timedelta(seconds=resolution.seconds)
-        while current_date < end_date:
-            missing_dates.append(current_date)
-            current_date += timedelta(seconds=resolution.seconds)
-        return missing_dates
+        step = timedelta(seconds=resolution.seconds)
+        amount = -(-(end_date - start_date) // step)  # Ceiling division
+        return [start_date + step * i for i in range(1, amount)]
 
     @classmethod
     def midpoint(cls, start: datetime, end: datetime) -> datetime:
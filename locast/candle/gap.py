@@ -0,0 +1,12 @@
+from dataclasses import dataclass
+from datetime import datetime
+
+
+@dataclass
+class Gap:
+    """
+    A range of candles missing in a cluster: count candles, of which the oldest would have started at start.
+    """
+
+    start: datetime
+    count: int
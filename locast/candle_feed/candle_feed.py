@@ -0,0 +1,25 @@
+from typing import (
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    List,
+    Protocol,
+    Tuple,
+    runtime_checkable,
+)
+
+from locast.candle.candle import Candle
+from locast.candle.exchange import Exchange
+from locast.candle.exchange_resolution import ResolutionDetail
+
+
+@runtime_checkable
+class CandleFeed(Protocol):
+    @property
+    def exchange(self) -> Exchange: ...
+
+    def stream_closed_candles(
+        self,
+        subscriptions: List[Tuple[str, ResolutionDetail]],
+        on_connect: Callable[[], Awaitable[None]] | None = None,
+    ) -> AsyncIterator[Candle]: ...
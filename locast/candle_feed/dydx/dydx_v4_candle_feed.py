@@ -0,0 +1,145 @@
+import asyncio
+from datetime import timedelta
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Tuple
+
+from dydx_v4_client.indexer.candles_resolution import CandlesResolution  # type: ignore
+from dydx_v4_client.indexer.socket.websocket import IndexerSocket  # type: ignore
+from dydx_v4_client.network import TESTNET  # type: ignore
+
+from locast.candle.candle import Candle
+from locast.candle.dydx.dydx_candle_mapping import DydxV4CandleMapping
+from locast.candle.exchange import Exchange
+from locast.candle.exchange_candle_mapper import ExchangeCandleMapper
+from locast.candle.exchange_resolution import ResolutionDetail
+from locast.candle_feed.candle_feed import CandleFeed
+from locast.candle_feed.exceptions import FeedException
+
+
+class DydxV4CandleFeed(CandleFeed):
+    def __init__(
+        self,
+        url: str = TESTNET.websocket_indexer,
+        reconnect_delay: timedelta = timedelta(seconds=1),
+        ping_interval: timedelta = timedelta(seconds=20),
+    ) -> None:
+        self._exchange = Exchange.DYDX_V4
+        self._url = url
+        self._reconnect_delay = reconnect_delay
+
+        # A connection that stops answering pings is dropped and reestablished like a closed one
+        self._ping_interval = ping_interval
+        self._mapper = ExchangeCandleMapper(DydxV4CandleMapping())
+
+    @property
+    def exchange(self) -> Exchange:
+        return self._exchange
+
+    async def stream_closed_candles(
+        self,
+        subscriptions: List[Tuple[str, ResolutionDetail]],
+        on_connect: Callable[[], Awaitable[None]] | None = None,
+    ) -> AsyncIterator[Candle]:
+        """
+        Streams the candles of many markets and resolutions over one connection to the indexer's websocket, each as
+        soon as it closed, which is once the indexer sends the next candle of its channel. A dropped connection is
+        reestablished, and whenever all channels are subscribed, on_connect is awaited (e.g. to fill the gap since the
+        last connection over REST), before any further candles are streamed.
+
+        Args:
+            subscriptions (List[Tuple[str, ResolutionDetail]]): Pairs of market and resolution to stream candles of.
+            on_connect (Callable[[], Awaitable[None]] | None): Awaited after every (re)connect.
+
+        Yields:
+            Candle: Closed candles of all subscriptions, in the order they closed.
+        """
+        while True:
+            async for candle in self._stream_connection(subscriptions, on_connect):
+                yield candle
+            await asyncio.sleep(self._reconnect_delay.total_seconds())
+
+    async def _stream_connection(
+        self,
+        subscriptions: List[Tuple[str, ResolutionDetail]],
+        on_connect: Callable[[], Awaitable[None]] | None,
+    ) -> AsyncIterator[Candle]:
+        # The socket runs on a thread of its own and hands its messages over to the event loop, ending with None
+        loop = asyncio.get_running_loop()
+        messages: asyncio.Queue[Dict[str, Any] | None] = asyncio.Queue()
+
+        # Subscribes through the socket created below, as its callbacks are typed to receive a plain websocket
+        def on_open(_: Any) -> None:
+            for market, resolution in subscriptions:
+                socket.candles.subscribe(
+                    market,
+                    CandlesResolution(resolution.notation),
+                    batched=False,
+                )
+
+        def on_message(_: Any, message: Dict[str, Any]) -> None:
+            loop.call_soon_threadsafe(messages.put_nowait, message)
+
+        socket = IndexerSocket(self._url, on_open=on_open, on_message=on_message)
+        connection = asyncio.ensure_future(
+            asyncio.to_thread(
+                socket.run_forever,
+                ping_interval=self._ping_interval.total_seconds(),
+                ping_timeout=self._ping_interval.total_seconds() / 2,
+            )
+        )
+        connection.add_done_callback(lambda _: messages.put_nowait(None))
+
+        # The unfinished candle of every channel, which closes once a newer one arrives
+        unfinished: Dict[str, Candle] = {}
+        unsubscribed = {f"{market}/{res.notation}" for market, res in subscriptions}
+
+        # Candles arriving before all channels are subscribed and on_connect returned are held back. Streamed
+        # earlier, they would move the head of their cluster past the gap on_connect is about to fill.
+        held_back: List[Dict[str, Any]] | None = []
+        try:
+            while message := await messages.get():
+                if message["type"] == "error":
+                    raise FeedException(self._exchange, message["message"])
+
+                if message["type"] == "subscribed":
+                    if candles := self._mapper.to_candles(
+                        message["contents"]["candles"]
+                    ):
+                        newest = max(candles, key=lambda candle: candle.started_at)
+                        unfinished[message["id"]] = newest
+
+                    unsubscribed.discard(message["id"])
+                    if not unsubscribed and held_back is not None:
+                        if on_connect:
+                            await on_connect()
+                        for held in held_back:
+                            if closed := self._close_candle(held, unfinished):
+                                yield closed
+                        held_back = None
+
+                elif message["type"] == "channel_data":
+                    if held_back is not None:
+                        held_back.append(message)
+                    elif closed := self._close_candle(message, unfinished):
+                        yield closed
+        finally:
+            # Aborting wakes the socket's thread up, which then tears the connection down. As stopping races with
+            # connecting, it is repeated until the thread is done.
+            while not connection.done():
+                socket.keep_running = False
+                if websocket := socket.sock:
+                    websocket.abort()
+                await asyncio.wait([connection], timeout=0.1)
+
+    def _close_candle(
+        self,
+        message: Dict[str, Any],
+        unfinished: Dict[str, Candle],
+    ) -> Candle | None:
+        # The candle of a message replaces the unfinished one of its channel, which it closes if it started later
+        candle = self._mapper.to_candle(message["contents"])
+        previous = unfinished.get(message["id"])
+        if not previous or previous.started_at <= candle.started_at:
+            unfinished[message["id"]] = candle
+        if previous and previous.started_at < candle.started_at:
+            return previous
+        return None
@@ -0,0 +1,7 @@
+from locast.candle.exchange import Exchange
+
+
+class FeedException(Exception):
+    def __init__(self, exchange: Exchange, message: str) -> None:
+        msg = f"{exchange.name}: Error streaming market data: {message}."
+        super().__init__(msg)
@@ -1,5 +1,5 @@
 from datetime import datetime
-from typing import Protocol, List, runtime_checkable
+from typing import AsyncIterator, Protocol, List, runtime_checkable
 
 from locast.candle.candle import Candle
 from locast.candle.exchange import Exchange
@@ -32,8 +32,17 @@ class CandleFetcher(Protocol):
         start_date: datetime,
     ) -> List[Candle]: ...
 
+    def stream_candles(
+        self,
+        market: str,
+        resolution: ResolutionDetail,
+        start_date: datetime,
+        end_date: datetime | None = None,
+    ) -> AsyncIterator[List[Candle]]: ...
+
     async def find_horizon(
         self,
         market: str,
         resolution: ResolutionDetail,
+        hint: datetime | None = None,
     ) -> datetime: ...
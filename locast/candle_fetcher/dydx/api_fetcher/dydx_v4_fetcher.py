@@ -1,6 +1,7 @@
 from datetime import datetime
 from typing import Any, Dict, List
 
+import httpx
 from dydx_v4_client.indexer.rest.indexer_client import IndexerClient  # type: ignore
 from dydx_v4_client.network import TESTNET  # type: ignore
 
@@ -16,15 +17,18 @@ from locast.candle_fetcher.dydx.api_fetcher.datetime_format import (
 )
 from locast.candle_fetcher.dydx.api_fetcher.dydx_fetcher import DydxFetcher
 from locast.candle_fetcher.exceptions import APIException
+from locast.candle_fetcher.request_scheduler import RequestScheduler
 
 
 class DydxV4Fetcher(DydxFetcher):
     def __init__(
         self,
         client: IndexerClient = IndexerClient(TESTNET.rest_indexer),
+        scheduler: RequestScheduler | None = None,
     ) -> None:
         self._exchange = Exchange.DYDX_V4
         self._client = client
+        self._scheduler = scheduler
         self._mapper = ExchangeCandleMapper(DydxV4CandleMapping())
 
     @property
@@ -38,18 +42,27 @@ class DydxV4Fetcher(DydxFetcher):
         start_date: datetime,
         end_date: datetime,
     ) -> List[Candle]:
-        try:
-            response: Dict[
-                str,
-                Any,
-            ] = await self._client.markets.get_perpetual_market_candles(  # type: ignore
+        async def request() -> Dict[str, Any]:
+            return await self._client.markets.get_perpetual_market_candles(  # type: ignore
                 market=market,
                 resolution=resolution.notation,
                 from_iso=datetime_to_dydx_iso_str(start_date),
                 to_iso=datetime_to_dydx_iso_str(end_date),
             )
 
+        try:
+            if self._scheduler:
+                response = await self._scheduler.schedule(request, self._is_retryable)
+            else:
+                response = await request()
+
         except Exception as e:
             raise APIException(self._exchange, market, resolution, e) from e
 
         return self._mapper.to_candles(response["candles"])
+
+    def _is_retryable(self, exception: Exception) -> bool:
+        if isinstance(exception, httpx.HTTPStatusError):
+            status_code = exception.response.status_code
+            return status_code == 429 or status_code >= 500
+        return isinstance(exception, httpx.TransportError)
@@ -1,5 +1,8 @@
-from datetime import datetime
-from typing import List
+import asyncio
+from collections import deque
+from contextlib import AbstractAsyncContextManager, nullcontext
+from datetime import datetime, timedelta
+from typing import Any, AsyncIterator, Deque, Iterator, List, Tuple
 
 
 from locast.candle.candle import Candle
@@ -14,10 +17,23 @@ from locast.logging_functions import log_missing_candles, log_progress
 
 
 class DydxCandleFetcher(CandleFetcher):
-    def __init__(self, api_fetcher: DydxFetcher, log_progress: bool = False) -> None:
+    def __init__(
+        self,
+        api_fetcher: DydxFetcher,
+        log_progress: bool = False,
+        max_in_flight: int | None = None,
+        page_size: int = 1000,
+        horizon_search_width: int = 1,
+        window_concurrency: int = 1,
+    ) -> None:
         self._log_progress = log_progress
         self._exchange = api_fetcher.exchange
         self._fetcher = api_fetcher
+        self._horizon_search_width = 1
+        self.max_in_flight = max_in_flight
+        self.window_concurrency = window_concurrency
+        self._page_size = page_size
+        self.horizon_search_width = horizon_search_width
 
     @property
     def exchange(self) -> Exchange:
@@ -31,6 +47,44 @@ class DydxCandleFetcher(CandleFetcher):
     def log_progress(self, value: bool) -> None:
         self._log_progress = value
 
+    @property
+    def max_in_flight(self) -> int | None:
+        return self._max_in_flight
+
+    @max_in_flight.setter
+    def max_in_flight(self, value: int | None) -> None:
+        assert value is None or value >= 1, "max_in_flight must be at least 1."
+        assert value is None or value >= self._horizon_search_width, (
+            "max_in_flight must not be below horizon_search_width."
+        )
+        self._max_in_flight = value
+        # Shared by all calls on this fetcher, so concurrent clusters draw from one request budget (if any)
+        self._in_flight: AbstractAsyncContextManager[Any] = (
+            asyncio.Semaphore(value) if value else nullcontext()
+        )
+
+    @property
+    def window_concurrency(self) -> int:
+        return self._window_concurrency
+
+    @window_concurrency.setter
+    def window_concurrency(self, value: int) -> None:
+        assert value >= 1, "window_concurrency must be at least 1."
+        self._window_concurrency = value
+
+    @property
+    def horizon_search_width(self) -> int:
+        return self._horizon_search_width
+
+    @horizon_search_width.setter
+    def horizon_search_width(self, value: int) -> None:
+        assert value >= 1, "horizon_search_width must be at least 1."
+        # Probes beyond the request budget would wait on each other, making the search slower than a binary one
+        assert self._max_in_flight is None or value <= self._max_in_flight, (
+            "horizon_search_width must not exceed max_in_flight."
+        )
+        self._horizon_search_width = value
+
     async def fetch_candles(
         self,
         market: str,
@@ -53,52 +107,16 @@ class DydxCandleFetcher(CandleFetcher):
         Note: This function does not guarantee its returned candles to be reaching to the most recent existing candle on the exchange.
         It simply fetches candles making up the range between the provided start_date and end_date. If this takes longer than newer
         candles to be created on the exchange, those candles will not be fetched.
+        If window_concurrency is greater than 1, the range is split into page sized windows which are fetched concurrently.
         """
         candles: List[Candle] = []
-        temp_end_date = end_date
-        total = cu.amount_of_candles_in_range(start_date, end_date, resolution)
-        done = 0
-        total_missing_candles: List[datetime] = []
-
-        try:
-            while (not candles) or candles[-1].started_at > start_date:
-                candle_batch: List[Candle] = await self._fetcher.fetch(
-                    market,
-                    resolution,
-                    start_date,
-                    temp_end_date,
-                )
-
-                if not candle_batch:
-                    break
-
-                prev_oldest_date = candles[-1].started_at if candles else end_date
-
-                if missing_in_batch := self._detect_missing_in_batch(
-                    candle_batch,
-                    prev_oldest_date,
-                ):
-                    total -= len(missing_in_batch)
-                    total_missing_candles.extend(missing_in_batch)
-
-                if self._log_progress:
-                    done += len(candle_batch)
-                    log_progress("🚛", market, "candles", "fetched", done, total)
-
-                candles.extend(candle_batch)
-                temp_end_date = candles[-1].started_at
-
-            if total_missing_candles:
-                log_missing_candles(
-                    "🚨",
-                    self._exchange,
-                    market,
-                    resolution,
-                    total_missing_candles,
-                )
-
-        except Exception as e:
-            raise APIException(self._exchange, market, resolution, e) from e
+        async for candle_batch in self._stream_range(
+            market,
+            resolution,
+            start_date,
+            end_date,
+        ):
+            candles.extend(candle_batch)
 
         return candles
 
@@ -150,60 +168,393 @@ class DydxCandleFetcher(CandleFetcher):
 
         return candles
 
-    async def find_horizon(self, market: str, resolution: ResolutionDetail) -> datetime:
-        now = cu.normalized_now(resolution)
-        step = 1000
-        upper_bound = now
-        lower_bound = None
+    async def stream_candles(
+        self,
+        market: str,
+        resolution: ResolutionDetail,
+        start_date: datetime,
+        end_date: datetime | None = None,
+    ) -> AsyncIterator[List[Candle]]:
+        """
+        Streams a cluster of candles ranging from a given start date up to the most recently finished candle,
+        page by page as they arrive from the exchange.
 
-        # First: Exponential Back-Off Search to quickly reach over the horizon (datetime at which exchange does not provide data)
-        while True:
-            back_n = cu.subtract_n_resolutions(now, resolution, step)
-            back_n_plus_resolution = cu.add_one_resolution(back_n, resolution)
+        Args:
+            market (str): The market to fetch candles for.
+            resolution (str): The resolution of the candles to fetch.
+            start_date (datetime): The start date of the time range (the started_at value of the oldest candle in the range).
+            end_date (datetime | None): If provided, only the fixed range between start_date and end_date is streamed.
+
+        Yields:
+            List[Candle]: Pages of newest-first candles. Pages of the first pass reach back to the start date, later
+            passes only deliver the candles that finished while the previous pass was running.
+        """
+        if end_date:
+            async for candle_batch in self._stream_range(
+                market,
+                resolution,
+                start_date,
+                end_date,
+            ):
+                yield candle_batch
+            return
+
+        newest_started_at: datetime | None = None
+
+        temp_start_date = start_date
+        temp_norm_now = cu.normalized_now(resolution)
+        temp_now_minus_res = cu.subtract_n_resolutions(temp_norm_now, resolution, 1)
+        while (not newest_started_at) or newest_started_at < temp_now_minus_res:
+            async for candle_batch in self._stream_range(
+                market,
+                resolution,
+                temp_start_date,
+                temp_norm_now,
+            ):
+                batch_newest = candle_batch[0].started_at
+                if (not newest_started_at) or batch_newest > newest_started_at:
+                    newest_started_at = batch_newest
+                yield candle_batch
+
+            if not newest_started_at:
+                return
+
+            # Update input for next iteration
+            temp_start_date = cu.add_one_resolution(newest_started_at, resolution)
+            temp_norm_now = cu.normalized_now(resolution)
+            temp_now_minus_res = cu.subtract_n_resolutions(temp_norm_now, resolution, 1)
 
-            # Query single candle
-            candle = await self._fetcher.fetch(
+    async def find_horizon(
+        self,
+        market: str,
+        resolution: ResolutionDetail,
+        hint: datetime | None = None,
+    ) -> datetime:
+        """
+        Finds the started_at date of the oldest candle the exchange provides for a market and resolution.
+
+        Args:
+            market (str): The market to find the horizon for.
+            resolution (ResolutionDetail): The resolution to find the horizon for.
+            hint (datetime | None): A date close to the horizon, e.g. the horizon of the same market at another
+            resolution. If provided, the search starts at the hint instead of reaching back from now.
+
+        Returns:
+            datetime: The started_at date of the oldest available candle.
+
+        Note: If horizon_search_width is greater than 1, every search step probes that many dates at once (k-ary search).
+        Probes draw from the max_in_flight budget (if set), which therefore has to be at least horizon_search_width.
+        """
+        if hint:
+            lower_bound, upper_bound = await self._bracket_horizon_around(
                 market,
                 resolution,
-                back_n,
-                back_n_plus_resolution,
+                hint,
             )
-            if candle:
-                # Candle still exists, continue back-off
-                upper_bound = back_n  # Move the upper bound further back
-                step *= 2
-            else:
-                # Reached over the horizon, candle does not exist
-                lower_bound = back_n  # Set this as the lower bound
-                break
-
-        # Second: Binary Search within the determined range
+        else:
+            lower_bound, upper_bound = await self._bracket_horizon_from_now(
+                market,
+                resolution,
+            )
+
+        # k-ary Search within the determined range (binary search for a width of 1)
         delta = upper_bound - lower_bound
         while delta.total_seconds() > resolution.seconds:
-            mid_point = cu.norm_date(cu.midpoint(lower_bound, upper_bound), resolution)
-            mid_point_plus_resolution = cu.add_one_resolution(mid_point, resolution)
-
-            # Query single candle
-            candle = await self._fetcher.fetch(
-                market, resolution, mid_point, mid_point_plus_resolution
-            )
-            if candle:
-                # Move the upper bound down (closer to the lower bound)
-                upper_bound = mid_point
-            else:
+            points = self._split_points(lower_bound, upper_bound, resolution)
+            for point, exists in zip(
+                points,
+                await self._candles_exist(market, resolution, points),
+            ):
+                if exists:
+                    # Move the upper bound down (closer to the lower bound)
+                    upper_bound = point
+                    break
                 # Move the lower bound up (closer to the upper bound)
-                lower_bound = mid_point
+                lower_bound = point
 
             delta = upper_bound - lower_bound
 
         # Finally: Fetch to confirm the oldest available candle
         upper_bound_plus_resolution = cu.add_one_resolution(upper_bound, resolution)
-        final_candle = await self._fetcher.fetch(
+        final_candle = await self._fetch(
             market, resolution, upper_bound, upper_bound_plus_resolution
         )
 
         return final_candle[0].started_at
 
+    async def _bracket_horizon_from_now(
+        self,
+        market: str,
+        resolution: ResolutionDetail,
+    ) -> Tuple[datetime, datetime]:
+        now = cu.normalized_now(resolution)
+        step = 1000
+        upper_bound = now
+
+        # Exponential Back-Off Search to quickly reach over the horizon (datetime at which exchange does not provide data)
+        while True:
+            steps = self._exponential_steps(step)
+            points = [cu.subtract_n_resolutions(now, resolution, n) for n in steps]
+
+            for point, exists in zip(
+                points,
+                await self._candles_exist(market, resolution, points),
+            ):
+                if not exists:
+                    # Reached over the horizon, candle does not exist
+                    return point, upper_bound
+                # Candle still exists, continue back-off
+                upper_bound = point  # Move the upper bound further back
+
+            step = steps[-1] * 2
+
+    async def _bracket_horizon_around(
+        self,
+        market: str,
+        resolution: ResolutionDetail,
+        hint: datetime,
+    ) -> Tuple[datetime, datetime]:
+        # The horizon is expected close to the hint, so the search gallops away from it in steps of 1, 2, 4, ...
+        now = cu.normalized_now(resolution)
+        anchor = min(cu.norm_date(hint, resolution), now)
+        step = 1
+
+        if (await self._candles_exist(market, resolution, [anchor]))[0]:
+            # Anchor lies after the horizon, gallop backwards
+            upper_bound = anchor
+            while True:
+                steps = self._exponential_steps(step)
+                points = [
+                    cu.subtract_n_resolutions(anchor, resolution, n) for n in steps
+                ]
+                for point, exists in zip(
+                    points,
+                    await self._candles_exist(market, resolution, points),
+                ):
+                    if not exists:
+                        return point, upper_bound
+                    upper_bound = point
+                step = steps[-1] * 2
+
+        # Anchor lies before the horizon, gallop forwards
+        lower_bound = anchor
+        while True:
+            steps = self._exponential_steps(step)
+            points = [
+                min(anchor + timedelta(seconds=resolution.seconds * n), now)
+                for n in steps
+            ]
+            points = sorted(set(points))
+
+            # Now is the newest candle there is, so it serves as upper bound without being probed
+            probed = [point for point in points if point < now]
+            for point, exists in zip(
+                probed,
+                await self._candles_exist(market, resolution, probed),
+            ):
+                if exists:
+                    return lower_bound, point
+                lower_bound = point
+
+            if points[-1] == now:
+                return lower_bound, now
+            step = steps[-1] * 2
+
+    async def _candles_exist(
+        self,
+        market: str,
+        resolution: ResolutionDetail,
+        started_ats: List[datetime],
+    ) -> List[bool]:
+        # Query single candles, all of them at once
+        candles = await asyncio.gather(
+            *(
+                self._fetch(
+                    market,
+                    resolution,
+                    started_at,
+                    cu.add_one_resolution(started_at, resolution),
+                )
+                for started_at in started_ats
+            )
+        )
+        return [bool(candle) for candle in candles]
+
+    def _exponential_steps(self, step: int) -> List[int]:
+        return [step * 2**i for i in range(self._horizon_search_width)]
+
+    def _split_points(
+        self,
+        lower_bound: datetime,
+        upper_bound: datetime,
+        resolution: ResolutionDetail,
+    ) -> List[datetime]:
+        # Splits the range into horizon_search_width + 1 parts. The last point is at least one resolution above the
+        # lower bound, since bounds are normalized and more than one resolution apart.
+        parts = self._horizon_search_width + 1
+        points = {
+            cu.norm_date(
+                lower_bound + (upper_bound - lower_bound) * i / parts, resolution
+            )
+            for i in range(1, parts)
+        }
+        return sorted(point for point in points if lower_bound < point < upper_bound)
+
+    async def _stream_range(
+        self,
+        market: str,
+        resolution: ResolutionDetail,
+        start_date: datetime,
+        end_date: datetime,
+    ) -> AsyncIterator[List[Candle]]:
+        total = cu.amount_of_candles_in_range(start_date, end_date, resolution)
+        done = 0
+        total_missing_candles: List[datetime] = []
+        prev_oldest_date = end_date
+
+        if self._window_concurrency > 1:
+            candle_batches = self._fetch_windows(
+                market, resolution, start_date, end_date
+            )
+        else:
+            candle_batches = self._fetch_pages(market, resolution, start_date, end_date)
+
+        try:
+            async for candle_batch in candle_batches:
+                if missing_in_batch := self._detect_missing_in_batch(
+                    candle_batch,
+                    prev_oldest_date,
+                ):
+                    total -= len(missing_in_batch)
+                    total_missing_candles.extend(missing_in_batch)
+
+                if self._log_progress:
+                    done += len(candle_batch)
+                    log_progress("🚛", market, "candles", "fetched", done, total)
+
+                prev_oldest_date = candle_batch[-1].started_at
+                yield candle_batch
+
+            if total_missing_candles:
+                log_missing_candles(
+                    "🚨",
+                    self._exchange,
+                    market,
+                    resolution,
+                    total_missing_candles,
+                )
+
+        except Exception as e:
+            raise APIException(self._exchange, market, resolution, e) from e
+
+    async def _fetch_pages(
+        self,
+        market: str,
+        resolution: ResolutionDetail,
+        start_date: datetime,
+        end_date: datetime,
+    ) -> AsyncIterator[List[Candle]]:
+        temp_end_date = end_date
+
+        while temp_end_date > start_date:
+            candle_batch: List[Candle] = await self._fetch(
+                market,
+                resolution,
+                start_date,
+                temp_end_date,
+            )
+
+            if not candle_batch:
+                return
+
+            yield candle_batch
+            temp_end_date = candle_batch[-1].started_at
+
+    async def _fetch_windows(
+        self,
+        market: str,
+        resolution: ResolutionDetail,
+        start_date: datetime,
+        end_date: datetime,
+    ) -> AsyncIterator[List[Candle]]:
+        windows = self._split_into_windows(start_date, end_date, resolution)
+        pending: Deque[Tuple[datetime, asyncio.Task[List[Candle]]]] = deque()
+
+        def schedule_windows() -> None:
+            # Keep at most window_concurrency windows in flight, newest window first.
+            while len(pending) < self._window_concurrency:
+                if not (window := next(windows, None)):
+                    return
+                window_start, window_end = window
+                task = asyncio.ensure_future(
+                    self._fetch_window(market, resolution, window_start, window_end)
+                )
+                pending.append((window_start, task))
+
+        try:
+            schedule_windows()
+            while pending:
+                # Windows are consumed in the order they were scheduled, which keeps candles newest-first.
+                window_start, task = pending.popleft()
+                window_candles = await task
+
+                if not window_candles:
+                    # An empty window is either a hole in the history or lies beyond the horizon, only candles
+                    # older than the window tell them apart.
+                    if window_start <= start_date or not await self._fetch(
+                        market, resolution, start_date, window_start
+                    ):
+                        return
+                else:
+                    yield window_candles
+                schedule_windows()
+
+        finally:
+            for _, task in pending:
+                task.cancel()
+
+    async def _fetch_window(
+        self,
+        market: str,
+        resolution: ResolutionDetail,
+        start_date: datetime,
+        end_date: datetime,
+    ) -> List[Candle]:
+        # A window usually fits into one page, but the exchange may still respond with smaller pages.
+        candles: List[Candle] = []
+        async for candle_batch in self._fetch_pages(
+            market,
+            resolution,
+            start_date,
+            end_date,
+        ):
+            candles.extend(candle_batch)
+
+        return candles
+
+    async def _fetch(
+        self,
+        market: str,
+        resolution: ResolutionDetail,
+        start_date: datetime,
+        end_date: datetime,
+    ) -> List[Candle]:
+        async with self._in_flight:
+            return await self._fetcher.fetch(market, resolution, start_date, end_date)
+
+    def _split_into_windows(
+        self,
+        start_date: datetime,
+        end_date: datetime,
+        resolution: ResolutionDetail,
+    ) -> Iterator[Tuple[datetime, datetime]]:
+        window_span = timedelta(seconds=resolution.seconds * self._page_size)
+        window_end = end_date
+        while window_end > start_date:
+            window_start = max(start_date, window_end - window_span)
+            yield window_start, window_end
+            window_end = window_start
+
     def _detect_missing_in_batch(
         self,
         candle_batch: List[Candle],
@@ -0,0 +1,101 @@
+import asyncio
+import random
+import time
+from typing import Awaitable, Callable, TypeVar
+
+
+T = TypeVar("T")
+
+
+class RequestScheduler:
+    """
+    Token bucket scheduler for API requests, meant to be shared by all fetchers talking to the same backend.
+    Retryable errors (e.g. HTTP 429 & 5xx) are retried with jittered exponential backoff. The request rate adapts
+    additively increasing while requests are fast and successful and multiplicatively decreasing on errors or
+    slow responses, so throughput converges to what the backend permits.
+    """
+
+    def __init__(
+        self,
+        rate: float = 10.0,
+        min_rate: float = 1.0,
+        max_rate: float = 100.0,
+        burst: int = 10,
+        max_retries: int = 5,
+        backoff_base: float = 0.5,
+        backoff_cap: float = 30.0,
+        latency_target: float = 1.0,
+    ) -> None:
+        assert 0 < min_rate <= rate <= max_rate, (
+            "Rates must satisfy 0 < min <= rate <= max."
+        )
+        self._rate = rate
+        self._min_rate = min_rate
+        self._max_rate = max_rate
+        self._burst = burst
+        self._max_retries = max_retries
+        self._backoff_base = backoff_base
+        self._backoff_cap = backoff_cap
+        self._latency_target = latency_target
+
+        self._tokens = float(burst)
+        self._last_refill = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    @property
+    def rate(self) -> float:
+        return self._rate
+
+    async def schedule(
+        self,
+        request: Callable[[], Awaitable[T]],
+        is_retryable: Callable[[Exception], bool],
+    ) -> T:
+        attempt = 0
+        while True:
+            await self._acquire()
+            started = time.monotonic()
+            try:
+                result = await request()
+            except Exception as e:
+                if not is_retryable(e) or attempt >= self._max_retries:
+                    raise
+                self._decrease_rate(0.5)
+                await asyncio.sleep(self._backoff(attempt))
+                attempt += 1
+                continue
+
+            if time.monotonic() - started > self._latency_target:
+                self._decrease_rate(0.9)
+            else:
+                self._increase_rate()
+            return result
+
+    async def _acquire(self) -> None:
+        async with self._lock:
+            while True:
+                self._refill()
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self._rate)
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(
+            self._burst,
+            self._tokens + (now - self._last_refill) * self._rate,
+        )
+        self._last_refill = now
+
+    def _increase_rate(self) -> None:
+        self._rate = min(self._max_rate, self._rate + 1)
+
+    def _decrease_rate(self, factor: float) -> None:
+        self._rate = max(self._min_rate, self._rate * factor)
+
+    def _backoff(self, attempt: int) -> float:
+        # Full jitter keeps retrying clients from hitting the backend in lockstep
+        return random.uniform(
+            0, min(self._backoff_cap, self._backoff_base * 2**attempt)
+        )
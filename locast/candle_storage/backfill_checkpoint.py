@@ -0,0 +1,9 @@
+from dataclasses import dataclass
+from datetime import datetime
+
+
+@dataclass
+class BackfillCheckpoint:
+    start_date: datetime
+    oldest_started_at: datetime
+    updated_at: datetime
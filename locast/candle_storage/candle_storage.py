@@ -1,13 +1,32 @@
+from datetime import datetime
 from typing import List, Protocol
 
+import numpy as np
+import numpy.typing as npt
+
 from locast.candle.candle import Candle
+from locast.candle.candle_frame import CandleFrame
 from locast.candle.exchange import Exchange
 from locast.candle.exchange_resolution import ResolutionDetail
+from locast.candle.gap import Gap
+from locast.candle_storage.backfill_checkpoint import BackfillCheckpoint
 from locast.candle_storage.cluster_info import ClusterInfo
+from locast.candle_storage.market_horizon import MarketHorizon
+from locast.candle_storage.on_conflict import OnConflict
 
 
 class CandleStorage(Protocol):
-    async def store_candles(self, candles: List[Candle]) -> None: ...
+    async def store_candles(
+        self,
+        candles: List[Candle],
+        on_conflict: OnConflict | None = None,
+    ) -> None: ...
+
+    async def store_clusters(
+        self,
+        clusters: List[List[Candle]],
+        on_conflict: OnConflict | List[OnConflict | None] | None = None,
+    ) -> None: ...
 
     async def retrieve_cluster(
         self,
@@ -16,6 +35,21 @@ class CandleStorage(Protocol):
         resolution: ResolutionDetail,
     ) -> List[Candle]: ...
 
+    async def retrieve_cluster_frame(
+        self,
+        exchange: Exchange,
+        market: str,
+        resolution: ResolutionDetail,
+        scale: int | None = None,
+    ) -> CandleFrame: ...
+
+    async def retrieve_started_at(
+        self,
+        exchange: Exchange,
+        market: str,
+        resolution: ResolutionDetail,
+    ) -> npt.NDArray[np.int64]: ...
+
     async def retrieve_newest_candles(
         self,
         exchange: Exchange,
@@ -24,6 +58,15 @@ class CandleStorage(Protocol):
         amount: int,
     ) -> List[Candle]: ...
 
+    async def retrieve_segment(
+        self,
+        exchange: Exchange,
+        market: str,
+        resolution: ResolutionDetail,
+        start_date: datetime,
+        end_date: datetime,
+    ) -> List[Candle]: ...
+
     async def delete_cluster(
         self,
         exchange: Exchange,
@@ -31,9 +74,75 @@ class CandleStorage(Protocol):
         resolution: ResolutionDetail,
     ) -> None: ...
 
+    async def trim_cluster(
+        self,
+        exchange: Exchange,
+        market: str,
+        resolution: ResolutionDetail,
+        before: datetime,
+    ) -> None: ...
+
     async def get_cluster_info(
         self,
         exchange: Exchange,
         market: str,
         resolution: ResolutionDetail,
     ) -> ClusterInfo: ...
+
+    async def store_checkpoint(
+        self,
+        exchange: Exchange,
+        market: str,
+        resolution: ResolutionDetail,
+        checkpoint: BackfillCheckpoint,
+    ) -> None: ...
+
+    async def retrieve_checkpoint(
+        self,
+        exchange: Exchange,
+        market: str,
+        resolution: ResolutionDetail,
+    ) -> BackfillCheckpoint | None: ...
+
+    async def delete_checkpoint(
+        self,
+        exchange: Exchange,
+        market: str,
+        resolution: ResolutionDetail,
+    ) -> None: ...
+
+    async def store_unfillable_gaps(
+        self,
+        exchange: Exchange,
+        market: str,
+        resolution: ResolutionDetail,
+        gaps: List[Gap],
+    ) -> None: ...
+
+    async def retrieve_unfillable_gaps(
+        self,
+        exchange: Exchange,
+        market: str,
+        resolution: ResolutionDetail,
+    ) -> List[Gap]: ...
+
+    async def store_horizon(
+        self,
+        exchange: Exchange,
+        market: str,
+        resolution: ResolutionDetail,
+        horizon: MarketHorizon,
+    ) -> None: ...
+
+    async def retrieve_horizon(
+        self,
+        exchange: Exchange,
+        market: str,
+        resolution: ResolutionDetail,
+    ) -> MarketHorizon | None: ...
+
+    async def retrieve_horizons(
+        self,
+        exchange: Exchange,
+        market: str,
+    ) -> List[MarketHorizon]: ...
@@ -0,0 +1,8 @@
+from dataclasses import dataclass
+from datetime import datetime
+
+
+@dataclass
+class MarketHorizon:
+    horizon: datetime
+    found_at: datetime
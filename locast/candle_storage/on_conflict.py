@@ -0,0 +1,7 @@
+from enum import Enum
+
+
+# What storing a candle does, if its cluster already holds a candle with the same started_at
+class OnConflict(Enum):
+    IGNORE = "ignore"  # Keeps the stored candle
+    REPLACE = "replace"  # Overwrites the stored candle with the new one
@@ -0,0 +1,14 @@
+from enum import Enum
+
+
+# How SqliteCandleStorage lays out candles on disk. A database holds its candles in one layout at a time,
+# SqliteCandleStorage.migrate_from moves them from one into the other.
+class CandleLayout(Enum):
+    TEXT = "text"  # Table candle: started_at as ISO text, prices and volumes as decimal strings
+    COMPACT = "compact"  # Table compact_candle: epoch seconds and integers scaled per market (must fit int64)
+    CLUSTERED = "clustered"  # Table clustered_candle: like COMPACT, but stored in order of series and time
+
+    @property
+    def is_compact(self) -> bool:
+        # Whether candles are stored as integers only
+        return self is not CandleLayout.TEXT
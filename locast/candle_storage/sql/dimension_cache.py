@@ -0,0 +1,101 @@
+from threading import RLock
+from typing import Dict, Tuple
+
+from sqlmodel import Session, select
+
+from locast.candle.exchange import Exchange
+from locast.candle.exchange_resolution import ResolutionDetail
+from locast.candle_storage.sql.tables import (
+    SqliteExchange,
+    SqliteMarket,
+    SqliteResolution,
+)
+from locast.candle_storage.sql.table_utility import TableUtility as tu
+
+
+class DimensionCache:
+    """
+    Thread-safe cache of the ids of exchanges, markets and resolutions (the dimensions of a candle).
+
+    All ids are loaded at first use and every inserted dimension is added, so known dimensions need no lookup queries.
+    Unknown dimensions are still looked up in the database, since other processes may have inserted them.
+    """
+
+    def __init__(self) -> None:
+        self._lock = RLock()
+        self._loaded = False
+
+        self._exchange_ids: Dict[Exchange, int] = {}
+        self._market_ids: Dict[str, int] = {}
+        self._resolution_ids: Dict[Tuple[int, str], int] = {}
+
+    def exchange_id(
+        self,
+        exchange: Exchange,
+        session: Session,
+        insert: bool = False,
+    ) -> int | None:
+        with self._lock:
+            self._load(session)
+            if exchange not in self._exchange_ids:
+                sqlite_exchange = (
+                    tu.lookup_or_insert_sqlite_exchange(exchange, session)
+                    if insert
+                    else tu.lookup_sqlite_exchange(exchange, session)
+                )
+                if not sqlite_exchange:
+                    return None
+                self._exchange_ids[exchange] = sqlite_exchange.id
+            return self._exchange_ids[exchange]
+
+    def market_id(
+        self,
+        market: str,
+        session: Session,
+        insert: bool = False,
+    ) -> int | None:
+        with self._lock:
+            self._load(session)
+            if market not in self._market_ids:
+                sqlite_market = (
+                    tu.lookup_or_insert_sqlite_market(market, session)
+                    if insert
+                    else tu.lookup_sqlite_market(market, session)
+                )
+                if not sqlite_market:
+                    return None
+                self._market_ids[market] = sqlite_market.id
+            return self._market_ids[market]
+
+    def resolution_id(
+        self,
+        resolution: ResolutionDetail,
+        session: Session,
+        insert: bool = False,
+    ) -> int | None:
+        key = (resolution.seconds, resolution.notation)
+        with self._lock:
+            self._load(session)
+            if key not in self._resolution_ids:
+                sqlite_resolution = (
+                    tu.lookup_or_insert_sqlite_resolution(resolution, session)
+                    if insert
+                    else tu.lookup_sqlite_resolution(resolution, session)
+                )
+                if not sqlite_resolution:
+                    return None
+                self._resolution_ids[key] = sqlite_resolution.id
+            return self._resolution_ids[key]
+
+    def _load(self, session: Session) -> None:
+        if self._loaded:
+            return
+
+        for sqlite_exchange in session.exec(select(SqliteExchange)).all():
+            self._exchange_ids[sqlite_exchange.exchange] = sqlite_exchange.id
+        for sqlite_market in session.exec(select(SqliteMarket)).all():
+            self._market_ids[sqlite_market.market] = sqlite_market.id
+        for sqlite_resolution in session.exec(select(SqliteResolution)).all():
+            key = (sqlite_resolution.seconds, sqlite_resolution.notation)
+            self._resolution_ids[key] = sqlite_resolution.id
+        self._loaded = True
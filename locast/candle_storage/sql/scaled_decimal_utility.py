@@ -0,0 +1,13 @@
+from decimal import Decimal
+
+
+class ScaledDecimalUtility:
+    @staticmethod
+    def decimal_places(value: Decimal) -> int:
+        # Decimal places as written, trailing zeros included
+        return max(0, -int(value.as_tuple().exponent))
+
+    @staticmethod
+    def required_scale(value: Decimal) -> int:
+        # Decimal places needed to represent the value exactly as scaled integer (trailing zeros need none)
+        return max(0, -int(value.normalize().as_tuple().exponent))
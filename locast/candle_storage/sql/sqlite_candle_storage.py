@@ -1,100 +1,531 @@
-from typing import List, Tuple
-from sqlalchemy import Engine, and_, delete, literal
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from functools import partial, wraps
+from types import CoroutineType
+from typing import (
+    Any,
+    Callable,
+    Concatenate,
+    List,
+    ParamSpec,
+    Sequence,
+    Tuple,
+    Type,
+    TypeVar,
+)
+import numpy as np
+import numpy.typing as npt
+from sqlalchemy import (
+    Engine,
+    Float,
+    Integer,
+    Select,
+    and_,
+    cast,
+    create_engine,
+    delete,
+    event,
+    insert,
+    inspect,
+    literal,
+    null,
+    update,
+)
+from sqlalchemy.engine import Connection
+from sqlalchemy.engine.interfaces import DBAPICursor
+from sqlalchemy.pool import QueuePool
 
-from sqlmodel import SQLModel, Session, asc, desc, select, func
+from sqlalchemy.orm import aliased
+from sqlmodel import SQLModel, Session, col, desc, select, func
 
 from locast.candle.candle_utility import CandleUtility as cu
 from locast.candle.candle import Candle
+from locast.candle.candle_frame import CandleFrame
 from locast.candle.exchange import Exchange
 from locast.candle.exchange_resolution import ResolutionDetail
+from locast.candle.gap import Gap
+from locast.candle_storage.backfill_checkpoint import BackfillCheckpoint
 from locast.candle_storage.candle_storage import CandleStorage
 from locast.candle_storage.cluster_info import ClusterInfo
-from locast.candle_storage.database_candle_mapper import DatabaseCandleMapper
-from locast.candle_storage.sql.sqlite_candle_mapping import SqliteCandleMapping
+from locast.candle_storage.market_horizon import MarketHorizon
+from locast.candle_storage.on_conflict import OnConflict
+from locast.candle_storage.sql.candle_layout import CandleLayout
+from locast.candle_storage.sql.dimension_cache import DimensionCache
+from locast.candle_storage.sql.scaled_decimal_utility import (
+    ScaledDecimalUtility as sdu,
+)
 from locast.candle_storage.sql.tables import (
+    SqliteBackfillCheckpoint,
     SqliteCandle,
+    SqliteCluster,
+    SqliteClusteredCandle,
+    SqliteCompactCandle,
     SqliteExchange,
     SqliteMarket,
+    SqliteMarketHorizon,
     SqliteResolution,
+    SqliteUnfillableGap,
 )
 
-from locast.candle_storage.sql.table_utility import TableUtility as tu
 from locast.logging_functions import log_progress
 
 
+# Table holding the candles of each layout
+CANDLE_TABLES: dict[
+    CandleLayout,
+    Type[SqliteCandle] | Type[SqliteCompactCandle] | Type[SqliteClusteredCandle],
+] = {
+    CandleLayout.TEXT: SqliteCandle,
+    CandleLayout.COMPACT: SqliteCompactCandle,
+    CandleLayout.CLUSTERED: SqliteClusteredCandle,
+}
+
+# Columns making up a Candle, selected as plain rows instead of ORM instances (in the order _to_candles expects)
+CANDLE_KEYS = [
+    "id",
+    "started_at",
+    "open",
+    "high",
+    "low",
+    "close",
+    "base_token_volume",
+    "trades",
+    "usd_volume",
+    "starting_open_interest",
+]
+
+# Columns holding decimals, in the order of CandleFrame's fields
+DECIMAL_KEYS = [
+    "open",
+    "high",
+    "low",
+    "close",
+    "base_token_volume",
+    "usd_volume",
+    "starting_open_interest",
+]
+
+# Largest integer SQLite stores as such, larger ones overflow
+INT64_MAX = 2**63 - 1
+
+# Columns written per candle, in the order of the parameter tuples built by _to_parameters
+INSERT_KEYS = [*CANDLE_KEYS, "exchange_id", "market_id", "resolution_id"]
+
+# Clauses appended to the insert statement, resolving conflicts on the columns of the unique candle constraint
+CONFLICT_TARGET = "(exchange_id, market_id, resolution_id, started_at)"
+ON_CONFLICT_CLAUSES = {
+    OnConflict.IGNORE: f" ON CONFLICT {CONFLICT_TARGET} DO NOTHING",
+    OnConflict.REPLACE: f" ON CONFLICT {CONFLICT_TARGET} DO UPDATE SET "
+    + ", ".join(f"{key} = excluded.{key}" for key in CANDLE_KEYS[2:]),
+}
+
+# Set on the connection before bulk writes: A larger page cache and in-memory temp storage keep
+# index maintenance of big batches off the disk. Durability related pragmas (synchronous) stay untouched.
+BULK_LOAD_PRAGMAS = [
+    "PRAGMA cache_size = -65536",
+    "PRAGMA temp_store = MEMORY",
+]
+
+
+# Set on every connection of an engine created by from_path. In WAL mode readers see the last commit while a
+# write is in progress, and synchronous NORMAL is safe against corruption (a power loss may lose the last commits).
+WAL_PRAGMAS = [
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA synchronous = NORMAL",
+]
+
+P = ParamSpec("P")
+R = TypeVar("R")
+
+
+def on_executor(
+    reads: bool = False,
+) -> Callable[
+    [Callable[Concatenate["SqliteCandleStorage", P], R]],
+    Callable[Concatenate["SqliteCandleStorage", P], "CoroutineType[Any, Any, R]"],
+]:
+    """
+    Turns a blocking method of SqliteCandleStorage into a coroutine, which runs the method on the storage's
+    executor (its read executor, if reads). Database work thereby never blocks the event loop, so concurrent
+    fetches keep going while candles are written.
+    """
+
+    def decorator(
+        method: Callable[Concatenate["SqliteCandleStorage", P], R],
+    ) -> Callable[Concatenate["SqliteCandleStorage", P], "CoroutineType[Any, Any, R]"]:
+        @wraps(method)
+        async def run(
+            self: "SqliteCandleStorage", *args: P.args, **kwargs: P.kwargs
+        ) -> R:
+            executor = self._read_executor if reads else self._executor
+            return await asyncio.get_running_loop().run_in_executor(
+                executor, partial(method, self, *args, **kwargs)
+            )
+
+        return run
+
+    return decorator
+
+
 class SqliteCandleStorage(CandleStorage):
-    def __init__(self, engine: Engine, log_progress: bool = False) -> None:
+    def __init__(
+        self,
+        engine: Engine,
+        log_progress: bool = False,
+        layout: CandleLayout = CandleLayout.TEXT,
+        read_engine: Engine | None = None,
+    ) -> None:
+        """
+        Stores candles in the table of the given layout. CandleLayout.COMPACT stores integers only, which makes rows
+        smaller and reads cheaper, while still round-tripping each decimal exactly. CandleLayout.CLUSTERED additionally
+        keeps rows ordered by series and time, without surrogate ids (candles come back with id None).
+
+        Reads go to read_engine if given, everything else to engine (see from_path).
+        """
         self._log_progress = log_progress
         self._engine = engine
-        SQLModel.metadata.create_all(self._engine)
+        self._read_engine = read_engine or engine
 
-    async def store_candles(self, candles: List[Candle]) -> None:
+        # Engines the storage created itself (see from_path), which close disposes
+        self._owned_engines: List[Engine] = []
+
+        # Writes run on a single thread, in the order they were awaited. Reads share that thread, unless the read
+        # engine is a separate pool (see from_path), whose connections serve one reader thread each.
+        self._executor = ThreadPoolExecutor(1, "locast-sqlite")
+        self._read_executor = (
+            ThreadPoolExecutor(read_engine.pool.size(), "locast-sqlite-read")
+            if read_engine and isinstance(read_engine.pool, QueuePool)
+            else self._executor
+        )
+        self._dimensions = DimensionCache()
+
+        self._layout = layout
+        self._candle = CANDLE_TABLES[layout]
+        self._candle_columns = self._columns_of(self._candle)
+
+        # Numbered placeholders bind parameter tuples of all INSERT_KEYS, even to tables lacking some of the columns
+        insert_keys = [
+            (key, f"?{i + 1}")
+            for i, key in enumerate(INSERT_KEYS)
+            if hasattr(self._candle, key)
+        ]
+        self._insert_statement = (
+            f"INSERT INTO {self._candle.__tablename__} "
+            f"({', '.join(key for key, _ in insert_keys)}) "
+            f"VALUES ({', '.join(placeholder for _, placeholder in insert_keys)})"
+        )
+
+        # The schema is set up on the executor's thread as well, since in-memory databases of engines pooling one
+        # connection per thread (the default) only exist for the thread that created them
+        self._executor.submit(self._set_up_schema).result()
+
+    @classmethod
+    def from_path(
+        cls,
+        path: str,
+        log_progress: bool = False,
+        layout: CandleLayout = CandleLayout.TEXT,
+        readers: int = 8,
+        busy_timeout: timedelta = timedelta(seconds=30),
+        mmap_size: int = 256 * 1024**2,
+        cache_size: int = 64 * 1024**2,
+    ) -> "SqliteCandleStorage":
+        """
+        Creates a storage on the database file at path, configured for concurrent readers and writers:
+
+        - WAL journal mode, so reads never wait on a write in progress (and vice versa)
+        - A pool of up to `readers` read only connections
+        - A single writer connection, so writes of this process are serialized instead of failing on a locked database
+        - A busy timeout, for which writes of other processes are waited for
+        - mmap_size and cache_size (in bytes) per connection
+        """
+        pragmas = [
+            f"PRAGMA busy_timeout = {int(busy_timeout.total_seconds() * 1000)}",
+            f"PRAGMA mmap_size = {mmap_size}",
+            f"PRAGMA cache_size = {-(cache_size // 1024)}",
+        ]
+
+        # Created first, so the database is in WAL mode (which persists) before any reader connects
+        engine = cls._create_engine(
+            path,
+            [*WAL_PRAGMAS, *pragmas],
+            pool_size=1,
+            pool_timeout=busy_timeout.total_seconds(),
+        )
+        with engine.connect():
+            pass
+
+        read_engine = cls._create_engine(
+            path,
+            [*pragmas, "PRAGMA query_only = ON"],
+            pool_size=readers,
+            pool_timeout=busy_timeout.total_seconds(),
+        )
+        storage = cls(engine, log_progress, layout, read_engine)
+        storage._owned_engines = [engine, read_engine]
+        return storage
+
+    def close(self) -> None:
+        """
+        Shuts down the threads the storage runs its queries on, after the queries already awaited are done. Engines
+        created by from_path get disposed along with them, engines passed in are left to their owner.
+        """
+        self._executor.shutdown()
+        self._read_executor.shutdown()
+        for engine in self._owned_engines:
+            engine.dispose()
+
+    @on_executor()
+    def store_candles(
+        self,
+        candles: List[Candle],
+        on_conflict: OnConflict | None = None,
+    ) -> None:
         # NOTE: Benchmarking showed stable, scalable results across different orders of magnitudes with a batch size of 5k
-        await self._bulk_save_objects_batched(candles, 5000)
+        self._insert_batched(candles, 5000, on_conflict)
+
+    @on_executor()
+    def store_clusters(
+        self,
+        clusters: List[List[Candle]],
+        on_conflict: OnConflict | List[OnConflict | None] | None = None,
+    ) -> None:
+        # Writes candles of several clusters within one transaction, resolving conflicts alike or per cluster.
+        conflicts = (
+            on_conflict
+            if isinstance(on_conflict, list)
+            else [on_conflict] * len(clusters)
+        )
+        # Inserting a dimension commits, so unknown ones are inserted before the candles' transaction begins
+        with Session(self._engine) as session:
+            for first in (candles[0] for candles in clusters if candles):
+                self._look_up_or_insert_foreign_keys(
+                    first.exchange,
+                    first.market,
+                    first.resolution,
+                    session,
+                )
 
-    async def retrieve_cluster(
+        with Session(self._engine) as session:
+            for candles, conflict in zip(clusters, conflicts, strict=True):
+                self._insert_candles(candles, session, conflict)
+            session.commit()
+
+    @on_executor(reads=True)
+    def retrieve_cluster(
         self,
         exchange: Exchange,
         market: str,
         resolution: ResolutionDetail,
     ) -> List[Candle]:
-        with Session(self._engine) as session:
+        with Session(self._read_engine) as session:
             if foreign_keys := self._look_up_foreign_keys(
                 exchange,
                 market,
                 resolution,
                 session,
             ):
-                sqlite_exchange, sqlite_market, sqlite_resolution = foreign_keys
+                exchange_id, market_id, resolution_id = foreign_keys
 
                 stmnt = (
-                    select(SqliteCandle)
+                    select(*self._candle_columns)
                     .where(
-                        (SqliteCandle.exchange_id == sqlite_exchange.id)
-                        & (SqliteCandle.market_id == sqlite_market.id)
-                        & (SqliteCandle.resolution_id == sqlite_resolution.id)
+                        (self._candle.exchange_id == exchange_id)
+                        & (self._candle.market_id == market_id)
+                        & (self._candle.resolution_id == resolution_id)
                     )
-                    .order_by(desc(SqliteCandle.started_at))
+                    .order_by(desc(self._candle.started_at))
                 )
 
-                results = session.exec(stmnt)
-                return self._to_candles(list(results.all()))
+                rows = self._cursor(stmnt, session).fetchall()
+                scale = self._query_scale(market_id, session)
+                return self._to_candles(rows, exchange, market, resolution, scale)
             else:
                 return []
 
-    async def retrieve_newest_candles(
+    @on_executor(reads=True)
+    def retrieve_cluster_frame(
+        self,
+        exchange: Exchange,
+        market: str,
+        resolution: ResolutionDetail,
+        scale: int | None = None,
+    ) -> CandleFrame:
+        # Only plain columns are selected and converted by sqlite, so neither ORM instances nor Candles are created.
+        # Fixed point values are built from the stored integers or decimal strings, floats would not keep them exact.
+        exact = scale is not None
+        columns = [
+            self._to_epoch(self._candle.started_at),
+            self._candle.trades,
+            *(
+                getattr(self._candle, key)
+                if exact
+                else cast(getattr(self._candle, key), Float)
+                for key in DECIMAL_KEYS
+            ),
+        ]
+        dtype = (
+            (np.int64 if self._layout.is_compact else np.object_)
+            if exact
+            else np.float64
+        )
+        rows: npt.NDArray[Any] = np.empty((0, len(columns)), dtype=dtype)
+        stored_scale: int | None = None
+
+        with Session(self._read_engine) as session:
+            if foreign_keys := self._look_up_foreign_keys(
+                exchange,
+                market,
+                resolution,
+                session,
+            ):
+                exchange_id, market_id, resolution_id = foreign_keys
+
+                stmnt = (
+                    select(*columns)
+                    .where(
+                        (self._candle.exchange_id == exchange_id)
+                        & (self._candle.market_id == market_id)
+                        & (self._candle.resolution_id == resolution_id)
+                    )
+                    .order_by(desc(self._candle.started_at))
+                )
+
+                cursor = self._cursor(stmnt, session)
+                if chunks := [
+                    np.array(chunk, dtype=dtype)
+                    for chunk in iter(lambda: cursor.fetchmany(50_000), [])
+                ]:
+                    rows = np.concatenate(chunks)
+                stored_scale = self._query_scale(market_id, session)
+
+        # Compact values are scaled integers, which the float frame holds as the decimals they represent
+        values = rows[:, 2:]
+        if scale is not None and self._layout.is_compact:
+            values = self._rescale(values, stored_scale or 0, scale)
+        elif scale is not None:
+            values = self._to_scaled_integers(values, scale)
+        elif stored_scale:
+            values = values / 10**stored_scale
+
+        return self._to_candle_frame(exchange, market, resolution, rows, values, scale)
+
+    @on_executor(reads=True)
+    def retrieve_started_at(
+        self,
+        exchange: Exchange,
+        market: str,
+        resolution: ResolutionDetail,
+    ) -> npt.NDArray[np.int64]:
+        # Epoch seconds of all candles of the cluster, newest-first. Served by the index of the unique candle key alone.
+        started_at = np.empty(0, dtype=np.int64)
+
+        with Session(self._read_engine) as session:
+            if foreign_keys := self._look_up_foreign_keys(
+                exchange,
+                market,
+                resolution,
+                session,
+            ):
+                exchange_id, market_id, resolution_id = foreign_keys
+
+                stmnt = (
+                    select(self._to_epoch(self._candle.started_at))
+                    .where(
+                        (self._candle.exchange_id == exchange_id)
+                        & (self._candle.market_id == market_id)
+                        & (self._candle.resolution_id == resolution_id)
+                    )
+                    .order_by(desc(self._candle.started_at))
+                )
+
+                cursor = self._cursor(stmnt, session)
+                if chunks := [
+                    np.array(chunk, dtype=np.int64).ravel()
+                    for chunk in iter(lambda: cursor.fetchmany(50_000), [])
+                ]:
+                    started_at = np.concatenate(chunks)
+
+        return started_at
+
+    @on_executor(reads=True)
+    def retrieve_newest_candles(
         self,
         exchange: Exchange,
         market: str,
         resolution: ResolutionDetail,
         amount: int,
     ) -> List[Candle]:
-        with Session(self._engine) as session:
+        with Session(self._read_engine) as session:
             if foreign_keys := self._look_up_foreign_keys(
                 exchange,
                 market,
                 resolution,
                 session,
             ):
-                sqlite_exchange, sqlite_market, sqlite_resolution = foreign_keys
+                exchange_id, market_id, resolution_id = foreign_keys
 
                 stmnt = (
-                    select(SqliteCandle)
+                    select(*self._candle_columns)
                     .where(
-                        (SqliteCandle.exchange_id == sqlite_exchange.id)
-                        & (SqliteCandle.market_id == sqlite_market.id)
-                        & (SqliteCandle.resolution_id == sqlite_resolution.id)
+                        (self._candle.exchange_id == exchange_id)
+                        & (self._candle.market_id == market_id)
+                        & (self._candle.resolution_id == resolution_id)
                     )
-                    .order_by(desc(SqliteCandle.started_at))
+                    .order_by(desc(self._candle.started_at))
                     .limit(amount)
                 )
 
-                results = session.exec(stmnt)
-                return self._to_candles(list(results.all()))
+                rows = self._cursor(stmnt, session).fetchall()
+                scale = self._query_scale(market_id, session)
+                return self._to_candles(rows, exchange, market, resolution, scale)
+            else:
+                return []
+
+    @on_executor(reads=True)
+    def retrieve_segment(
+        self,
+        exchange: Exchange,
+        market: str,
+        resolution: ResolutionDetail,
+        start_date: datetime,
+        end_date: datetime,
+    ) -> List[Candle]:
+        with Session(self._read_engine) as session:
+            if foreign_keys := self._look_up_foreign_keys(
+                exchange,
+                market,
+                resolution,
+                session,
+            ):
+                exchange_id, market_id, resolution_id = foreign_keys
+
+                # Served as range scan by the index of unique_candle_constraint, which leads with these columns
+                stmnt = (
+                    select(*self._candle_columns)
+                    .where(
+                        (col(self._candle.exchange_id) == exchange_id)
+                        & (col(self._candle.market_id) == market_id)
+                        & (col(self._candle.resolution_id) == resolution_id)
+                        & (
+                            col(self._candle.started_at)
+                            >= self._to_started_at(start_date)
+                        )
+                        & (col(self._candle.started_at) < self._to_started_at(end_date))
+                    )
+                    .order_by(desc(self._candle.started_at))
+                )
+
+                rows = self._cursor(stmnt, session).fetchall()
+                scale = self._query_scale(market_id, session)
+                return self._to_candles(rows, exchange, market, resolution, scale)
             else:
                 return []
 
-    async def delete_cluster(
+    @on_executor()
+    def delete_cluster(
         self,
         exchange: Exchange,
         market: str,
@@ -107,28 +538,206 @@ class SqliteCandleStorage(CandleStorage):
                 resolution,
                 session,
             ):
-                sqlite_exchange, sqlite_market, sqlite_resolution = foreign_keys
+                exchange_id, market_id, resolution_id = foreign_keys
 
-                stmt = delete(SqliteCandle).where(
+                stmt = delete(self._candle).where(
                     and_(
-                        literal(sqlite_exchange.id) == SqliteCandle.exchange_id,
-                        literal(sqlite_market.id) == SqliteCandle.market_id,
-                        literal(sqlite_resolution.id) == SqliteCandle.resolution_id,
+                        literal(exchange_id) == self._candle.exchange_id,
+                        literal(market_id) == self._candle.market_id,
+                        literal(resolution_id) == self._candle.resolution_id,
                     )
                 )
+                session.exec(stmt)  # type: ignore
+
+                if sqlite_cluster := self._query_cluster(
+                    exchange_id,
+                    market_id,
+                    resolution_id,
+                    session,
+                ):
+                    session.delete(sqlite_cluster)
+
+                # A deleted cluster has no backfill left to resume
+                if sqlite_checkpoint := self._query_checkpoint(
+                    exchange_id,
+                    market_id,
+                    resolution_id,
+                    session,
+                ):
+                    session.delete(sqlite_checkpoint)
 
-                with self._engine.begin() as conn:
-                    conn.execute(stmt)
+                # Its unfillable gaps are gone with it
+                session.connection().execute(
+                    delete(SqliteUnfillableGap).where(
+                        (col(SqliteUnfillableGap.exchange_id) == exchange_id)
+                        & (col(SqliteUnfillableGap.market_id) == market_id)
+                        & (col(SqliteUnfillableGap.resolution_id) == resolution_id)
+                    )
+                )
 
                 session.commit()
 
-    async def get_cluster_info(
+    @on_executor()
+    def trim_cluster(
+        self,
+        exchange: Exchange,
+        market: str,
+        resolution: ResolutionDetail,
+        before: datetime,
+    ) -> None:
+        # Deletes all candles that started before the given date
+        with Session(self._engine) as session:
+            foreign_keys = self._look_up_foreign_keys(
+                exchange,
+                market,
+                resolution,
+                session,
+            )
+
+        if not foreign_keys:
+            return
+
+        # NOTE: Deleting in batches of 5k oldest candles keeps each write transaction (and the write lock) short
+        batch_size = 5000
+        while (
+            self._delete_oldest_batch(*foreign_keys, before, batch_size) == batch_size
+        ):
+            pass
+
+    @on_executor(reads=True)
+    def get_cluster_info(
         self,
         exchange: Exchange,
         market: str,
         resolution: ResolutionDetail,
     ) -> ClusterInfo:
         result = ClusterInfo(None, None, 0, False)
+        with Session(self._read_engine) as session:
+            if foreign_keys := self._look_up_foreign_keys(
+                exchange,
+                market,
+                resolution,
+                session,
+            ):
+                exchange_id, market_id, resolution_id = foreign_keys
+                head = aliased(self._candle)
+                tail = aliased(self._candle)
+
+                # One single row: The cluster's metadata joined with its head and tail candles
+                stmnt = (
+                    select(
+                        SqliteCluster.size,
+                        *self._columns_of(head),
+                        *self._columns_of(tail),
+                    )
+                    .join(
+                        head,
+                        self._candle_of_cluster(head, SqliteCluster.head_started_at),
+                    )
+                    .join(
+                        tail,
+                        self._candle_of_cluster(tail, SqliteCluster.tail_started_at),
+                    )
+                    .where(
+                        (SqliteCluster.exchange_id == exchange_id)
+                        & (SqliteCluster.market_id == market_id)
+                        & (SqliteCluster.resolution_id == resolution_id)
+                    )
+                )
+
+                if row := self._cursor(stmnt, session).fetchone():
+                    n_columns = len(CANDLE_KEYS)
+                    size = row[0]
+                    newest, oldest = self._to_candles(
+                        [row[1 : n_columns + 1], row[n_columns + 1 :]],
+                        exchange,
+                        market,
+                        resolution,
+                        self._query_scale(market_id, session),
+                    )
+                    result = ClusterInfo(
+                        newest,
+                        oldest,
+                        size,
+                        cu.is_newest_valid_candle(newest),
+                    )
+        return result
+
+    @on_executor()
+    def store_checkpoint(
+        self,
+        exchange: Exchange,
+        market: str,
+        resolution: ResolutionDetail,
+        checkpoint: BackfillCheckpoint,
+    ) -> None:
+        with Session(self._engine) as session:
+            exchange_id, market_id, resolution_id = (
+                self._look_up_or_insert_foreign_keys(
+                    exchange,
+                    market,
+                    resolution,
+                    session,
+                )
+            )
+
+            if sqlite_checkpoint := self._query_checkpoint(
+                exchange_id,
+                market_id,
+                resolution_id,
+                session,
+            ):
+                sqlite_checkpoint.start_date = checkpoint.start_date
+                sqlite_checkpoint.oldest_started_at = checkpoint.oldest_started_at
+                sqlite_checkpoint.updated_at = checkpoint.updated_at
+            else:
+                sqlite_checkpoint = SqliteBackfillCheckpoint(
+                    exchange_id=exchange_id,
+                    market_id=market_id,
+                    resolution_id=resolution_id,
+                    start_date=checkpoint.start_date,
+                    oldest_started_at=checkpoint.oldest_started_at,
+                    updated_at=checkpoint.updated_at,
+                )
+
+            session.add(sqlite_checkpoint)
+            session.commit()
+
+    @on_executor(reads=True)
+    def retrieve_checkpoint(
+        self,
+        exchange: Exchange,
+        market: str,
+        resolution: ResolutionDetail,
+    ) -> BackfillCheckpoint | None:
+        with Session(self._read_engine) as session:
+            if foreign_keys := self._look_up_foreign_keys(
+                exchange,
+                market,
+                resolution,
+                session,
+            ):
+                if sqlite_checkpoint := self._query_checkpoint(*foreign_keys, session):
+                    return BackfillCheckpoint(
+                        start_date=sqlite_checkpoint.start_date.replace(
+                            tzinfo=timezone.utc
+                        ),
+                        oldest_started_at=sqlite_checkpoint.oldest_started_at.replace(
+                            tzinfo=timezone.utc
+                        ),
+                        updated_at=sqlite_checkpoint.updated_at.replace(
+                            tzinfo=timezone.utc
+                        ),
+                    )
+        return None
+
+    @on_executor()
+    def delete_checkpoint(
+        self,
+        exchange: Exchange,
+        market: str,
+        resolution: ResolutionDetail,
+    ) -> None:
         with Session(self._engine) as session:
             if foreign_keys := self._look_up_foreign_keys(
                 exchange,
@@ -136,30 +745,233 @@ class SqliteCandleStorage(CandleStorage):
                 resolution,
                 session,
             ):
-                sqlite_exchange, sqlite_market, sqlite_resolution = foreign_keys
+                if sqlite_checkpoint := self._query_checkpoint(*foreign_keys, session):
+                    session.delete(sqlite_checkpoint)
+                    session.commit()
 
-                if head_and_tail := self._query_head_and_tail(
-                    sqlite_exchange,
-                    sqlite_market,
-                    sqlite_resolution,
+    @on_executor()
+    def store_unfillable_gaps(
+        self,
+        exchange: Exchange,
+        market: str,
+        resolution: ResolutionDetail,
+        gaps: List[Gap],
+    ) -> None:
+        with Session(self._engine) as session:
+            exchange_id, market_id, resolution_id = (
+                self._look_up_or_insert_foreign_keys(
+                    exchange,
+                    market,
+                    resolution,
                     session,
-                ):
-                    head, tail = head_and_tail
-                    amount = self._query_amount(
-                        sqlite_exchange,
-                        sqlite_market,
-                        sqlite_resolution,
-                        session,
+                )
+            )
+
+            # A gap recorded before under the same start is updated to the current count
+            for gap in gaps:
+                stmnt = select(SqliteUnfillableGap).where(
+                    (SqliteUnfillableGap.exchange_id == exchange_id)
+                    & (SqliteUnfillableGap.market_id == market_id)
+                    & (SqliteUnfillableGap.resolution_id == resolution_id)
+                    & (SqliteUnfillableGap.start == self._to_utc(gap.start))
+                )
+                if sqlite_gap := session.exec(stmnt).first():
+                    sqlite_gap.count = gap.count
+                else:
+                    sqlite_gap = SqliteUnfillableGap(
+                        exchange_id=exchange_id,
+                        market_id=market_id,
+                        resolution_id=resolution_id,
+                        start=self._to_utc(gap.start),
+                        count=gap.count,
                     )
-                    is_uptodate = cu.is_newest_valid_candle(head)
-                    if head and amount:
-                        result = ClusterInfo(head, tail, amount, is_uptodate)
-        return result
+                session.add(sqlite_gap)
+
+            session.commit()
+
+    @on_executor(reads=True)
+    def retrieve_unfillable_gaps(
+        self,
+        exchange: Exchange,
+        market: str,
+        resolution: ResolutionDetail,
+    ) -> List[Gap]:
+        with Session(self._read_engine) as session:
+            if not (
+                foreign_keys := self._look_up_foreign_keys(
+                    exchange,
+                    market,
+                    resolution,
+                    session,
+                )
+            ):
+                return []
+
+            exchange_id, market_id, resolution_id = foreign_keys
+            stmnt = (
+                select(SqliteUnfillableGap)
+                .where(
+                    (SqliteUnfillableGap.exchange_id == exchange_id)
+                    & (SqliteUnfillableGap.market_id == market_id)
+                    & (SqliteUnfillableGap.resolution_id == resolution_id)
+                )
+                .order_by(desc(SqliteUnfillableGap.start))
+            )
+
+            return [
+                Gap(
+                    start=sqlite_gap.start.replace(tzinfo=timezone.utc),
+                    count=sqlite_gap.count,
+                )
+                for sqlite_gap in session.exec(stmnt).all()
+            ]
+
+    @on_executor()
+    def store_horizon(
+        self,
+        exchange: Exchange,
+        market: str,
+        resolution: ResolutionDetail,
+        horizon: MarketHorizon,
+    ) -> None:
+        with Session(self._engine) as session:
+            exchange_id, market_id, resolution_id = (
+                self._look_up_or_insert_foreign_keys(
+                    exchange,
+                    market,
+                    resolution,
+                    session,
+                )
+            )
+
+            if sqlite_horizon := self._query_horizon(
+                exchange_id,
+                market_id,
+                resolution_id,
+                session,
+            ):
+                sqlite_horizon.horizon = horizon.horizon
+                sqlite_horizon.found_at = horizon.found_at
+            else:
+                sqlite_horizon = SqliteMarketHorizon(
+                    exchange_id=exchange_id,
+                    market_id=market_id,
+                    resolution_id=resolution_id,
+                    horizon=horizon.horizon,
+                    found_at=horizon.found_at,
+                )
+
+            session.add(sqlite_horizon)
+            session.commit()
+
+    @on_executor(reads=True)
+    def retrieve_horizon(
+        self,
+        exchange: Exchange,
+        market: str,
+        resolution: ResolutionDetail,
+    ) -> MarketHorizon | None:
+        with Session(self._read_engine) as session:
+            if foreign_keys := self._look_up_foreign_keys(
+                exchange,
+                market,
+                resolution,
+                session,
+            ):
+                if sqlite_horizon := self._query_horizon(*foreign_keys, session):
+                    return MarketHorizon(
+                        horizon=sqlite_horizon.horizon.replace(tzinfo=timezone.utc),
+                        found_at=sqlite_horizon.found_at.replace(tzinfo=timezone.utc),
+                    )
+        return None
+
+    @on_executor(reads=True)
+    def retrieve_horizons(
+        self,
+        exchange: Exchange,
+        market: str,
+    ) -> List[MarketHorizon]:
+        with Session(self._read_engine) as session:
+            exchange_id = self._dimensions.exchange_id(exchange, session)
+            market_id = self._dimensions.market_id(market, session)
+
+            if not (exchange_id and market_id):
+                return []
+
+            stmnt = select(SqliteMarketHorizon).where(
+                (SqliteMarketHorizon.exchange_id == exchange_id)
+                & (SqliteMarketHorizon.market_id == market_id)
+            )
+
+            return [
+                MarketHorizon(
+                    horizon=sqlite_horizon.horizon.replace(tzinfo=timezone.utc),
+                    found_at=sqlite_horizon.found_at.replace(tzinfo=timezone.utc),
+                )
+                for sqlite_horizon in session.exec(stmnt).all()
+            ]
+
+    @on_executor()
+    def migrate_from(self, layout: CandleLayout) -> None:
+        """
+        Moves all candles of the database from the table of the given layout into the table of this storage's
+        layout, keeping their ids. Runs within one transaction, so an interrupted migration leaves the database as
+        it was.
+        """
+        if layout is self._layout:
+            return
 
-    async def _bulk_save_objects_batched(
+        # Of the source, only its table and conversions are used, which run on this thread
+        source = SqliteCandleStorage(self._engine, layout=layout)
+        source.close()
+        keys = [
+            source._candle.exchange_id,
+            source._candle.market_id,
+            source._candle.resolution_id,
+        ]
+
+        with Session(self._engine) as session:
+            # Storing the candles in the new layout rebuilds the cluster metadata
+            session.exec(delete(SqliteCluster))  # type: ignore
+
+            for exchange_id, market_id, resolution_id in session.exec(
+                select(*keys).distinct()
+            ).all():
+                sqlite_exchange = session.get_one(SqliteExchange, exchange_id)
+                sqlite_resolution = session.get_one(SqliteResolution, resolution_id)
+                exchange = sqlite_exchange.exchange
+                market = session.get_one(SqliteMarket, market_id).market
+                resolution = ResolutionDetail(
+                    sqlite_resolution.seconds,
+                    sqlite_resolution.notation,
+                )
+
+                scale = source._query_scale(market_id, session)
+                stmnt = select(*source._candle_columns).where(
+                    (keys[0] == exchange_id)
+                    & (keys[1] == market_id)
+                    & (keys[2] == resolution_id)
+                )
+
+                cursor = self._cursor(stmnt, session)
+                for rows in iter(lambda: cursor.fetchmany(50_000), []):
+                    candles = source._to_candles(
+                        rows,
+                        exchange,
+                        market,
+                        resolution,
+                        scale,
+                    )
+                    self._insert_candles(candles, session)
+
+            session.exec(delete(source._candle))  # type: ignore
+            session.commit()
+
+    def _insert_batched(
         self,
         candles: List[Candle],
         batch_size: int,
+        on_conflict: OnConflict | None,
     ) -> None:
         done = 0
         total = len(candles)
@@ -170,15 +982,9 @@ class SqliteCandleStorage(CandleStorage):
             # Get the current batch of candles
             batch = candles[i * batch_size : (i + 1) * batch_size]
 
-            # Create a new session for this batch
+            # One transaction per batch
             with Session(self._engine) as session:
-                # Initialize mapper with the current session
-                mapper = DatabaseCandleMapper(SqliteCandleMapping(session))
-
-                # Perform bulk insert
-                session.bulk_save_objects(
-                    [mapper.to_database_candle(candle) for candle in batch]
-                )
+                self._insert_candles(batch, session, on_conflict)
                 session.commit()
 
                 if self._log_progress:
@@ -186,9 +992,397 @@ class SqliteCandleStorage(CandleStorage):
                     market = batch[0].market
                     log_progress("📀", market, "candles", "stored", done, total)
 
-    def _to_candles(self, database_candles: List[SqliteCandle]) -> List[Candle]:
-        mapper = DatabaseCandleMapper(SqliteCandleMapping())
-        return [mapper.to_candle(sqlite_candle) for sqlite_candle in database_candles]
+    def _insert_candles(
+        self,
+        candles: List[Candle],
+        session: Session,
+        on_conflict: OnConflict | None = None,
+    ) -> None:
+        # Candles go straight into parameter tuples of a single executemany, without creating ORM instances.
+        # Like all candles of a cluster, they are expected to share exchange, market and resolution.
+        if not candles:
+            return
+
+        first = candles[0]
+        foreign_keys = self._look_up_or_insert_foreign_keys(
+            first.exchange,
+            first.market,
+            first.resolution,
+            session,
+        )
+        started_ats = [candle.started_at for candle in candles]
+        head_started_at, tail_started_at = max(started_ats), min(started_ats)
+
+        connection = session.connection()
+        self._apply_bulk_load_pragmas(connection)
+
+        # Conflicts are resolved by sqlite, so only counting the stored range tells how many candles got added
+        range_of_batch = (
+            *foreign_keys,
+            self._to_started_at(tail_started_at),
+            self._to_started_at(head_started_at),
+            connection,
+        )
+        amount_before = self._count_candles(*range_of_batch) if on_conflict else 0
+
+        to_parameters = (
+            self._to_compact_parameters(
+                self._fit_scale(foreign_keys[1], candles, connection)
+            )
+            if self._layout.is_compact
+            else self._to_parameters
+        )
+        connection.exec_driver_sql(
+            self._insert_statement
+            + (ON_CONFLICT_CLAUSES[on_conflict] if on_conflict else ""),
+            [to_parameters(candle, foreign_keys) for candle in candles],
+        )
+
+        added = (
+            self._count_candles(*range_of_batch) - amount_before
+            if on_conflict
+            else len(candles)
+        )
+        self._track_cluster(
+            *foreign_keys,
+            self._to_utc(head_started_at),
+            self._to_utc(tail_started_at),
+            added,
+            session,
+        )
+
+    def _to_parameters(
+        self,
+        candle: Candle,
+        foreign_keys: Tuple[int, int, int],
+    ) -> Tuple[Any, ...]:
+        # Bypassing SQLAlchemy's type processing, started_at is formatted the way its DateTime type stores it
+        return (
+            candle.id,
+            self._to_utc(candle.started_at).isoformat(sep=" ", timespec="microseconds"),
+            str(candle.open),
+            str(candle.high),
+            str(candle.low),
+            str(candle.close),
+            str(candle.base_token_volume),
+            candle.trades,
+            str(candle.usd_volume),
+            str(candle.starting_open_interest),
+            *foreign_keys,
+        )
+
+    def _to_compact_parameters(
+        self,
+        scale: int,
+    ) -> Callable[[Candle, Tuple[int, int, int]], Tuple[Any, ...]]:
+        # Multiplying by a prepared power of ten is exact (for up to 28 digits) and cheaper than Decimal.scaleb
+        factor = Decimal(10**scale)
+
+        def to_parameters(
+            candle: Candle,
+            foreign_keys: Tuple[int, int, int],
+        ) -> Tuple[Any, ...]:
+            return (
+                candle.id,
+                int(candle.started_at.timestamp()),
+                int(candle.open * factor),
+                int(candle.high * factor),
+                int(candle.low * factor),
+                int(candle.close * factor),
+                int(candle.base_token_volume * factor),
+                candle.trades,
+                int(candle.usd_volume * factor),
+                int(candle.starting_open_interest * factor),
+                *foreign_keys,
+            )
+
+        return to_parameters
+
+    def _fit_scale(
+        self,
+        market_id: int,
+        candles: List[Candle],
+        connection: Connection,
+    ) -> int:
+        # The market's scale only ever grows: Candles needing more decimal places than the stored ones have
+        # get all stored candles of the market rescaled within the same transaction, which keeps them exact.
+        values = [getattr(candle, key) for candle in candles for key in DECIMAL_KEYS]
+        scale = self._query_scale(market_id, connection)
+
+        # Decimal places as written are an upper bound, which is cheaper to get than the exact scale
+        if scale is not None and max(map(sdu.decimal_places, values)) <= scale:
+            return scale
+
+        required = max(map(sdu.required_scale, values))
+        if scale is not None and required <= scale:
+            return scale
+
+        # All compact tables share the scale, so a migration between them reads consistent values throughout
+        compact_tables = [
+            table for layout, table in CANDLE_TABLES.items() if layout.is_compact
+        ]
+        factor = 10 ** (required - (scale or 0))
+        for table in compact_tables if scale is not None else []:
+            # SQLite turns integers overflowing while rescaling into floats, instead of failing like inserting them
+            largest = connection.execute(
+                select(
+                    *(func.max(func.abs(getattr(table, key))) for key in DECIMAL_KEYS)
+                ).where(table.market_id == market_id)  # type: ignore
+            ).one()
+            if max(value or 0 for value in largest) * factor > INT64_MAX:
+                raise OverflowError(
+                    f"Stored candles exceed 64 bit integers at scale {required}."
+                )
+
+            connection.execute(
+                update(table)
+                .where(table.market_id == market_id)  # type: ignore
+                .values({key: getattr(table, key) * factor for key in DECIMAL_KEYS})
+            )
+        connection.execute(
+            update(SqliteMarket)
+            .where(SqliteMarket.id == market_id)  # type: ignore
+            .values(scale=required)
+        )
+        return required
+
+    def _apply_bulk_load_pragmas(self, connection: Connection) -> None:
+        # Connections of from_path keep the cache size they were configured with
+        if connection.info.get("configured"):
+            return
+
+        for pragma in BULK_LOAD_PRAGMAS:
+            connection.exec_driver_sql(pragma)
+
+    @staticmethod
+    def _create_engine(
+        path: str,
+        pragmas: List[str],
+        pool_size: int,
+        pool_timeout: float,
+    ) -> Engine:
+        engine = create_engine(
+            f"sqlite:///{path}",
+            poolclass=QueuePool,
+            pool_size=pool_size,
+            max_overflow=0,
+            pool_timeout=pool_timeout,
+        )
+
+        @event.listens_for(engine, "connect")
+        def configure(dbapi_connection: Any, connection_record: Any) -> None:
+            cursor = dbapi_connection.cursor()
+            for pragma in pragmas:
+                cursor.execute(pragma)
+            cursor.close()
+            connection_record.info["configured"] = True
+
+        return engine
+
+    def _delete_oldest_batch(
+        self,
+        exchange_id: int,
+        market_id: int,
+        resolution_id: int,
+        before: datetime,
+        batch_size: int,
+    ) -> int:
+        with Session(self._engine) as session:
+            of_cluster = (
+                (col(self._candle.exchange_id) == exchange_id)
+                & (col(self._candle.market_id) == market_id)
+                & (col(self._candle.resolution_id) == resolution_id)
+            )
+            started_at = col(self._candle.started_at)
+
+            # The batch ends at the started_at of its last candle (a range scan from the cluster's tail on), so the
+            # batch is deleted as one range of the unique candle key. Without a full batch left, the range ends at before.
+            before_started_at = self._to_started_at(before)
+            batch_end = (
+                select(started_at)
+                .where(of_cluster & (started_at < before_started_at))
+                .order_by(started_at)
+                .offset(batch_size - 1)
+                .limit(1)
+                .scalar_subquery()
+            )
+            stmnt = delete(self._candle).where(
+                of_cluster
+                & (started_at < before_started_at)
+                & (started_at <= func.coalesce(batch_end, before_started_at))
+            )
+            deleted = session.connection().execute(stmnt).rowcount
+
+            if deleted and (
+                sqlite_cluster := self._query_cluster(
+                    exchange_id,
+                    market_id,
+                    resolution_id,
+                    session,
+                )
+            ):
+                tail = select(func.min(started_at)).where(of_cluster)
+                if (tail_started_at := session.exec(tail).one()) is not None:
+                    sqlite_cluster.tail_started_at = self._from_started_at(
+                        tail_started_at
+                    )
+                    sqlite_cluster.size -= deleted
+                    session.add(sqlite_cluster)
+                else:
+                    session.delete(sqlite_cluster)
+
+            session.commit()
+            return deleted
+
+    def _to_utc(self, date: datetime) -> datetime:
+        # Dates are stored as naive UTC, so compared values must not carry another timezone
+        return date.astimezone(timezone.utc).replace(tzinfo=None)
+
+    def _to_started_at(self, date: datetime) -> datetime | int:
+        # The value the started_at column of the layout holds for the given date
+        if self._layout.is_compact:
+            return int(date.timestamp())
+        return self._to_utc(date)
+
+    def _from_started_at(self, started_at: datetime | int) -> datetime:
+        # The naive UTC date a started_at value of the layout stands for
+        if isinstance(started_at, int):
+            return datetime.fromtimestamp(started_at, timezone.utc).replace(tzinfo=None)
+        return started_at
+
+    def _to_epoch(self, started_at: Any) -> Any:
+        # Expression converting a started_at column to epoch seconds, which compact candles already are
+        if self._layout.is_compact and started_at is self._candle.started_at:
+            return started_at
+        return cast(func.strftime("%s", started_at), Integer)
+
+    def _query_scale(
+        self,
+        market_id: int,
+        connection: Session | Connection,
+    ) -> int | None:
+        # Read within the transaction at hand, since another writer may have grown the scale meanwhile
+        if not self._layout.is_compact:
+            return None
+
+        stmnt = select(SqliteMarket.scale).where(SqliteMarket.id == market_id)
+        return connection.execute(stmnt).scalar_one()
+
+    def _cursor(self, stmnt: Select[Any], session: Session) -> DBAPICursor:
+        # Plain tuples straight from the DBAPI cursor skip result processing of SQLAlchemy Rows entirely
+        cursor = session.connection().execute(stmnt).cursor
+        assert cursor is not None, "Statement returned no rows to fetch."
+        return cursor
+
+    def _to_candles(
+        self,
+        rows: Sequence[Any],
+        exchange: Exchange,
+        market: str,
+        resolution: ResolutionDetail,
+        scale: int | None = None,
+    ) -> List[Candle]:
+        # All rows belong to the same cluster, so exchange, market and resolution are shared by all candles.
+        # started_at comes as the ISO formatted string sqlite stores DateTime columns as (or epoch seconds).
+        def to_decimal(value: Any) -> Decimal:
+            return Decimal(value)
+
+        def to_date(started_at: Any) -> datetime:
+            return datetime.fromisoformat(started_at).replace(tzinfo=timezone.utc)
+
+        if self._layout.is_compact:
+            factor = Decimal(1).scaleb(-(scale or 0))
+
+            def to_decimal(value: Any) -> Decimal:
+                return Decimal(value) * factor
+
+            def to_date(started_at: Any) -> datetime:
+                return datetime.fromtimestamp(started_at, timezone.utc)
+
+        return [
+            Candle(
+                id=id,
+                exchange=exchange,
+                market=market,
+                resolution=resolution,
+                started_at=to_date(started_at),
+                open=to_decimal(open),
+                high=to_decimal(high),
+                low=to_decimal(low),
+                close=to_decimal(close),
+                base_token_volume=to_decimal(base_token_volume),
+                trades=trades,
+                usd_volume=to_decimal(usd_volume),
+                starting_open_interest=to_decimal(starting_open_interest),
+            )
+            for (
+                id,
+                started_at,
+                open,
+                high,
+                low,
+                close,
+                base_token_volume,
+                trades,
+                usd_volume,
+                starting_open_interest,
+            ) in rows
+        ]
+
+    def _to_candle_frame(
+        self,
+        exchange: Exchange,
+        market: str,
+        resolution: ResolutionDetail,
+        rows: npt.NDArray[Any],
+        values: npt.NDArray[np.float64 | np.int64],
+        scale: int | None,
+    ) -> CandleFrame:
+        return CandleFrame(
+            exchange=exchange,
+            market=market,
+            resolution=resolution,
+            started_at=rows[:, 0].astype(np.int64),
+            trades=rows[:, 1].astype(np.int64),
+            **{
+                key: np.ascontiguousarray(values[:, i])
+                for i, key in enumerate(DECIMAL_KEYS)
+            },
+            scale=scale,
+        )
+
+    def _to_scaled_integers(
+        self,
+        values: npt.NDArray[np.object_],
+        scale: int,
+    ) -> npt.NDArray[np.int64]:
+        # Digits beyond scale are rounded half to even, values exceeding 64 bit integers raise OverflowError
+        scaled = [
+            int(Decimal(value).scaleb(scale).to_integral_value())
+            for value in values.ravel().tolist()
+        ]
+        return np.array(scaled, dtype=np.int64).reshape(values.shape)
+
+    def _rescale(
+        self,
+        values: npt.NDArray[np.int64],
+        stored_scale: int,
+        scale: int,
+    ) -> npt.NDArray[np.int64]:
+        # Integer arithmetic only, numpy would silently wrap around on overflow, so it is checked beforehand
+        if scale >= stored_scale:
+            factor = 10 ** (scale - stored_scale)
+            if values.size and int(np.abs(values).max()) > INT64_MAX // factor:
+                raise OverflowError(f"Candles exceed 64 bit integers at scale {scale}.")
+            return values * factor
+
+        # Floor division leaves a remainder in [0, divisor), by which the quotient gets rounded half to even
+        divisor = 10 ** (stored_scale - scale)
+        quotients, remainders = np.divmod(values, divisor)
+        round_up = (2 * remainders > divisor) | (
+            (2 * remainders == divisor) & (quotients % 2 == 1)
+        )
+        return quotients + round_up
 
     def _look_up_foreign_keys(
         self,
@@ -196,106 +1390,185 @@ class SqliteCandleStorage(CandleStorage):
         market: str,
         resolution: ResolutionDetail,
         session: Session,
-    ) -> Tuple[SqliteExchange, SqliteMarket, SqliteResolution] | None:
-        sqlite_exchange = tu.lookup_sqlite_exchange(exchange, session)
-        sqlite_market = tu.lookup_sqlite_market(market, session)
-        sqlite_resolution = tu.lookup_sqlite_resolution(resolution, session)
+    ) -> Tuple[int, int, int] | None:
+        exchange_id = self._dimensions.exchange_id(exchange, session)
+        market_id = self._dimensions.market_id(market, session)
+        resolution_id = self._dimensions.resolution_id(resolution, session)
 
-        if not (sqlite_exchange and sqlite_market and sqlite_resolution):
+        if not (exchange_id and market_id and resolution_id):
             return None
 
-        return sqlite_exchange, sqlite_market, sqlite_resolution
+        return exchange_id, market_id, resolution_id
 
-    def _query_head_and_tail(
+    def _look_up_or_insert_foreign_keys(
         self,
-        sqlite_exchange: SqliteExchange,
-        sqlite_market: SqliteMarket,
-        sqlite_resolution: SqliteResolution,
+        exchange: Exchange,
+        market: str,
+        resolution: ResolutionDetail,
         session: Session,
-    ) -> Tuple[Candle, Candle] | None:
-        head = self._query_head(
-            sqlite_exchange,
-            sqlite_market,
-            sqlite_resolution,
-            session,
-        )
+    ) -> Tuple[int, int, int]:
+        exchange_id = self._dimensions.exchange_id(exchange, session, insert=True)
+        market_id = self._dimensions.market_id(market, session, insert=True)
+        resolution_id = self._dimensions.resolution_id(resolution, session, insert=True)
 
-        tail = self._query_tail(
-            sqlite_exchange,
-            sqlite_market,
-            sqlite_resolution,
-            session,
+        assert exchange_id and market_id and resolution_id
+        return exchange_id, market_id, resolution_id
+
+    def _query_checkpoint(
+        self,
+        exchange_id: int,
+        market_id: int,
+        resolution_id: int,
+        session: Session,
+    ) -> SqliteBackfillCheckpoint | None:
+        stmnt = select(SqliteBackfillCheckpoint).where(
+            (SqliteBackfillCheckpoint.exchange_id == exchange_id)
+            & (SqliteBackfillCheckpoint.market_id == market_id)
+            & (SqliteBackfillCheckpoint.resolution_id == resolution_id)
         )
+        return session.exec(stmnt).first()
 
-        return (head, tail) if head and tail else None
+    def _query_horizon(
+        self,
+        exchange_id: int,
+        market_id: int,
+        resolution_id: int,
+        session: Session,
+    ) -> SqliteMarketHorizon | None:
+        stmnt = select(SqliteMarketHorizon).where(
+            (SqliteMarketHorizon.exchange_id == exchange_id)
+            & (SqliteMarketHorizon.market_id == market_id)
+            & (SqliteMarketHorizon.resolution_id == resolution_id)
+        )
+        return session.exec(stmnt).first()
 
-    def _query_head(
+    def _query_cluster(
         self,
-        sqlite_exchange: SqliteExchange,
-        sqlite_market: SqliteMarket,
-        sqlite_resolution: SqliteResolution,
+        exchange_id: int,
+        market_id: int,
+        resolution_id: int,
         session: Session,
-    ) -> Candle | None:
-        head_statement = (
-            select(SqliteCandle)
-            .where(
-                (SqliteCandle.exchange_id == sqlite_exchange.id)
-                & (SqliteCandle.market_id == sqlite_market.id)
-                & (SqliteCandle.resolution_id == sqlite_resolution.id)
-            )
-            .order_by(desc(SqliteCandle.started_at))
-            .limit(1)
+    ) -> SqliteCluster | None:
+        stmnt = select(SqliteCluster).where(
+            (SqliteCluster.exchange_id == exchange_id)
+            & (SqliteCluster.market_id == market_id)
+            & (SqliteCluster.resolution_id == resolution_id)
         )
+        return session.exec(stmnt).first()
+
+    def _columns_of(self, candle: Any) -> List[Any]:
+        # Columns of CANDLE_KEYS for the candle table (or an alias of it). Tables without id select NULL instead.
+        return [
+            getattr(candle, key) if hasattr(self._candle, key) else null().label(key)
+            for key in CANDLE_KEYS
+        ]
 
-        head: Candle | None = None
+    def _count_candles(
+        self,
+        exchange_id: int,
+        market_id: int,
+        resolution_id: int,
+        tail_started_at: datetime | int,
+        head_started_at: datetime | int,
+        connection: Connection,
+    ) -> int:
+        stmnt = select(func.count()).where(
+            (col(self._candle.exchange_id) == exchange_id)
+            & (col(self._candle.market_id) == market_id)
+            & (col(self._candle.resolution_id) == resolution_id)
+            & (col(self._candle.started_at) >= tail_started_at)
+            & (col(self._candle.started_at) <= head_started_at)
+        )
+        return connection.execute(stmnt).scalar_one()
 
-        if head_results := session.exec(head_statement).first():
-            head = self._to_candles([head_results])[0]
+    def _candle_of_cluster(self, candle: Any, started_at: Any) -> Any:
+        # The cluster table holds DateTime columns regardless of the layout
+        if self._layout.is_compact:
+            started_at = self._to_epoch(started_at)
 
-        return head
+        return (
+            (candle.exchange_id == SqliteCluster.exchange_id)
+            & (candle.market_id == SqliteCluster.market_id)
+            & (candle.resolution_id == SqliteCluster.resolution_id)
+            & (candle.started_at == started_at)
+        )
 
-    def _query_tail(
+    def _track_cluster(
         self,
-        sqlite_exchange: SqliteExchange,
-        sqlite_market: SqliteMarket,
-        sqlite_resolution: SqliteResolution,
+        exchange_id: int,
+        market_id: int,
+        resolution_id: int,
+        head_started_at: datetime,
+        tail_started_at: datetime,
+        added: int,
         session: Session,
-    ) -> Candle | None:
-        tail_statement = (
-            select(SqliteCandle)
-            .where(
-                (SqliteCandle.exchange_id == sqlite_exchange.id)
-                & (SqliteCandle.market_id == sqlite_market.id)
-                & (SqliteCandle.resolution_id == sqlite_resolution.id)
+    ) -> None:
+        # Keeps the cluster's metadata in step with the candles stored within the same transaction
+        if sqlite_cluster := self._query_cluster(
+            exchange_id,
+            market_id,
+            resolution_id,
+            session,
+        ):
+            sqlite_cluster.head_started_at = max(
+                sqlite_cluster.head_started_at,
+                head_started_at,
+            )
+            sqlite_cluster.tail_started_at = min(
+                sqlite_cluster.tail_started_at,
+                tail_started_at,
+            )
+            sqlite_cluster.size += added
+        else:
+            sqlite_cluster = SqliteCluster(
+                exchange_id=exchange_id,
+                market_id=market_id,
+                resolution_id=resolution_id,
+                head_started_at=head_started_at,
+                tail_started_at=tail_started_at,
+                size=added,
             )
-            .order_by(asc(SqliteCandle.started_at))
-            .limit(1)
-        )
 
-        tail: Candle | None = None
+        session.add(sqlite_cluster)
 
-        if tail_results := session.exec(tail_statement).first():
-            tail = self._to_candles([tail_results])[0]
+    def _set_up_schema(self) -> None:
+        # Databases created before cluster metadata existed get it derived from their candles once
+        has_cluster_table = inspect(self._engine).has_table(
+            str(SqliteCluster.__tablename__)
+        )
+        SQLModel.metadata.create_all(self._engine)
+        if not has_cluster_table:
+            self._backfill_cluster_table()
+        self._add_market_scale_column()
 
-        return tail
+    def _backfill_cluster_table(self) -> None:
+        keys = ["exchange_id", "market_id", "resolution_id"]
+        columns = [getattr(self._candle, key) for key in keys]
+        head_started_at: Any = func.max(self._candle.started_at)
+        tail_started_at: Any = func.min(self._candle.started_at)
+        if self._layout.is_compact:
+            head_started_at = func.datetime(head_started_at, "unixepoch")
+            tail_started_at = func.datetime(tail_started_at, "unixepoch")
+        aggregates = [head_started_at, tail_started_at, func.count()]
 
-    def _query_amount(
-        self,
-        sqlite_exchange: SqliteExchange,
-        sqlite_market: SqliteMarket,
-        sqlite_resolution: SqliteResolution,
-        session: Session,
-    ) -> int | None:
-        stmnt = select(SqliteCandle).where(
-            (SqliteCandle.exchange_id == sqlite_exchange.id)
-            & (SqliteCandle.market_id == sqlite_market.id)
-            & (SqliteCandle.resolution_id == sqlite_resolution.id)
+        stmnt = insert(SqliteCluster).from_select(
+            [
+                *keys,
+                "head_started_at",
+                "tail_started_at",
+                "size",
+            ],
+            select(*columns, *aggregates).group_by(*columns),
         )
 
-        count_query = (
-            stmnt.with_only_columns(func.count())
-            .order_by(None)
-            .select_from(stmnt.get_final_froms()[0])
-        )
+        with self._engine.begin() as conn:
+            conn.execute(stmnt)
 
-        return session.scalar(count_query)
+    def _add_market_scale_column(self) -> None:
+        # Databases created before CandleLayout.COMPACT existed lack the column for the market's scale
+        columns = inspect(self._engine).get_columns(str(SqliteMarket.__tablename__))
+        if "scale" not in (column["name"] for column in columns):
+            with self._engine.begin() as conn:
+                conn.exec_driver_sql(
+                    f"ALTER TABLE {SqliteMarket.__tablename__} ADD COLUMN scale INTEGER"
+                )
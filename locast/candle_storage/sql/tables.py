@@ -23,6 +23,8 @@ class SqliteMarket(SQLModel, table=True):
     __tablename__ = "market"  # type: ignore
     id: int = Field(default=None, primary_key=True)
     market: str = Field(nullable=False, unique=True)
+    # Decimal places of the market's prices and volumes in compact_candle (see CandleLayout.COMPACT)
+    scale: int | None = Field(default=None, nullable=True)
 
 
 # NOTE: For id to be NULL in db (which makes no sense) you could set nullable=True.
@@ -80,3 +82,210 @@ class SqliteCandle(SQLModel, table=True):
             name="unique_candle_constraint",
         ),
     )
+
+
+# Layout of CandleLayout.COMPACT: started_at as epoch seconds, prices and volumes as integers scaled by 10^market.scale
+class SqliteCompactCandle(SQLModel, table=True):
+    __tablename__ = "compact_candle"  # type: ignore
+    id: int | None = Field(default=None, primary_key=True)
+    exchange_id: int = Field(
+        default=None,
+        foreign_key=("exchange.id"),
+        nullable=False,
+        index=True,
+    )
+    market_id: int = Field(
+        default=None,
+        foreign_key=("market.id"),
+        nullable=False,
+        index=True,
+    )
+    resolution_id: int = Field(
+        default=None,
+        foreign_key=("resolution.id"),
+        nullable=False,
+        index=True,
+    )
+
+    started_at: int
+
+    open: int
+    high: int
+    low: int
+    close: int
+
+    base_token_volume: int
+    trades: int
+    usd_volume: int
+    starting_open_interest: int
+
+    __table_args__ = (
+        Index(
+            "compound_index_compact_exchange_market_resolution",
+            "exchange_id",
+            "market_id",
+            "resolution_id",
+        ),
+        UniqueConstraint(
+            "exchange_id",
+            "market_id",
+            "resolution_id",
+            "started_at",
+            name="unique_compact_candle_constraint",
+        ),
+    )
+
+
+# Layout of CandleLayout.CLUSTERED: A WITHOUT ROWID table, whose primary key (series and time) is the one and only
+# B-tree. Rows are stored in key order, so range scans read them sequentially and inserts maintain no other index.
+class SqliteClusteredCandle(SQLModel, table=True):
+    __tablename__ = "clustered_candle"  # type: ignore
+    exchange_id: int = Field(foreign_key=("exchange.id"), primary_key=True)
+    market_id: int = Field(foreign_key=("market.id"), primary_key=True)
+    resolution_id: int = Field(foreign_key=("resolution.id"), primary_key=True)
+    started_at: int = Field(primary_key=True)
+
+    open: int
+    high: int
+    low: int
+    close: int
+
+    base_token_volume: int
+    trades: int
+    usd_volume: int
+    starting_open_interest: int
+
+    __table_args__ = {"sqlite_with_rowid": False}
+
+
+class SqliteBackfillCheckpoint(SQLModel, table=True):
+    __tablename__ = "backfill_checkpoint"  # type: ignore
+    id: int | None = Field(default=None, primary_key=True)
+    exchange_id: int = Field(
+        default=None,
+        foreign_key=("exchange.id"),
+        nullable=False,
+    )
+    market_id: int = Field(
+        default=None,
+        foreign_key=("market.id"),
+        nullable=False,
+    )
+    resolution_id: int = Field(
+        default=None,
+        foreign_key=("resolution.id"),
+        nullable=False,
+    )
+
+    start_date: datetime
+    oldest_started_at: datetime
+    updated_at: datetime
+
+    __table_args__ = (
+        UniqueConstraint(
+            "exchange_id",
+            "market_id",
+            "resolution_id",
+            name="unique_backfill_checkpoint_constraint",
+        ),
+    )
+
+
+class SqliteMarketHorizon(SQLModel, table=True):
+    __tablename__ = "market_horizon"  # type: ignore
+    id: int | None = Field(default=None, primary_key=True)
+    exchange_id: int = Field(
+        default=None,
+        foreign_key=("exchange.id"),
+        nullable=False,
+    )
+    market_id: int = Field(
+        default=None,
+        foreign_key=("market.id"),
+        nullable=False,
+    )
+    resolution_id: int = Field(
+        default=None,
+        foreign_key=("resolution.id"),
+        nullable=False,
+    )
+
+    horizon: datetime
+    found_at: datetime
+
+    __table_args__ = (
+        UniqueConstraint(
+            "exchange_id",
+            "market_id",
+            "resolution_id",
+            name="unique_market_horizon_constraint",
+        ),
+    )
+
+
+# Metadata of a cluster, maintained within the transactions that store or delete its candles
+class SqliteCluster(SQLModel, table=True):
+    __tablename__ = "cluster"  # type: ignore
+    id: int | None = Field(default=None, primary_key=True)
+    exchange_id: int = Field(
+        default=None,
+        foreign_key=("exchange.id"),
+        nullable=False,
+    )
+    market_id: int = Field(
+        default=None,
+        foreign_key=("market.id"),
+        nullable=False,
+    )
+    resolution_id: int = Field(
+        default=None,
+        foreign_key=("resolution.id"),
+        nullable=False,
+    )
+
+    head_started_at: datetime
+    tail_started_at: datetime
+    size: int
+
+    __table_args__ = (
+        UniqueConstraint(
+            "exchange_id",
+            "market_id",
+            "resolution_id",
+            name="unique_cluster_constraint",
+        ),
+    )
+
+
+# Gaps of a cluster, which the exchange could not fill when refetched
+class SqliteUnfillableGap(SQLModel, table=True):
+    __tablename__ = "unfillable_gap"  # type: ignore
+    id: int | None = Field(default=None, primary_key=True)
+    exchange_id: int = Field(
+        default=None,
+        foreign_key=("exchange.id"),
+        nullable=False,
+    )
+    market_id: int = Field(
+        default=None,
+        foreign_key=("market.id"),
+        nullable=False,
+    )
+    resolution_id: int = Field(
+        default=None,
+        foreign_key=("resolution.id"),
+        nullable=False,
+    )
+
+    start: datetime
+    count: int
+
+    __table_args__ = (
+        UniqueConstraint(
+            "exchange_id",
+            "market_id",
+            "resolution_id",
+            "start",
+            name="unique_unfillable_gap_constraint",
+        ),
+    )
@@ -50,3 +50,16 @@ def log_start_date_shifted_to_horizon(
 
 def log_redundant_call(emoji: str, message: str) -> None:
     print(f"{emoji} {message}")
+
+
+def log_failed_update(
+    emoji: str,
+    exchange: Exchange,
+    market: str,
+    resolution: ResolutionDetail,
+    exception: Exception,
+) -> None:
+    detail = f"{market}, {resolution.notation}"
+    print(
+        f"{emoji} Attention: Updating {detail} on {exchange.name} failed, retrying on the next connection: {exception!r} {emoji}"
+    )
@@ -0,0 +1,13 @@
+from dataclasses import dataclass
+
+from locast.store_manager.cluster_spec import ClusterSpec
+
+
+@dataclass
+class ClusterResult:
+    spec: ClusterSpec
+    exception: Exception | None = None
+
+    @property
+    def succeeded(self) -> bool:
+        return self.exception is None
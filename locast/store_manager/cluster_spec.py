@@ -0,0 +1,11 @@
+from dataclasses import dataclass
+from datetime import datetime
+
+from locast.candle.exchange_resolution import ResolutionDetail
+
+
+@dataclass
+class ClusterSpec:
+    market: str
+    resolution: ResolutionDetail
+    start_date: datetime | None = None  # Only needed to create a cluster
@@ -0,0 +1,20 @@
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Dict
+
+from locast.candle.exchange_resolution import ResolutionDetail, Seconds
+
+
+@dataclass
+class RetentionPolicy:
+    """
+    Declares how long candles are kept per resolution, e.g. {Seconds.ONE_MINUTE: timedelta(days=90)}.
+    Resolutions without an entry keep their full history.
+    """
+
+    max_ages: Dict[Seconds, timedelta] = field(default_factory=dict)
+
+    def cutoff(self, resolution: ResolutionDetail, now: datetime) -> datetime | None:
+        if (max_age := self.max_ages.get(resolution.seconds)) is None:
+            return None
+        return now - max_age
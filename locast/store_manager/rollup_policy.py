@@ -0,0 +1,18 @@
+from dataclasses import dataclass, field
+from typing import Dict, List
+
+from locast.candle.exchange_resolution import ResolutionDetail, Seconds
+
+
+@dataclass
+class RollupPolicy:
+    """
+    Declares which coarser resolutions are materialized from a base resolution, e.g.
+    {Seconds.ONE_MINUTE: [DydxResolution.ONE_HOUR, DydxResolution.ONE_DAY]}. Their clusters are refreshed from the
+    base cluster whenever candles get stored into it, holding closed buckets only.
+    """
+
+    rollups: Dict[Seconds, List[ResolutionDetail]] = field(default_factory=dict)
+
+    def rollups_of(self, resolution: ResolutionDetail) -> List[ResolutionDetail]:
+        return self.rollups.get(resolution.seconds, [])
@@ -1,19 +1,32 @@
-from datetime import datetime
-from typing import Dict, List
+import asyncio
+from datetime import datetime, timedelta, timezone
+from typing import Awaitable, Callable, Dict, List, Set, Tuple, TypeVar
 
 from locast.candle.candle_utility import CandleUtility as cu
 from locast.candle.candle import Candle
+from locast.candle.candle_frame import CandleFrame
 from locast.candle.exchange import Exchange
 from locast.candle.exchange_resolution import ResolutionDetail
+from locast.candle.gap import Gap
+from locast.candle_feed.candle_feed import CandleFeed
 from locast.candle_fetcher.candle_fetcher import CandleFetcher
+from locast.candle_storage.backfill_checkpoint import BackfillCheckpoint
 from locast.candle_storage.cluster_info import ClusterInfo
 from locast.candle_storage.candle_storage import CandleStorage
+from locast.candle_storage.market_horizon import MarketHorizon
+from locast.candle_storage.on_conflict import OnConflict
+from locast.store_manager.cluster_result import ClusterResult
+from locast.store_manager.cluster_spec import ClusterSpec
+from locast.store_manager.retention_policy import RetentionPolicy
+from locast.store_manager.rollup_policy import RollupPolicy
 from locast.logging_functions import (
+    log_failed_update,
     log_redundant_call,
     log_start_date_shifted_to_horizon,
 )
 
-# TODO: Expand API by adding convenience methods such as def retrieve_segment(from, to, exchange, market, resolution) -> List[Candle]: ...
+S = TypeVar("S")
+T = TypeVar("T")
 
 
 class StoreManager:
@@ -21,11 +34,23 @@ class StoreManager:
         self,
         candle_fetcher: CandleFetcher,
         candle_storage: CandleStorage,
+        horizon_ttl: timedelta | None = None,
+        retention_policy: RetentionPolicy | None = None,
+        rollup_policy: RollupPolicy | None = None,
     ) -> None:
         self._candle_fetcher = candle_fetcher
         self._candle_storage = candle_storage
 
-        self._horizon_cache: Dict[str, datetime] = {}
+        # Clusters are trimmed to the retention policy whenever they get updated
+        self._retention_policy = retention_policy
+
+        # Rollup clusters are refreshed within the transaction that stores candles into their base cluster, missing
+        # ones are derived from it afterwards
+        self._rollup_policy = rollup_policy
+
+        # Horizons are persisted in the candle storage and only searched again once they are older than horizon_ttl
+        self._horizon_ttl = horizon_ttl
+        self._horizon_cache: Dict[str, MarketHorizon] = {}
 
     async def create_cluster(
         self,
@@ -33,35 +58,98 @@ class StoreManager:
         resolution: ResolutionDetail,
         start_date: datetime,
         replace_existing_cluster: bool = False,
+        streaming: bool = False,
     ) -> None:
+        exchange = self._candle_fetcher.exchange
+
         # 1) Check if cluster exists in candle store
-        cluster_info = await self.get_cluster_info(
-            self._candle_fetcher.exchange,
-            market,
-            resolution,
-        )
+        cluster_info = await self.get_cluster_info(exchange, market, resolution)
 
         if cluster_info.newest_candle:
             if not replace_existing_cluster:
+                # An interrupted streaming backfill is continued instead of rejected
+                if await self._candle_storage.retrieve_checkpoint(
+                    exchange,
+                    market,
+                    resolution,
+                ):
+                    await self.resume_cluster(market, resolution, start_date)
+                    return
+
                 raise ExistingClusterException(
                     f"Cluster already exists for market {market} and resolution {resolution.notation}."
                 )
 
-            await self.delete_cluster(
-                self._candle_fetcher.exchange,
-                market,
-                resolution,
-            )
+            await self.delete_cluster(exchange, market, resolution)
 
         start_date = await self._check_horizon(market, resolution, start_date)
 
+        # Streaming stores every page as it arrives, which keeps memory bounded by page size and keeps
+        # already stored pages, if the backfill gets interrupted.
+        if streaming:
+            await self._backfill(market, resolution, start_date)
+            await self._candle_storage.delete_checkpoint(exchange, market, resolution)
+            return
+
         cluster = await self._candle_fetcher.fetch_candles_up_to_now(
             market,
             resolution,
             start_date,
         )
 
-        await self._candle_storage.store_candles(cluster)
+        await self._store_with_rollups(
+            exchange, market, resolution, cluster, on_conflict=None
+        )
+
+    async def resume_cluster(
+        self,
+        market: str,
+        resolution: ResolutionDetail,
+        start_date: datetime | None = None,
+    ) -> None:
+        """
+        Continues an interrupted streaming backfill from the oldest candle its checkpoint recorded back to the start
+        date of the checkpoint (or the provided start_date) and brings the cluster up to date afterwards. Gaps left in
+        between stored pages are repaired (see repair_cluster).
+        """
+        exchange = self._candle_fetcher.exchange
+
+        checkpoint = await self._candle_storage.retrieve_checkpoint(
+            exchange,
+            market,
+            resolution,
+        )
+
+        if not checkpoint:
+            raise MissingCheckpointException(
+                f"No backfill to resume for market {market} and resolution {resolution.notation}."
+            )
+
+        start_date = await self._check_horizon(
+            market,
+            resolution,
+            start_date or checkpoint.start_date,
+        )
+
+        cluster_info = await self.get_cluster_info(exchange, market, resolution)
+
+        if not cluster_info.oldest_candle:
+            await self._backfill(market, resolution, start_date)
+        else:
+            # Only pages up to the checkpoint are known to be complete, older candles stored otherwise are refetched
+            if start_date < (tail := checkpoint.oldest_started_at):
+                await self._backfill(market, resolution, start_date, tail)
+
+            if not (
+                await self.get_cluster_info(exchange, market, resolution)
+            ).is_uptodate:
+                await self.update_cluster(exchange, market, resolution)
+
+            # Passes interrupted one after another may leave holes between their pages, which neither the tail
+            # nor the head reaches
+            await self.repair_cluster(exchange, market, resolution)
+
+        await self._candle_storage.delete_checkpoint(exchange, market, resolution)
 
     async def retrieve_cluster(
         self,
@@ -78,6 +166,31 @@ class StoreManager:
 
         return await self._candle_storage.retrieve_cluster(exchange, market, resolution)
 
+    async def retrieve_cluster_frame(
+        self,
+        exchange: Exchange,
+        market: str,
+        resolution: ResolutionDetail,
+        scale: int | None = None,
+    ) -> CandleFrame:
+        """
+        Retrieves a cluster as columnar CandleFrame, which is far lighter than a List[Candle] for large clusters.
+        If scale is provided, prices and volumes are fixed point int64 values (see CandleFrame), float64 otherwise.
+        """
+        cluster_info = await self.get_cluster_info(exchange, market, resolution)
+
+        if cluster_info.size == 0:
+            raise MissingClusterException(
+                f"Cluster does not exist for market {market} and resolution {resolution.notation}."
+            )
+
+        return await self._candle_storage.retrieve_cluster_frame(
+            exchange,
+            market,
+            resolution,
+            scale,
+        )
+
     async def retrieve_newest_candles(
         self,
         exchange: Exchange,
@@ -101,33 +214,382 @@ class StoreManager:
             amount_to_retrieve,
         )
 
-    async def update_cluster(
+    async def retrieve_segment(
         self,
         exchange: Exchange,
         market: str,
         resolution: ResolutionDetail,
-    ) -> None:
-        cluster_info = await self.get_cluster_info(exchange, market, resolution)
+        start_date: datetime,
+        end_date: datetime,
+    ) -> List[Candle]:
+        """
+        Retrieves the candles of a cluster within a given time range, without loading the rest of the cluster.
 
-        if cluster_info.is_uptodate:
-            next_tick = cu.next_tick(resolution)
-            msg = f"Cluster is already up to date. Try again after {next_tick}."
-            log_redundant_call("♻️", msg)
-            return
+        Args:
+            start_date (datetime): The start date of the time range (the started_at value of the oldest candle in the range).
+            end_date (datetime): The end date of the time range (the theoretical end date of the newest candle in the range).
 
-        if not (head := cluster_info.newest_candle):
+        Returns:
+            List[Candle]: The candles within the time range, newest first.
+        """
+        cluster_info = await self.get_cluster_info(exchange, market, resolution)
+
+        if cluster_info.size == 0:
             raise MissingClusterException(
                 f"Cluster does not exist for market {market} and resolution {resolution.notation}."
             )
 
-        start_date = cu.add_one_resolution(head.started_at, resolution)
-        new_candles = await self._candle_fetcher.fetch_candles_up_to_now(
+        return await self._candle_storage.retrieve_segment(
+            exchange,
             market,
             resolution,
             start_date,
+            end_date,
         )
 
-        await self._candle_storage.store_candles(new_candles)
+    async def find_gaps(
+        self,
+        exchange: Exchange,
+        market: str,
+        resolution: ResolutionDetail,
+    ) -> List[Gap]:
+        """
+        Finds the ranges of candles missing in between the oldest and the newest candle of a cluster.
+
+        Returns:
+            List[Gap]: The gaps of the cluster, newest first.
+        """
+        cluster_info = await self.get_cluster_info(exchange, market, resolution)
+
+        if cluster_info.size == 0:
+            raise MissingClusterException(
+                f"Cluster does not exist for market {market} and resolution {resolution.notation}."
+            )
+
+        # A cluster spanning exactly as many candles as it holds has no gaps, which spares the scan
+        assert cluster_info.newest_candle and cluster_info.oldest_candle
+        span = cu.amount_of_candles_in_range(
+            cluster_info.oldest_candle.started_at,
+            cluster_info.newest_candle.started_at,
+            resolution,
+        )
+        if span + 1 == cluster_info.size:
+            return []
+
+        started_at = await self._candle_storage.retrieve_started_at(
+            exchange,
+            market,
+            resolution,
+        )
+        return cu.find_gaps(started_at, resolution)
+
+    async def repair_cluster(
+        self,
+        exchange: Exchange,
+        market: str,
+        resolution: ResolutionDetail,
+        concurrency: int = 4,
+        max_window: int = 1000,
+    ) -> List[Gap]:
+        """
+        Refetches only the candles missing in a cluster. Its gaps are coalesced into windows of at most max_window
+        candles, of which up to `concurrency` are fetched at once and upserted. Gaps the exchange cannot fill are
+        recorded and skipped by later repairs.
+
+        Returns:
+            List[Gap]: The gaps left in the cluster, newest first.
+        """
+        gaps = await self.find_gaps(exchange, market, resolution)
+        unfillable = await self._candle_storage.retrieve_unfillable_gaps(
+            exchange,
+            market,
+            resolution,
+        )
+        if not (to_fill := [gap for gap in gaps if gap not in unfillable]):
+            return gaps
+
+        async def fetch(window: Tuple[datetime, datetime]) -> List[Candle]:
+            return await self._candle_fetcher.fetch_candles(market, resolution, *window)
+
+        async def refetch(
+            windows: List[Tuple[datetime, datetime]],
+        ) -> List[List[Candle]]:
+            outcomes = await self._gather_bounded(windows, fetch, concurrency)
+
+            # Windows fetched successfully are kept, even if others failed
+            for outcome in outcomes:
+                if not isinstance(outcome, Exception):
+                    await self._store_with_rollups(
+                        exchange, market, resolution, outcome, OnConflict.REPLACE
+                    )
+            if exception := next(
+                (o for o in outcomes if isinstance(o, Exception)), None
+            ):
+                raise exception
+            return outcomes  # type: ignore
+
+        await refetch(cu.coalesce_gaps(to_fill, resolution, max_window))
+
+        # A gap still missing might just not have been reached by its window, so it is requested on its own. Only
+        # gaps the exchange responds to with nothing are recorded as unfillable.
+        gaps = await self.find_gaps(exchange, market, resolution)
+        remaining = [gap for gap in gaps if gap not in unfillable]
+        windows = [(gap.start, self._gap_end(gap, resolution)) for gap in remaining]
+        outcomes = await refetch(windows)
+        await self._candle_storage.store_unfillable_gaps(
+            exchange,
+            market,
+            resolution,
+            [gap for gap, outcome in zip(remaining, outcomes) if not outcome],
+        )
+        if any(outcomes):
+            gaps = await self.find_gaps(exchange, market, resolution)
+        return gaps
+
+    async def derive_cluster(
+        self,
+        exchange: Exchange,
+        market: str,
+        resolution: ResolutionDetail,
+        base_resolution: ResolutionDetail,
+    ) -> List[datetime]:
+        """
+        Derives the cluster of a resolution from the stored cluster of a finer base resolution, instead of fetching
+        it. Only buckets within the base cluster's head and tail are derived, and a derived cluster is only extended
+        by the buckets after its head, so it can be derived again whenever the base cluster grew.
+
+        Returns:
+            List[datetime]: Newest-first started_at of the derived candles, whose buckets lack base candles (see
+            find_gaps).
+        """
+        base_info = await self.get_cluster_info(exchange, market, base_resolution)
+
+        if not (base_info.newest_candle and base_info.oldest_candle):
+            raise MissingClusterException(
+                f"Cluster does not exist for market {market} and resolution {base_resolution.notation}."
+            )
+
+        start_date, end_date = self._closed_buckets(
+            base_info.oldest_candle.started_at,
+            base_info.newest_candle.started_at,
+            base_resolution,
+            resolution,
+        )
+
+        cluster_info = await self.get_cluster_info(exchange, market, resolution)
+        if head := cluster_info.newest_candle:
+            start_date = max(
+                start_date, cu.add_one_resolution(head.started_at, resolution)
+            )
+
+        # Gaps of the base cluster make the candles of their buckets partial, which is reported instead of hidden
+        partial = sorted(
+            {
+                bucket
+                for gap in await self.find_gaps(exchange, market, base_resolution)
+                for bucket in self._buckets_of(gap, base_resolution, resolution)
+                if start_date <= bucket < end_date
+            },
+            reverse=True,
+        )
+
+        # Segments of whole buckets, which bound memory by segment size instead of cluster size
+        segment = timedelta(
+            seconds=resolution.seconds
+            * max(1, 100_000 * base_resolution.seconds // resolution.seconds)
+        )
+        while start_date < end_date:
+            segment_end = min(start_date + segment, end_date)
+            base_candles = await self._candle_storage.retrieve_segment(
+                exchange,
+                market,
+                base_resolution,
+                start_date,
+                segment_end,
+            )
+            await self._candle_storage.store_candles(
+                cu.resample(base_candles, resolution),
+                OnConflict.IGNORE,
+            )
+            start_date = segment_end
+
+        return partial
+
+    async def update_cluster(
+        self,
+        exchange: Exchange,
+        market: str,
+        resolution: ResolutionDetail,
+    ) -> None:
+        new_candles = await self._fetch_update(exchange, market, resolution)
+
+        # Concurrent updates of the same cluster fetch overlapping candles, which are simply skipped
+        await self._store_update(
+            exchange,
+            market,
+            resolution,
+            new_candles,
+            OnConflict.IGNORE,
+        )
+
+    async def stream_clusters(
+        self,
+        specs: List[ClusterSpec],
+        candle_feed: CandleFeed,
+    ) -> None:
+        """
+        Keeps clusters up to date by a live candle feed, instead of polling. Whenever the feed (re)connects, the
+        clusters are updated over REST first (see update_clusters), to fill the gap since the last connection. From
+        then on, every candle is stored as soon as it closed. Runs until cancelled.
+
+        Raises:
+            MissingClusterException: If a cluster of the specs does not exist (see create_cluster).
+        """
+        exchange = self._candle_fetcher.exchange
+        assert candle_feed.exchange == exchange, (
+            f"Candle feed of {candle_feed.exchange.name} does not serve {exchange.name}."
+        )
+
+        for spec in specs:
+            cluster_info = await self.get_cluster_info(
+                exchange, spec.market, spec.resolution
+            )
+            if not cluster_info.newest_candle:
+                raise MissingClusterException(
+                    f"Cluster does not exist for market {spec.market} and resolution {spec.resolution.notation}."
+                )
+
+        # Clusters failing to update get no candles stored until a later connection updated them, as these would
+        # leave a hole behind the cluster's head (or start a cluster of their own, if it got deleted meanwhile)
+        unfilled: Set[Tuple[str, str]] = set()
+
+        async def fill_gaps() -> None:
+            # A cluster failing to update is left to the next connection, instead of ending the stream of all
+            unfilled.clear()
+            for result in await self.update_clusters(specs):
+                if exception := result.exception:
+                    unfilled.add((result.spec.market, result.spec.resolution.notation))
+                    log_failed_update(
+                        "🚨",
+                        exchange,
+                        result.spec.market,
+                        result.spec.resolution,
+                        exception,
+                    )
+
+        subscriptions = [(spec.market, spec.resolution) for spec in specs]
+        async for candle in candle_feed.stream_closed_candles(subscriptions, fill_gaps):
+            if (candle.market, candle.resolution.notation) in unfilled:
+                continue
+
+            # A closed candle supersedes the unfinished one, an update might have stored
+            await self._store_update(
+                exchange,
+                candle.market,
+                candle.resolution,
+                [candle],
+                OnConflict.REPLACE,
+            )
+
+    async def create_clusters(
+        self,
+        specs: List[ClusterSpec],
+        concurrency: int = 4,
+        replace_existing_cluster: bool = False,
+        streaming: bool = False,
+    ) -> List[ClusterResult]:
+        """
+        Creates many clusters concurrently. At most `concurrency` clusters are processed at once. Candle fetchers
+        limiting the requests they have in flight (e.g. DydxCandleFetcher's max_in_flight) share that limit among
+        all clusters.
+
+        Returns:
+            List[ClusterResult]: One result per spec, holding the exception if creating that cluster failed.
+        """
+
+        async def create(spec: ClusterSpec) -> None:
+            assert spec.start_date, "start_date must be provided to create a cluster."
+            await self.create_cluster(
+                spec.market,
+                spec.resolution,
+                spec.start_date,
+                replace_existing_cluster,
+                streaming,
+            )
+
+        outcomes = await self._gather_bounded(specs, create, concurrency)
+        return [
+            ClusterResult(spec, outcome if isinstance(outcome, Exception) else None)
+            for spec, outcome in zip(specs, outcomes)
+        ]
+
+    async def update_clusters(
+        self,
+        specs: List[ClusterSpec],
+        concurrency: int = 4,
+    ) -> List[ClusterResult]:
+        """
+        Updates many clusters within one fetch cycle. New candles of all clusters are fetched concurrently (see
+        create_clusters for how concurrency is limited) and then written within one single storage transaction.
+
+        Returns:
+            List[ClusterResult]: One result per spec, holding the exception if updating that cluster failed.
+        """
+        exchange = self._candle_fetcher.exchange
+
+        async def fetch_update(spec: ClusterSpec) -> List[Candle]:
+            return await self._fetch_update(exchange, spec.market, spec.resolution)
+
+        outcomes = await self._gather_bounded(specs, fetch_update, concurrency)
+
+        results = [
+            ClusterResult(spec, outcome if isinstance(outcome, Exception) else None)
+            for spec, outcome in zip(specs, outcomes)
+        ]
+        # The touched buckets of rollups get replaced within the same transaction as their base clusters' candles,
+        # missing rollups get derived once these are stored
+        clusters: List[List[Candle]] = []
+        conflicts: List[OnConflict | None] = []
+        for result, outcome in zip(results, outcomes):
+            if isinstance(outcome, list):
+                try:
+                    rollups = await self._roll_up(
+                        exchange,
+                        result.spec.market,
+                        result.spec.resolution,
+                        outcome,
+                        OnConflict.IGNORE,
+                    )
+                except Exception as e:
+                    result.exception = e
+                    continue
+                clusters += [outcome, *rollups]
+                conflicts += [OnConflict.IGNORE, *[OnConflict.REPLACE] * len(rollups)]
+
+        try:
+            await self._candle_storage.store_clusters(clusters, conflicts)
+        except Exception as e:
+            for result in results:
+                if result.succeeded:
+                    result.exception = e
+
+        for result in results:
+            if result.succeeded:
+                try:
+                    await self._seed_rollups(
+                        exchange,
+                        result.spec.market,
+                        result.spec.resolution,
+                    )
+                    await self._apply_retention(
+                        exchange,
+                        result.spec.market,
+                        result.spec.resolution,
+                    )
+                except Exception as e:
+                    result.exception = e
+
+        return results
 
     async def delete_cluster(
         self,
@@ -148,6 +610,25 @@ class StoreManager:
             resolution,
         )
 
+    async def trim_cluster(
+        self,
+        exchange: Exchange,
+        market: str,
+        resolution: ResolutionDetail,
+        before: datetime,
+    ) -> None:
+        """
+        Deletes all candles of a cluster that started before the given date, keeping the newer ones.
+        """
+        cluster_info = await self.get_cluster_info(exchange, market, resolution)
+
+        if not cluster_info.newest_candle:
+            raise MissingClusterException(
+                f"Cluster does not exist for market {market} and resolution {resolution.notation}."
+            )
+
+        await self._candle_storage.trim_cluster(exchange, market, resolution, before)
+
     async def get_cluster_info(
         self,
         exchange: Exchange,
@@ -156,15 +637,283 @@ class StoreManager:
     ) -> ClusterInfo:
         return await self._candle_storage.get_cluster_info(exchange, market, resolution)
 
+    async def _fetch_update(
+        self,
+        exchange: Exchange,
+        market: str,
+        resolution: ResolutionDetail,
+    ) -> List[Candle]:
+        cluster_info = await self.get_cluster_info(exchange, market, resolution)
+
+        if cluster_info.is_uptodate:
+            next_tick = cu.next_tick(resolution)
+            msg = f"Cluster is already up to date. Try again after {next_tick}."
+            log_redundant_call("♻️", msg)
+            return []
+
+        if not (head := cluster_info.newest_candle):
+            raise MissingClusterException(
+                f"Cluster does not exist for market {market} and resolution {resolution.notation}."
+            )
+
+        start_date = cu.add_one_resolution(head.started_at, resolution)
+        return await self._candle_fetcher.fetch_candles_up_to_now(
+            market,
+            resolution,
+            start_date,
+        )
+
+    async def _apply_retention(
+        self,
+        exchange: Exchange,
+        market: str,
+        resolution: ResolutionDetail,
+    ) -> None:
+        if not self._retention_policy:
+            return
+
+        # Rollups of a cluster are trimmed along with it, to their own retention
+        now = datetime.now(timezone.utc)
+        for rollup in [resolution, *self._rollups_of(resolution)]:
+            if before := self._retention_policy.cutoff(rollup, now):
+                await self._candle_storage.trim_cluster(
+                    exchange,
+                    market,
+                    rollup,
+                    before,
+                )
+
+    def _rollups_of(self, resolution: ResolutionDetail) -> List[ResolutionDetail]:
+        return self._rollup_policy.rollups_of(resolution) if self._rollup_policy else []
+
+    async def _store_update(
+        self,
+        exchange: Exchange,
+        market: str,
+        resolution: ResolutionDetail,
+        new_candles: List[Candle],
+        on_conflict: OnConflict,
+    ) -> None:
+        await self._store_with_rollups(
+            exchange,
+            market,
+            resolution,
+            new_candles,
+            on_conflict,
+        )
+        await self._apply_retention(exchange, market, resolution)
+
+    async def _store_with_rollups(
+        self,
+        exchange: Exchange,
+        market: str,
+        resolution: ResolutionDetail,
+        candles: List[Candle],
+        on_conflict: OnConflict | None,
+    ) -> None:
+        # Every path storing candles into a cluster goes through here, which keeps its rollups in step
+        if rollups := await self._roll_up(
+            exchange,
+            market,
+            resolution,
+            candles,
+            on_conflict,
+        ):
+            await self._candle_storage.store_clusters(
+                [candles, *rollups],
+                [on_conflict, *[OnConflict.REPLACE] * len(rollups)],
+            )
+        else:
+            await self._candle_storage.store_candles(candles, on_conflict)
+
+        await self._seed_rollups(exchange, market, resolution)
+
+    async def _roll_up(
+        self,
+        exchange: Exchange,
+        market: str,
+        resolution: ResolutionDetail,
+        new_candles: List[Candle],
+        on_conflict: OnConflict | None,
+    ) -> List[List[Candle]]:
+        """
+        Recomputes the buckets of the resolution's existing rollups, which new candles of its cluster touch. They are
+        aggregated from the new candles and the stored ones within these buckets, of which the stored ones are kept
+        or replaced, just like storing the new candles with on_conflict does. Just like derive_cluster, only buckets
+        closed within the cluster's tail and head are recomputed, the others follow once the cluster reaches past
+        them. Missing rollups are left to _seed_rollups.
+
+        Returns:
+            List[List[Candle]]: One newest-first cluster of recomputed buckets per rollup with any.
+        """
+        if not (rollups := self._rollups_of(resolution)) or not new_candles:
+            return []
+
+        rollups = [
+            rollup
+            for rollup in rollups
+            if (await self.get_cluster_info(exchange, market, rollup)).newest_candle
+        ]
+        if not rollups:
+            return []
+
+        # The cluster's tail and head, once the new candles are stored
+        started_ats = [candle.started_at for candle in new_candles]
+        oldest, newest = min(started_ats), max(started_ats)
+        cluster_info = await self.get_cluster_info(exchange, market, resolution)
+        tail, head = oldest, newest
+        if cluster_info.oldest_candle and cluster_info.newest_candle:
+            tail = min(tail, cluster_info.oldest_candle.started_at)
+            head = max(head, cluster_info.newest_candle.started_at)
+
+        # The buckets of the coarsest rollup span those of all others
+        coarsest = max(rollups, key=lambda rollup: rollup.seconds)
+        stored = await self._candle_storage.retrieve_segment(
+            exchange,
+            market,
+            resolution,
+            cu.norm_date(oldest, coarsest),
+            cu.add_one_resolution(cu.norm_date(newest, coarsest), coarsest),
+        )
+        # Later candles win, so stored ones are kept on OnConflict.IGNORE and replaced otherwise
+        ordered = (
+            [*new_candles, *stored]
+            if on_conflict == OnConflict.IGNORE
+            else [*stored, *new_candles]
+        )
+        by_date = {candle.started_at: candle for candle in ordered}
+        base = sorted(by_date.values(), key=lambda c: c.started_at, reverse=True)
+
+        def touched(rollup: ResolutionDetail) -> List[Candle]:
+            first, end = self._closed_buckets(tail, head, resolution, rollup)
+            start_date = max(first, cu.norm_date(oldest, rollup))
+            end_date = min(
+                end, cu.add_one_resolution(cu.norm_date(newest, rollup), rollup)
+            )
+            return [c for c in base if start_date <= c.started_at < end_date]
+
+        return [
+            resampled
+            for rollup in rollups
+            if (resampled := cu.resample(touched(rollup), rollup))
+        ]
+
+    async def _seed_rollups(
+        self,
+        exchange: Exchange,
+        market: str,
+        resolution: ResolutionDetail,
+    ) -> None:
+        # A rollup missing altogether is derived from the whole stored history of its cluster
+        for rollup in self._rollups_of(resolution):
+            if not (
+                await self.get_cluster_info(exchange, market, rollup)
+            ).newest_candle:
+                await self.derive_cluster(exchange, market, rollup, resolution)
+
+    def _closed_buckets(
+        self,
+        tail: datetime,
+        head: datetime,
+        base_resolution: ResolutionDetail,
+        resolution: ResolutionDetail,
+    ) -> Tuple[datetime, datetime]:
+        # The first bucket starting at or after the base cluster's tail, up to the last one ending before its head ends
+        start_date = cu.add_one_resolution(
+            cu.norm_date(tail - timedelta(seconds=1), resolution),
+            resolution,
+        )
+        end_date = cu.norm_date(
+            cu.add_one_resolution(head, base_resolution), resolution
+        )
+        return start_date, end_date
+
+    def _gap_end(self, gap: Gap, resolution: ResolutionDetail) -> datetime:
+        return gap.start + timedelta(seconds=resolution.seconds * gap.count)
+
+    def _buckets_of(
+        self,
+        gap: Gap,
+        base_resolution: ResolutionDetail,
+        resolution: ResolutionDetail,
+    ) -> List[datetime]:
+        # Start of every bucket of resolution, which the gap of base_resolution overlaps
+        bucket = cu.norm_date(gap.start, resolution)
+        end = self._gap_end(gap, base_resolution)
+        buckets: List[datetime] = []
+        while bucket < end:
+            buckets.append(bucket)
+            bucket = cu.add_one_resolution(bucket, resolution)
+        return buckets
+
+    async def _gather_bounded(
+        self,
+        specs: List[S],
+        func: Callable[[S], Awaitable[T]],
+        concurrency: int,
+    ) -> List[T | Exception]:
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def run(spec: S) -> T:
+            async with semaphore:
+                return await func(spec)
+
+        outcomes = await asyncio.gather(
+            *(run(spec) for spec in specs),
+            return_exceptions=True,
+        )
+
+        # Only exceptions are reported per spec, anything else (e.g. cancellation) is raised
+        for outcome in outcomes:
+            if isinstance(outcome, BaseException) and not isinstance(
+                outcome, Exception
+            ):
+                raise outcome
+
+        return outcomes  # type: ignore
+
+    async def _backfill(
+        self,
+        market: str,
+        resolution: ResolutionDetail,
+        start_date: datetime,
+        end_date: datetime | None = None,
+    ) -> None:
+        exchange = self._candle_fetcher.exchange
+        oldest_started_at: datetime | None = None
+
+        async for page in self._candle_fetcher.stream_candles(
+            market,
+            resolution,
+            start_date,
+            end_date,
+        ):
+            # Pages refetched when resuming an interrupted backfill may overlap already stored ones
+            await self._store_with_rollups(
+                exchange, market, resolution, page, OnConflict.IGNORE
+            )
+
+            # Record progress only after the page is committed
+            if (not oldest_started_at) or page[-1].started_at < oldest_started_at:
+                oldest_started_at = page[-1].started_at
+            await self._candle_storage.store_checkpoint(
+                exchange,
+                market,
+                resolution,
+                BackfillCheckpoint(
+                    start_date=start_date,
+                    oldest_started_at=oldest_started_at,
+                    updated_at=datetime.now(timezone.utc),
+                ),
+            )
+
     async def _check_horizon(
         self,
         market: str,
         resolution: ResolutionDetail,
         start_date: datetime,
     ) -> datetime:
-        if not (horizon := self._horizon_cache.get(f"{market}_{resolution.notation}")):
-            horizon = await self._candle_fetcher.find_horizon(market, resolution)
-            self._horizon_cache[f"{market}_{resolution.notation}"] = horizon
+        horizon = await self._get_horizon(market, resolution)
 
         if start_date < horizon:
             log_start_date_shifted_to_horizon(
@@ -176,6 +925,60 @@ class StoreManager:
             start_date = horizon
         return start_date
 
+    async def _get_horizon(self, market: str, resolution: ResolutionDetail) -> datetime:
+        exchange = self._candle_fetcher.exchange
+        key = f"{market}_{resolution.notation}"
+
+        if not (horizon := self._horizon_cache.get(key)):
+            horizon = await self._candle_storage.retrieve_horizon(
+                exchange,
+                market,
+                resolution,
+            )
+
+        if not horizon or self._is_expired(horizon):
+            hint = await self._horizon_hint(market, resolution)
+            horizon = MarketHorizon(
+                horizon=await self._candle_fetcher.find_horizon(
+                    market,
+                    resolution,
+                    hint,
+                ),
+                found_at=datetime.now(timezone.utc),
+            )
+            await self._candle_storage.store_horizon(
+                exchange,
+                market,
+                resolution,
+                horizon,
+            )
+
+        self._horizon_cache[key] = horizon
+        return horizon.horizon
+
+    async def _horizon_hint(
+        self,
+        market: str,
+        resolution: ResolutionDetail,
+    ) -> datetime | None:
+        exchange = self._candle_fetcher.exchange
+
+        # A market is listed at the same date for all resolutions, so any known horizon of it lies close by
+        if horizons := await self._candle_storage.retrieve_horizons(exchange, market):
+            return min(horizon.horizon for horizon in horizons)
+
+        # Otherwise the oldest stored candle at least bounds the horizon from above
+        cluster_info = await self.get_cluster_info(exchange, market, resolution)
+        if tail := cluster_info.oldest_candle:
+            return tail.started_at
+
+        return None
+
+    def _is_expired(self, horizon: MarketHorizon) -> bool:
+        if not self._horizon_ttl:
+            return False
+        return datetime.now(timezone.utc) - horizon.found_at > self._horizon_ttl
+
 
 class ExistingClusterException(Exception):
     def __init__(self, message: str) -> None:
@@ -185,3 +988,8 @@ class ExistingClusterException(Exception):
 class MissingClusterException(Exception):
     def __init__(self, message: str) -> None:
         super().__init__(message)
+
+
+class MissingCheckpointException(Exception):
+    def __init__(self, message: str) -> None:
+        super().__init__(message)
@@ -1,5 +1,8 @@
+from dataclasses import replace
 from datetime import datetime, timedelta, timezone
+from decimal import Decimal
 from typing import List
+import numpy as np
 import pytest
 from sir_utilities.date_time import now_utc_iso, string_to_datetime
 
@@ -8,6 +11,7 @@ from locast.candle.candle_utility import CandleUtility as uc
 from locast.candle.dydx.dydx_resolution import DydxResolution
 from locast.candle.exchange import Exchange
 from locast.candle.exchange_resolution import ResolutionDetail
+from locast.candle.gap import Gap
 from tests.helper.candle_mockery.mock_dydx_v4_candles import mock_dydx_v4_candles
 from tests.helper.candle_mockery.mock_candle import mock_candle
 
@@ -80,7 +84,121 @@ def test_detect_missing_dates_returns_missing(
     missing = uc.detect_missing_dates(faulty_dates, res)
 
     # then
-    assert len(missing) > 0
+    assert missing == [candles[2].started_at]
+
+
+def test_find_gaps_results_in_ranges(
+    dydx_v4_eth_one_min_mock_candles: List[Candle],
+) -> None:
+    # given newest-first candles lacking one candle and, further back, three
+    candles = dydx_v4_eth_one_min_mock_candles
+    faulty_candles = candles[:2] + candles[3:10] + candles[13:]
+    started_at = np.array([c.started_at.timestamp() for c in faulty_candles], np.int64)
+    res = candles[0].resolution
+
+    # when
+    gaps = uc.find_gaps(started_at, res)
+
+    # then
+    assert gaps == [
+        Gap(start=candles[2].started_at, count=1),
+        Gap(start=candles[12].started_at, count=3),
+    ]
+
+
+def test_resample_results_in_aggregated_candles() -> None:
+    # given ten one minute candles with distinct values, starting in the middle of a five minute bucket
+    start = string_to_datetime("2022-01-01T00:03:00.000Z")
+    candles = [
+        replace(
+            candle,
+            open=Decimal(i),
+            high=Decimal(i) + Decimal("0.5"),
+            low=Decimal(i) - Decimal("0.25"),
+            close=Decimal(i) + Decimal("0.1"),
+            base_token_volume=Decimal("0.001") * i,
+            trades=i,
+            usd_volume=Decimal("1.5") * i,
+            starting_open_interest=Decimal(100 + i),
+        )
+        for i, candle in enumerate(
+            mock_dydx_v4_candles("ETH-USD", DydxResolution.ONE_MINUTE, 10, start)
+        )
+    ]
+    oldest_first = candles[::-1]
+
+    # when
+    resampled = uc.resample(candles, DydxResolution.FIVE_MINUTES)
+
+    # then newest-first buckets of 00:00 (2 candles), 00:05 (5 candles) and 00:10 (3 candles)
+    assert [c.started_at for c in resampled] == [
+        string_to_datetime(f"2022-01-01T00:{m:02}:00.000Z") for m in (10, 5, 0)
+    ]
+    middle = oldest_first[2:7]
+    assert resampled[1] == replace(
+        middle[0],
+        resolution=DydxResolution.FIVE_MINUTES,
+        started_at=string_to_datetime("2022-01-01T00:05:00.000Z"),
+        high=max(c.high for c in middle),
+        low=min(c.low for c in middle),
+        close=middle[-1].close,
+        base_token_volume=sum(c.base_token_volume for c in middle),
+        trades=sum(c.trades for c in middle),
+        usd_volume=sum(c.usd_volume for c in middle),
+    )
+
+
+def test_resample_results_in_empty_list() -> None:
+    # when & then
+    assert uc.resample([], DydxResolution.FIVE_MINUTES) == []
+
+
+def test_coalesce_gaps_results_in_minimal_windows() -> None:
+    # given two gaps close to each other and one far off
+    res = DydxResolution.ONE_MINUTE
+    start = string_to_datetime("2022-01-01T00:00:00.000Z")
+    minutes = [timedelta(minutes=m) for m in range(3000)]
+    gaps = [
+        Gap(start=start + minutes[2000], count=5),
+        Gap(start=start + minutes[10], count=2),
+        Gap(start=start + minutes[0], count=3),
+    ]
+
+    # when
+    windows = uc.coalesce_gaps(gaps, res, max_size=100)
+
+    # then newest-first, each ending where its newest gap ends
+    assert windows == [
+        (start + minutes[2000], start + minutes[2005]),
+        (start + minutes[0], start + minutes[12]),
+    ]
+
+
+def test_coalesce_gaps_respects_max_size() -> None:
+    # given
+    res = DydxResolution.ONE_MINUTE
+    start = string_to_datetime("2022-01-01T00:00:00.000Z")
+    gaps = [Gap(start=start + timedelta(minutes=10 * i), count=1) for i in range(10)]
+
+    # when
+    windows = uc.coalesce_gaps(gaps, res, max_size=25)
+
+    # then
+    assert len(windows) == 4
+    assert all(end - start <= timedelta(minutes=25) for start, end in windows)
+
+
+@pytest.mark.parametrize("amount", [0, 1, 2])
+def test_find_gaps_results_in_empty_list(amount: int) -> None:
+    # given
+    res = DydxResolution.ONE_MINUTE
+    started_at = np.arange(amount, dtype=np.int64)[::-1] * res.seconds
+
+    # when
+    gaps = uc.find_gaps(started_at, res)
+
+    # then
+    assert gaps == []
 
 
 def test_assert_candle_unity_returns_true(
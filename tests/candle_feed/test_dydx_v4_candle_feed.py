@@ -0,0 +1,157 @@
+import asyncio
+from contextlib import asynccontextmanager
+from datetime import timedelta
+from decimal import Decimal
+from typing import Any, AsyncIterator, Dict, List
+
+import pytest
+
+from sir_utilities.date_time import string_to_datetime
+
+from locast.candle.candle import Candle
+from locast.candle.exchange import Exchange
+from locast.candle.exchange_resolution import ResolutionDetail, Seconds
+from locast.candle_feed.candle_feed import CandleFeed
+from locast.candle_feed.dydx.dydx_v4_candle_feed import DydxV4CandleFeed
+from tests.helper.fixture_helpers import get_typed_fixture
+from tests.helper.candle_mockery.v4_indexer_socket_mock import (
+    V4IndexerSocketMock,
+    mock_v4_candle_dict,
+)
+
+res = ResolutionDetail(Seconds.ONE_MINUTE, "1MIN")
+start_date = string_to_datetime("2024-01-01T00:00:00.000Z")
+minute = timedelta(minutes=1)
+
+
+def test_dydx_v4_candle_feed_conforms_to_candle_feed(
+    request: pytest.FixtureRequest,
+) -> None:
+    # when & then
+    feed = get_typed_fixture(request, "dydx_v4_candle_feed_mock", CandleFeed)
+    assert feed.exchange == Exchange.DYDX_V4
+
+
+@pytest.mark.asyncio
+async def test_stream_closed_candles_yields_candles_once_they_closed(
+    dydx_v4_candle_feed_mock: DydxV4CandleFeed,
+    v4_indexer_socket_mock: V4IndexerSocketMock,
+) -> None:
+    # given a feed subscribed to two markets
+    feed = dydx_v4_candle_feed_mock
+    indexer_socket = v4_indexer_socket_mock
+    connected: asyncio.Queue[None] = asyncio.Queue()
+    stream = feed.stream_closed_candles(
+        [("ETH-USD", res), ("BTC-USD", res)],
+        on_connect=lambda: _put(connected),
+    )
+
+    async with _consume(stream) as received:
+        await asyncio.wait_for(connected.get(), 5)
+
+        # when the unfinished candles get updated, before the next ones start
+        await indexer_socket.send_candle(_candle_dict("ETH-USD", 0, "1.0"))
+        await indexer_socket.send_candle(_candle_dict("BTC-USD", 0, "2.0"))
+        await indexer_socket.send_candle(_candle_dict("ETH-USD", 0, "1.5"))
+        await indexer_socket.send_candle(_candle_dict("ETH-USD", 1, "1.7"))
+        await indexer_socket.send_candle(_candle_dict("BTC-USD", 1, "2.5"))
+        closed = [await asyncio.wait_for(received.get(), 5) for _ in range(2)]
+
+    # then only the closed candles were yielded, in their latest state, over one connection
+    assert [(c.market, c.started_at, c.close) for c in closed] == [
+        ("ETH-USD", start_date, Decimal("1.5")),
+        ("BTC-USD", start_date, Decimal("2.0")),
+    ]
+    assert received.empty()
+    assert indexer_socket.connections == 1
+    assert await indexer_socket.subscriptions(2) == ["BTC-USD/1MIN", "ETH-USD/1MIN"]
+
+
+@pytest.mark.asyncio
+async def test_stream_closed_candles_reconnects_dropped_connection(
+    dydx_v4_candle_feed_mock: DydxV4CandleFeed,
+    v4_indexer_socket_mock: V4IndexerSocketMock,
+) -> None:
+    # given
+    feed = dydx_v4_candle_feed_mock
+    indexer_socket = v4_indexer_socket_mock
+    connected: asyncio.Queue[None] = asyncio.Queue()
+    stream = feed.stream_closed_candles(
+        [("ETH-USD", res)],
+        on_connect=lambda: _put(connected),
+    )
+
+    async with _consume(stream) as received:
+        await asyncio.wait_for(connected.get(), 5)
+
+        # when
+        await indexer_socket.drop_connections()
+        await asyncio.wait_for(connected.get(), 5)
+        await indexer_socket.send_candle(_candle_dict("ETH-USD", 0, "1.0"))
+        await indexer_socket.send_candle(_candle_dict("ETH-USD", 1, "1.1"))
+        closed = await asyncio.wait_for(received.get(), 5)
+
+    # then on_connect was awaited for the new connection, before streaming went on
+    assert closed.started_at == start_date
+    assert indexer_socket.connections == 2
+
+
+@pytest.mark.asyncio
+async def test_stream_closed_candles_holds_candles_back_until_connected(
+    dydx_v4_candle_feed_mock: DydxV4CandleFeed,
+    v4_indexer_socket_mock: V4IndexerSocketMock,
+) -> None:
+    # given a feed, of whose channels only the first one got subscribed yet
+    feed = dydx_v4_candle_feed_mock
+    indexer_socket = v4_indexer_socket_mock
+    indexer_socket.hold_subscription("BTC-USD/1MIN")
+    received_on_connect: List[int] = []
+
+    async def on_connect() -> None:
+        received_on_connect.append(received.qsize())
+
+    stream = feed.stream_closed_candles(
+        [("ETH-USD", res), ("BTC-USD", res)],
+        on_connect=on_connect,
+    )
+
+    async with _consume(stream) as received:
+        await indexer_socket.subscriptions(1)
+
+        # when a candle of the subscribed channel closes, before the other channel is subscribed
+        await indexer_socket.send_candle(_candle_dict("ETH-USD", 0, "1.0"))
+        await indexer_socket.send_candle(_candle_dict("ETH-USD", 1, "1.1"))
+        await asyncio.sleep(0.1)
+        indexer_socket.release_subscription("BTC-USD/1MIN")
+        closed = await asyncio.wait_for(received.get(), 5)
+
+    # then it was streamed only after on_connect returned
+    assert received_on_connect == [0]
+    assert closed.started_at == start_date
+
+
+async def _put(queue: asyncio.Queue[None]) -> None:
+    queue.put_nowait(None)
+
+
+def _candle_dict(market: str, minutes: int, close: str) -> Dict[str, Any]:
+    return mock_v4_candle_dict(market, res, start_date + minute * minutes, close)
+
+
+@asynccontextmanager
+async def _consume(
+    stream: AsyncIterator[Candle],
+) -> AsyncIterator[asyncio.Queue[Candle]]:
+    # Consumes a candle stream in the background, for as long as the context is entered
+    received: asyncio.Queue[Candle] = asyncio.Queue()
+
+    async def consume() -> None:
+        async for candle in stream:
+            received.put_nowait(candle)
+
+    task = asyncio.create_task(consume())
+    try:
+        yield received
+    finally:
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
@@ -1,12 +1,17 @@
-from datetime import timedelta
-from typing import Any, Dict
+import asyncio
+from datetime import datetime, timedelta
+from typing import Any, Dict, List
 import pytest
 
 from sir_utilities.date_time import now_utc_iso, string_to_datetime
 
+from locast.candle.candle import Candle
 from locast.candle.candle_utility import CandleUtility as cu
 from locast.candle.exchange_resolution import ResolutionDetail
 from locast.candle_fetcher.candle_fetcher import CandleFetcher
+from locast.candle_fetcher.dydx.candle_fetcher.dydx_candle_fetcher import (
+    DydxCandleFetcher,
+)
 
 from locast.candle_fetcher.exceptions import APIException
 from tests.helper.candle_mockery.candle_backend_mock import CandleBackendMock
@@ -19,11 +24,15 @@ from tests.helper.fixture_helpers import get_typed_fixture
 # - The key is the name of the fixture that delivers a candle fetcher that conforms to CandleFetcher
 # - amount_back is the number of candles to be fetched (One candle less than two full batches; e.g.: 199 for batch size 100).
 # - backend_mock holds the name of the fixture that delivers the mocked backend in use for this mocked candle fetcher conforming to CandleBackendMock
+# - api_fetcher holds the name of the fixture that delivers the api fetcher in use for this mocked candle fetcher
+# - horizon is the started_at date of the oldest candle the mocked backend provides
 
 mocked_candle_fetchers: Dict[str, Any] = {
     "dydx_v4_candle_fetcher_mock": {
         "amount_back": 1999,
         "backend_mock": "dydx_candle_backend_mock",
+        "api_fetcher": "dydx_v4_fetcher_mock",
+        "horizon": "2024-01-01T00:00:00.000Z",
     },
 }
 
@@ -195,3 +204,252 @@ async def test_fetch_cluster_prints_missing_candles_on_batch_newest_edge_correct
     assert "" in out
     assert "🚨 Attention:" in out
     assert out.count("❌ Candle missing:") == n_missing
+
+
+@pytest.mark.parametrize("window_concurrency", [2, 4])
+@pytest.mark.parametrize("resolution", resolutions_reduced)
+@pytest.mark.parametrize("candle_fetcher_mock", list(mocked_candle_fetchers.keys()))
+@pytest.mark.asyncio
+async def test_fetch_candles_in_parallel_equals_sequential_fetch(
+    request: pytest.FixtureRequest,
+    candle_fetcher_mock: str,
+    resolution: ResolutionDetail,
+    window_concurrency: int,
+) -> None:
+    # given
+    fetcher = get_typed_fixture(request, candle_fetcher_mock, DydxCandleFetcher)
+    res = resolution
+    start = string_to_datetime("2024-04-01T00:00:00.000Z")
+    end = string_to_datetime("2024-04-04T00:00:00.000Z")
+    sequential_candles = await fetcher.fetch_candles("ETH-USD", res, start, end)
+
+    # when
+    fetcher.window_concurrency = window_concurrency
+    parallel_candles = await fetcher.fetch_candles("ETH-USD", res, start, end)
+
+    # then
+    assert parallel_candles == sequential_candles
+    assert parallel_candles[-1].started_at == start
+    assert parallel_candles[0].started_at == end - timedelta(seconds=res.seconds)
+
+
+@pytest.mark.parametrize("window_concurrency", [1, 4])
+@pytest.mark.parametrize("candle_fetcher_mock", list(mocked_candle_fetchers.keys()))
+@pytest.mark.asyncio
+async def test_fetch_candles_continues_past_page_sized_hole(
+    request: pytest.FixtureRequest,
+    monkeypatch: pytest.MonkeyPatch,
+    candle_fetcher_mock: str,
+    window_concurrency: int,
+) -> None:
+    # given an exchange outage spanning more than a full window
+    api_fetcher_str = mocked_candle_fetchers[candle_fetcher_mock]["api_fetcher"]
+    api_fetcher = request.getfixturevalue(api_fetcher_str)
+    fetcher = get_typed_fixture(request, candle_fetcher_mock, DydxCandleFetcher)
+    fetcher.window_concurrency = window_concurrency
+    res = resolutions_reduced[0]
+    start = string_to_datetime("2024-04-01T00:00:00.000Z")
+    end = start + timedelta(seconds=res.seconds * 5000)
+    hole_start = start + timedelta(seconds=res.seconds * 1200)
+    hole_end = hole_start + timedelta(seconds=res.seconds * 2100)
+    _cut_hole(api_fetcher, monkeypatch, hole_start, hole_end)
+
+    # when
+    candles = await fetcher.fetch_candles("ETH-USD", res, start, end)
+
+    # then the candles older than the hole were fetched as well
+    assert len(candles) == 5000 - 2100
+    assert candles[-1].started_at == start
+    assert all(not hole_start <= c.started_at < hole_end for c in candles)
+
+
+@pytest.mark.parametrize("candle_fetcher_mock", list(mocked_candle_fetchers.keys()))
+@pytest.mark.asyncio
+async def test_fetch_cluster_in_parallel_prints_missing_candles_correctly(
+    request: pytest.FixtureRequest,
+    capsys: pytest.CaptureFixture[str],
+    candle_fetcher_mock: str,
+) -> None:
+    # given
+    backend_mock_str = mocked_candle_fetchers[candle_fetcher_mock]["backend_mock"]
+    backend = get_typed_fixture(request, backend_mock_str, CandleBackendMock)
+    n_missing = 5
+    backend.missing_candles_on_batch_newest_edge = n_missing
+
+    fetcher = get_typed_fixture(request, candle_fetcher_mock, DydxCandleFetcher)
+    fetcher.log_progress = True
+    fetcher.window_concurrency = 4
+    res = resolutions_reduced[0]
+    amount_back = mocked_candle_fetchers[candle_fetcher_mock].get("amount_back")
+    market = "ETH-USD"
+
+    now_rounded = cu.norm_date(now_utc_iso(), res)
+    start_date = now_rounded - timedelta(seconds=res.seconds * amount_back)
+
+    # when
+    _ = await fetcher.fetch_candles_up_to_now(market, res, start_date)
+
+    # then
+    out, _ = capsys.readouterr()
+    assert "🚨 Attention:" in out
+    assert out.count("❌ Candle missing:") == n_missing
+
+
+@pytest.mark.parametrize("window_concurrency", [1, 4])
+@pytest.mark.parametrize("candle_fetcher_mock", list(mocked_candle_fetchers.keys()))
+@pytest.mark.asyncio
+async def test_stream_candles_yields_pages_of_up_to_date_cluster(
+    request: pytest.FixtureRequest,
+    candle_fetcher_mock: str,
+    window_concurrency: int,
+) -> None:
+    # given
+    fetcher = get_typed_fixture(request, candle_fetcher_mock, DydxCandleFetcher)
+    fetcher.window_concurrency = window_concurrency
+    res = resolutions_reduced[0]
+    amount_back = mocked_candle_fetchers[candle_fetcher_mock].get("amount_back")
+    now_rounded = cu.norm_date(now_utc_iso(), res)
+    start_date = now_rounded - timedelta(seconds=res.seconds * amount_back)
+
+    # when
+    pages = [page async for page in fetcher.stream_candles("ETH-USD", res, start_date)]
+
+    # then
+    candles = [candle for page in pages for candle in page]
+    assert len(pages) > 1
+    assert len(candles) == amount_back
+    assert cu.is_newest_valid_candle(max(candles, key=lambda c: c.started_at))
+    assert min(candle.started_at for candle in candles) == start_date
+
+
+@pytest.mark.parametrize(
+    "hint_offset", [timedelta(0), timedelta(days=-3), timedelta(days=2)]
+)
+@pytest.mark.parametrize("resolution", resolutions_reduced)
+@pytest.mark.parametrize("candle_fetcher_mock", list(mocked_candle_fetchers.keys()))
+@pytest.mark.asyncio
+async def test_find_horizon_with_hint_needs_fewer_requests(
+    request: pytest.FixtureRequest,
+    monkeypatch: pytest.MonkeyPatch,
+    candle_fetcher_mock: str,
+    resolution: ResolutionDetail,
+    hint_offset: timedelta,
+) -> None:
+    # given a hint close to the horizon, e.g. the horizon of another resolution
+    fetcher = get_typed_fixture(request, candle_fetcher_mock, CandleFetcher)
+    api_fetcher_str = mocked_candle_fetchers[candle_fetcher_mock]["api_fetcher"]
+    api_fetcher = request.getfixturevalue(api_fetcher_str)
+    horizon_str = mocked_candle_fetchers[candle_fetcher_mock]["horizon"]
+    expected_horizon = string_to_datetime(horizon_str)
+    requests = _count_requests(api_fetcher, monkeypatch)
+
+    horizon_without_hint = await fetcher.find_horizon("ETH-USD", resolution)
+    requests_without_hint = len(requests)
+    requests.clear()
+
+    # when
+    hint = expected_horizon + hint_offset
+    horizon_with_hint = await fetcher.find_horizon("ETH-USD", resolution, hint)
+
+    # then
+    assert horizon_with_hint == horizon_without_hint == expected_horizon
+    assert len(requests) < requests_without_hint
+
+
+@pytest.mark.parametrize("hint_offset", [None, timedelta(days=-3), timedelta(days=2)])
+@pytest.mark.parametrize("width", [2, 8])
+@pytest.mark.parametrize("candle_fetcher_mock", list(mocked_candle_fetchers.keys()))
+@pytest.mark.asyncio
+async def test_find_horizon_k_ary_equals_binary_search(
+    request: pytest.FixtureRequest,
+    monkeypatch: pytest.MonkeyPatch,
+    candle_fetcher_mock: str,
+    width: int,
+    hint_offset: timedelta | None,
+) -> None:
+    # given
+    fetcher = get_typed_fixture(request, candle_fetcher_mock, DydxCandleFetcher)
+    api_fetcher_str = mocked_candle_fetchers[candle_fetcher_mock]["api_fetcher"]
+    api_fetcher = request.getfixturevalue(api_fetcher_str)
+    horizon_str = mocked_candle_fetchers[candle_fetcher_mock]["horizon"]
+    expected_horizon = string_to_datetime(horizon_str)
+    hint = expected_horizon + hint_offset if hint_offset is not None else None
+    res = resolutions_reduced[0]
+
+    binary_horizon = await fetcher.find_horizon("ETH-USD", res, hint)
+
+    # when
+    fetcher.horizon_search_width = width
+    in_flight = _track_in_flight(api_fetcher, monkeypatch)
+    k_ary_horizon = await fetcher.find_horizon("ETH-USD", res, hint)
+
+    # then
+    assert k_ary_horizon == binary_horizon == expected_horizon
+    assert max(in_flight) == width
+
+
+@pytest.mark.parametrize("candle_fetcher_mock", list(mocked_candle_fetchers.keys()))
+def test_horizon_search_width_exceeding_max_in_flight_results_in_error(
+    request: pytest.FixtureRequest,
+    candle_fetcher_mock: str,
+) -> None:
+    # given
+    fetcher = get_typed_fixture(request, candle_fetcher_mock, DydxCandleFetcher)
+    fetcher.max_in_flight = 2
+
+    # when & then
+    with pytest.raises(AssertionError):
+        fetcher.horizon_search_width = 4
+
+
+def _track_in_flight(api_fetcher: Any, monkeypatch: pytest.MonkeyPatch) -> List[int]:
+    in_flight: List[int] = [0]
+    fetch = api_fetcher.fetch
+
+    async def tracking_fetch(*args: Any, **kwargs: Any) -> Any:
+        in_flight.append(in_flight[-1] + 1)
+        try:
+            await asyncio.sleep(0)
+            return await fetch(*args, **kwargs)
+        finally:
+            in_flight.append(in_flight[-1] - 1)
+
+    monkeypatch.setattr(api_fetcher, "fetch", tracking_fetch)
+    return in_flight
+
+
+def _count_requests(api_fetcher: Any, monkeypatch: pytest.MonkeyPatch) -> List[Any]:
+    requests: List[Any] = []
+    fetch = api_fetcher.fetch
+
+    async def counting_fetch(*args: Any, **kwargs: Any) -> Any:
+        requests.append(args)
+        return await fetch(*args, **kwargs)
+
+    monkeypatch.setattr(api_fetcher, "fetch", counting_fetch)
+    return requests
+
+
+def _cut_hole(
+    api_fetcher: Any,
+    monkeypatch: pytest.MonkeyPatch,
+    hole_start: datetime,
+    hole_end: datetime,
+) -> None:
+    fetch = api_fetcher.fetch
+
+    async def holey_fetch(
+        market: str,
+        resolution: ResolutionDetail,
+        start_date: datetime,
+        end_date: datetime,
+    ) -> List[Candle]:
+        # Like the exchange, respond with the newest candles before the hole, when the range ends within it
+        if hole_start < end_date <= hole_end:
+            end_date = hole_start
+        if start_date >= end_date:
+            return []
+        candles = await fetch(market, resolution, start_date, end_date)
+        return [c for c in candles if not hole_start <= c.started_at < hole_end]
+
+    monkeypatch.setattr(api_fetcher, "fetch", holey_fetch)
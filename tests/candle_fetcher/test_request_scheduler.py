@@ -0,0 +1,175 @@
+import time
+from typing import Any, Callable, Dict, List
+
+import httpx
+import pytest
+
+from locast.candle.exchange_resolution import ResolutionDetail, Seconds
+from locast.candle_fetcher.dydx.api_fetcher.dydx_v4_fetcher import DydxV4Fetcher
+from locast.candle_fetcher.exceptions import APIException
+from locast.candle_fetcher.request_scheduler import RequestScheduler
+from tests.helper.candle_mockery.v4_indexer_mock import V4IndexerClientMock
+
+from sir_utilities.date_time import string_to_datetime
+
+
+def fast_scheduler(max_retries: int = 3) -> RequestScheduler:
+    return RequestScheduler(
+        rate=50.0,
+        max_rate=100.0,
+        burst=1,
+        max_retries=max_retries,
+        backoff_base=0.001,
+    )
+
+
+def flaky_request(
+    failures: List[Exception],
+    calls: List[int],
+) -> Callable[[], Any]:
+    async def request() -> str:
+        calls.append(1)
+        if failures:
+            raise failures.pop(0)
+        return "ok"
+
+    return request
+
+
+def status_error(status_code: int) -> httpx.HTTPStatusError:
+    request = httpx.Request("GET", "https://indexer.dydx.trade/")
+    response = httpx.Response(status_code, request=request)
+    return httpx.HTTPStatusError("error", request=request, response=response)
+
+
+def is_retryable(exception: Exception) -> bool:
+    return isinstance(exception, httpx.HTTPStatusError)
+
+
+@pytest.mark.asyncio
+async def test_schedule_retries_until_success() -> None:
+    # given
+    scheduler = fast_scheduler()
+    calls: List[int] = []
+    request = flaky_request([status_error(429), status_error(503)], calls)
+
+    # when
+    result = await scheduler.schedule(request, is_retryable)
+
+    # then
+    assert result == "ok"
+    assert len(calls) == 3
+
+
+@pytest.mark.asyncio
+async def test_schedule_raises_after_max_retries() -> None:
+    # given
+    scheduler = fast_scheduler(max_retries=2)
+    calls: List[int] = []
+    request = flaky_request([status_error(429) for _ in range(5)], calls)
+
+    # when & then
+    with pytest.raises(httpx.HTTPStatusError):
+        await scheduler.schedule(request, is_retryable)
+    assert len(calls) == 3
+
+
+@pytest.mark.asyncio
+async def test_schedule_does_not_retry_unretryable_error() -> None:
+    # given
+    scheduler = fast_scheduler()
+    calls: List[int] = []
+    request = flaky_request([ValueError("invalid")], calls)
+
+    # when & then
+    with pytest.raises(ValueError):
+        await scheduler.schedule(request, is_retryable)
+    assert len(calls) == 1
+
+
+@pytest.mark.asyncio
+async def test_schedule_adapts_rate() -> None:
+    # given
+    scheduler = fast_scheduler()
+    initial_rate = scheduler.rate
+
+    # when a request has to be retried
+    await scheduler.schedule(flaky_request([status_error(429)], []), is_retryable)
+    decreased_rate = scheduler.rate
+
+    # and requests succeed afterwards
+    for _ in range(5):
+        await scheduler.schedule(flaky_request([], []), is_retryable)
+
+    # then
+    assert decreased_rate < initial_rate
+    assert scheduler.rate > decreased_rate
+
+
+@pytest.mark.asyncio
+async def test_schedule_limits_request_rate() -> None:
+    # given
+    scheduler = RequestScheduler(rate=50.0, min_rate=50.0, max_rate=50.0, burst=1)
+    amount = 6
+
+    # when
+    start = time.monotonic()
+    for _ in range(amount):
+        await scheduler.schedule(flaky_request([], []), is_retryable)
+    duration = time.monotonic() - start
+
+    # then the burst token is used immediately, every other request waits for a new token
+    assert duration >= (amount - 1) / 50.0 * 0.9
+
+
+@pytest.mark.asyncio
+async def test_dydx_v4_fetcher_retries_rate_limited_request(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    # given a backend rejecting the first request with HTTP 429
+    client = V4IndexerClientMock()
+    fetcher = DydxV4Fetcher(client, scheduler=fast_scheduler())
+    _reject_first_request(client, monkeypatch)
+
+    res = ResolutionDetail(Seconds.ONE_MINUTE, "1MIN")
+    start = string_to_datetime("2024-04-01T00:00:00.000Z")
+    end = string_to_datetime("2024-04-01T01:00:00.000Z")
+
+    # when
+    candles = await fetcher.fetch("ETH-USD", res, start, end)
+
+    # then
+    assert len(candles) == 60
+
+
+@pytest.mark.asyncio
+async def test_dydx_v4_fetcher_without_scheduler_raises_on_rate_limit(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    # given a backend rejecting the first request with HTTP 429
+    client = V4IndexerClientMock()
+    fetcher = DydxV4Fetcher(client)
+    _reject_first_request(client, monkeypatch)
+
+    res = ResolutionDetail(Seconds.ONE_MINUTE, "1MIN")
+    start = string_to_datetime("2024-04-01T00:00:00.000Z")
+    end = string_to_datetime("2024-04-01T01:00:00.000Z")
+
+    # when & then
+    with pytest.raises(APIException):
+        await fetcher.fetch("ETH-USD", res, start, end)
+
+
+def _reject_first_request(
+    client: V4IndexerClientMock,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    get_candles = client.markets.get_perpetual_market_candles
+    failures = [status_error(429)]
+
+    async def rate_limited(*args: Any, **kwargs: Any) -> Dict[str, Any]:
+        if failures:
+            raise failures.pop(0)
+        return await get_candles(*args, **kwargs)
+
+    monkeypatch.setattr(client.markets, "get_perpetual_market_candles", rate_limited)
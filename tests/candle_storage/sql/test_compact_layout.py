@@ -0,0 +1,285 @@
+from dataclasses import replace
+from datetime import timedelta
+from decimal import Decimal
+from typing import List
+
+import numpy as np
+import pytest
+from sqlalchemy import Engine, inspect
+from sqlmodel import Session, select
+
+from sir_utilities.date_time import string_to_datetime
+
+from locast.candle.candle import Candle
+from locast.candle.exchange import Exchange
+from locast.candle.exchange_resolution import ResolutionDetail, Seconds
+from locast.candle_storage.on_conflict import OnConflict
+from locast.candle_storage.sql.candle_layout import CandleLayout
+from locast.candle_storage.sql.sqlite_candle_storage import SqliteCandleStorage
+from locast.candle_storage.sql.tables import (
+    SqliteCandle,
+    SqliteClusteredCandle,
+    SqliteCompactCandle,
+    SqliteMarket,
+)
+
+from tests.helper.candle_mockery.mock_dydx_v4_candles import mock_dydx_v4_candles
+
+
+exchange = Exchange.DYDX_V4
+market = "ETH-USD"
+res = ResolutionDetail(Seconds.ONE_MINUTE, "1MIN")
+start_date = string_to_datetime("2024-01-01T00:00:00.000Z")
+
+compact_layouts = [CandleLayout.COMPACT, CandleLayout.CLUSTERED]
+
+
+@pytest.mark.parametrize("layout", compact_layouts)
+@pytest.mark.asyncio
+async def test_retrieve_cluster_results_in_exactly_stored_candles(
+    sqlite_engine_in_memory: Engine,
+    layout: CandleLayout,
+) -> None:
+    # given candles, of which later ones need more decimal places than earlier ones
+    storage = SqliteCandleStorage(sqlite_engine_in_memory, layout=layout)
+    older = mock_dydx_v4_candles(market, res, 100, start_date)
+    newer = _with_fine_prices(
+        mock_dydx_v4_candles(market, res, 100, start_date + timedelta(minutes=100))
+    )
+
+    # when
+    await storage.store_candles(older)
+    await storage.store_candles(newer)
+
+    # then
+    cluster = await storage.retrieve_cluster(exchange, market, res)
+    assert [_without_id(c) for c in cluster] == newer + older
+    assert _market_scale(sqlite_engine_in_memory) == 9
+
+
+@pytest.mark.parametrize("layout", compact_layouts)
+@pytest.mark.asyncio
+async def test_store_candles_overflowing_stored_ones_on_rescale_results_in_error(
+    sqlite_engine_in_memory: Engine,
+    layout: CandleLayout,
+) -> None:
+    # given a stored volume, which exceeds 64 bit integers once the scale grows to 10
+    storage = SqliteCandleStorage(sqlite_engine_in_memory, layout=layout)
+    candles = mock_dydx_v4_candles(market, res, 2, start_date)
+    older = replace(candles[1], base_token_volume=Decimal("123456789012.123"))
+    newer = replace(candles[0], open=Decimal("0.0000012345"))
+    await storage.store_candles([older])
+
+    # when
+    with pytest.raises(OverflowError):
+        await storage.store_candles([newer])
+
+    # then the stored volume stays exact
+    cluster = await storage.retrieve_cluster(exchange, market, res)
+    assert [_without_id(c) for c in cluster] == [older]
+    assert _market_scale(sqlite_engine_in_memory) == 3
+
+
+@pytest.mark.parametrize("layout", compact_layouts)
+@pytest.mark.asyncio
+async def test_compact_layout_serves_cluster_info_and_segments(
+    sqlite_engine_in_memory: Engine,
+    layout: CandleLayout,
+) -> None:
+    # given
+    storage = SqliteCandleStorage(sqlite_engine_in_memory, layout=layout)
+    candles = _with_fine_prices(mock_dydx_v4_candles(market, res, 100, start_date))
+    await storage.store_candles(candles)
+    segment_start = start_date + timedelta(minutes=10)
+
+    # when
+    info = await storage.get_cluster_info(exchange, market, res)
+    segment = await storage.retrieve_segment(
+        exchange,
+        market,
+        res,
+        segment_start,
+        segment_start + timedelta(minutes=5),
+    )
+    started_at = await storage.retrieve_started_at(exchange, market, res)
+    await storage.store_candles(candles[:10], OnConflict.IGNORE)
+    await storage.trim_cluster(exchange, market, res, segment_start)
+
+    # then
+    assert info.size == 100
+    assert info.newest_candle and info.oldest_candle
+    assert _without_id(info.newest_candle) == candles[0]
+    assert _without_id(info.oldest_candle) == candles[-1]
+    assert [_without_id(c) for c in segment] == candles[-15:-10]
+    assert started_at.tolist() == [int(c.started_at.timestamp()) for c in candles]
+
+    trimmed_info = await storage.get_cluster_info(exchange, market, res)
+    assert trimmed_info.size == 90
+    assert trimmed_info.oldest_candle
+    assert trimmed_info.oldest_candle.started_at == segment_start
+
+
+@pytest.mark.parametrize("layout", compact_layouts)
+@pytest.mark.parametrize("scale", [None, 9])
+@pytest.mark.asyncio
+async def test_retrieve_cluster_frame_equals_text_layout(
+    sqlite_engine_in_memory: Engine,
+    layout: CandleLayout,
+    scale: int | None,
+) -> None:
+    # given the same candles in both layouts
+    candles = _with_fine_prices(mock_dydx_v4_candles(market, res, 100, start_date))
+    text = SqliteCandleStorage(sqlite_engine_in_memory)
+    await text.store_candles(candles)
+    text_frame = await text.retrieve_cluster_frame(exchange, market, res, scale)
+
+    compact = SqliteCandleStorage(sqlite_engine_in_memory, layout=layout)
+    await compact.migrate_from(CandleLayout.TEXT)
+
+    # when
+    frame = await compact.retrieve_cluster_frame(exchange, market, res, scale)
+
+    # then
+    assert np.array_equal(frame.started_at, text_frame.started_at)
+    assert np.array_equal(frame.trades, text_frame.trades)
+    assert np.array_equal(frame.close, text_frame.close)
+    assert np.array_equal(frame.usd_volume, text_frame.usd_volume)
+
+
+@pytest.mark.parametrize("layout", [CandleLayout.TEXT, *compact_layouts])
+@pytest.mark.parametrize(
+    "scale, expected",
+    [(6, 98765432109876545), (5, 9876543210987654), (4, 987654321098765)],
+)
+@pytest.mark.asyncio
+async def test_retrieve_cluster_frame_scales_without_floats(
+    sqlite_engine_in_memory: Engine,
+    layout: CandleLayout,
+    scale: int,
+    expected: int,
+) -> None:
+    # given a volume with more significant digits than a float holds
+    storage = SqliteCandleStorage(sqlite_engine_in_memory, layout=layout)
+    candle = mock_dydx_v4_candles(market, res, 1, start_date)[0]
+    volume = Decimal("98765432109.876545")
+    await storage.store_candles([replace(candle, usd_volume=volume)])
+
+    # when
+    frame = await storage.retrieve_cluster_frame(exchange, market, res, scale)
+
+    # then digits beyond the scale are rounded half to even
+    assert frame.usd_volume.tolist() == [expected]
+
+
+@pytest.mark.parametrize(
+    "source, target",
+    [
+        (CandleLayout.TEXT, CandleLayout.COMPACT),
+        (CandleLayout.COMPACT, CandleLayout.TEXT),
+        (CandleLayout.TEXT, CandleLayout.CLUSTERED),
+        (CandleLayout.COMPACT, CandleLayout.CLUSTERED),
+        (CandleLayout.CLUSTERED, CandleLayout.TEXT),
+    ],
+)
+@pytest.mark.asyncio
+async def test_migrate_from_moves_all_candles(
+    sqlite_engine_in_memory: Engine,
+    source: CandleLayout,
+    target: CandleLayout,
+) -> None:
+    # given a database holding two clusters in the source layout
+    engine = sqlite_engine_in_memory
+    source_storage = SqliteCandleStorage(engine, layout=source)
+    eth = _with_fine_prices(mock_dydx_v4_candles(market, res, 6000, start_date))
+    btc = mock_dydx_v4_candles("BTC-USD", res, 10, start_date)
+    await source_storage.store_clusters([eth, btc])
+    stored = await source_storage.retrieve_cluster(exchange, market, res)
+
+    # when
+    target_storage = SqliteCandleStorage(engine, layout=target)
+    await target_storage.migrate_from(source)
+
+    # then
+    migrated = await target_storage.retrieve_cluster(exchange, market, res)
+    info = await target_storage.get_cluster_info(exchange, market, res)
+    btc_info = await target_storage.get_cluster_info(exchange, "BTC-USD", res)
+    assert [_without_id(c) for c in migrated] == [_without_id(c) for c in stored]
+    assert info.size == 6000 and btc_info.size == 10
+    assert info.oldest_candle and info.oldest_candle.started_at == start_date
+
+    source_table = {
+        CandleLayout.TEXT: SqliteCandle,
+        CandleLayout.COMPACT: SqliteCompactCandle,
+        CandleLayout.CLUSTERED: SqliteClusteredCandle,
+    }[source]
+    assert not Session(engine).exec(select(source_table)).first()
+
+
+@pytest.mark.asyncio
+async def test_migrate_from_keeps_ids(sqlite_engine_in_memory: Engine) -> None:
+    # given
+    text = SqliteCandleStorage(sqlite_engine_in_memory)
+    await text.store_candles(mock_dydx_v4_candles(market, res, 100, start_date))
+    stored = await text.retrieve_cluster(exchange, market, res)
+
+    # when
+    compact = SqliteCandleStorage(sqlite_engine_in_memory, layout=CandleLayout.COMPACT)
+    await compact.migrate_from(CandleLayout.TEXT)
+
+    # then
+    assert await compact.retrieve_cluster(exchange, market, res) == stored
+
+
+def test_clustered_layout_is_keyed_by_series_and_time_only(
+    sqlite_engine_in_memory: Engine,
+) -> None:
+    # when
+    _ = SqliteCandleStorage(sqlite_engine_in_memory, layout=CandleLayout.CLUSTERED)
+
+    # then the primary key is the only index and there is no rowid to maintain
+    table = SqliteClusteredCandle.__tablename__
+    with sqlite_engine_in_memory.connect() as conn:
+        indexes = conn.exec_driver_sql(f"PRAGMA index_list({table})").all()
+        sql = conn.exec_driver_sql(
+            "SELECT sql FROM sqlite_master WHERE name = ?", (table,)
+        ).scalar_one()
+    assert [index[3] for index in indexes] == ["pk"]
+    assert "WITHOUT ROWID" in sql
+
+
+def test_initialization_adds_market_scale_column(
+    sqlite_engine_in_memory: Engine,
+) -> None:
+    # given a database from before markets had a scale
+    with sqlite_engine_in_memory.begin() as conn:
+        conn.exec_driver_sql(
+            "CREATE TABLE market (id INTEGER PRIMARY KEY, market VARCHAR NOT NULL UNIQUE)"
+        )
+
+    # when
+    _ = SqliteCandleStorage(sqlite_engine_in_memory)
+
+    # then
+    columns = inspect(sqlite_engine_in_memory).get_columns(SqliteMarket.__tablename__)
+    assert "scale" in [column["name"] for column in columns]
+
+
+def _with_fine_prices(candles: List[Candle]) -> List[Candle]:
+    return [
+        replace(
+            candle,
+            open=Decimal("0.000012345") * (i + 1),
+            close=Decimal("2012.5") + i,
+            usd_volume=Decimal("1E-7") * i,
+        )
+        for i, candle in enumerate(candles)
+    ]
+
+
+def _market_scale(engine: Engine) -> int | None:
+    stmnt = select(SqliteMarket.scale).where(SqliteMarket.market == market)
+    return Session(engine).exec(stmnt).one()
+
+
+def _without_id(candle: Candle) -> Candle:
+    return replace(candle, id=None)
@@ -0,0 +1,104 @@
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, List
+
+import pytest
+from sqlalchemy import Engine, event
+from sqlmodel import Session
+
+from sir_utilities.date_time import string_to_datetime
+
+from locast.candle.exchange import Exchange
+from locast.candle.exchange_resolution import ResolutionDetail, Seconds
+from locast.candle_storage.sql.dimension_cache import DimensionCache
+from locast.candle_storage.sql.sqlite_candle_storage import SqliteCandleStorage
+from locast.candle_storage.sql.table_utility import TableUtility as tu
+
+from tests.helper.candle_mockery.mock_dydx_v4_candles import mock_dydx_v4_candles
+
+
+def test_unknown_dimensions_are_none(
+    sqlite_session_in_memory: Session,
+    sqlite_candle_storage_memory: SqliteCandleStorage,
+) -> None:
+    # given
+    _ = sqlite_candle_storage_memory
+    cache = DimensionCache()
+    res = ResolutionDetail(Seconds.ONE_MINUTE, "1MIN")
+
+    # when & then
+    assert cache.exchange_id(Exchange.DYDX_V4, sqlite_session_in_memory) is None
+    assert cache.market_id("ETH-USD", sqlite_session_in_memory) is None
+    assert cache.resolution_id(res, sqlite_session_in_memory) is None
+
+
+def test_miss_falls_back_to_database(
+    sqlite_session_in_memory: Session,
+    sqlite_candle_storage_memory: SqliteCandleStorage,
+) -> None:
+    # given a loaded cache and a market inserted behind its back
+    _ = sqlite_candle_storage_memory
+    session = sqlite_session_in_memory
+    cache = DimensionCache()
+    assert cache.market_id("ETH-USD", session) is None
+    sqlite_market = tu.lookup_or_insert_sqlite_market("ETH-USD", session)
+
+    # when
+    market_id = cache.market_id("ETH-USD", session)
+
+    # then
+    assert market_id == sqlite_market.id
+
+
+def test_concurrent_inserts_agree_on_id(
+    sqlite_engine_in_memory: Engine,
+    sqlite_candle_storage_memory: SqliteCandleStorage,
+) -> None:
+    # given
+    _ = sqlite_candle_storage_memory
+    cache = DimensionCache()
+
+    def insert(_: int) -> int | None:
+        with Session(sqlite_engine_in_memory) as session:
+            return cache.exchange_id(Exchange.DYDX_V4, session, insert=True)
+
+    # when
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        ids = list(executor.map(insert, range(32)))
+
+    # then
+    assert len(set(ids)) == 1
+    assert ids[0] is not None
+
+
+@pytest.mark.asyncio
+async def test_known_dimensions_need_no_lookups(
+    sqlite_engine_in_memory: Engine,
+    sqlite_candle_storage_memory: SqliteCandleStorage,
+) -> None:
+    # given
+    storage = sqlite_candle_storage_memory
+    market = "ETH-USD"
+    res = ResolutionDetail(Seconds.ONE_MINUTE, "1MIN")
+    start_date = string_to_datetime("2024-01-01T00:00:00.000Z")
+    candles = mock_dydx_v4_candles(market, res, 100, start_date)
+    await storage.store_candles(candles[:50])
+
+    # when
+    statements = _capture_statements(sqlite_engine_in_memory)
+    await storage.store_candles(candles[50:])
+    await storage.retrieve_cluster(Exchange.DYDX_V4, market, res)
+
+    # then
+    dimension_tables = ("FROM exchange", "FROM market", "FROM resolution")
+    lookups = [s for s in statements if any(t in s for t in dimension_tables)]
+    assert lookups == []
+
+
+def _capture_statements(engine: Engine) -> List[str]:
+    statements: List[str] = []
+
+    def capture(conn: Any, cursor: Any, statement: str, *_: Any) -> None:
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", capture)
+    return statements
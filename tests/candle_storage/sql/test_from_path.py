@@ -0,0 +1,90 @@
+import asyncio
+from datetime import timedelta
+from pathlib import Path
+import sqlite3
+
+import pytest
+
+from sir_utilities.date_time import string_to_datetime
+
+from locast.candle.exchange import Exchange
+from locast.candle.exchange_resolution import ResolutionDetail, Seconds
+from locast.candle_storage.sql.sqlite_candle_storage import SqliteCandleStorage
+
+from tests.helper.candle_mockery.mock_dydx_v4_candles import mock_dydx_v4_candles
+
+exchange = Exchange.DYDX_V4
+res = ResolutionDetail(Seconds.ONE_MINUTE, "1MIN")
+start_date = string_to_datetime("2024-01-01T00:00:00.000Z")
+
+
+def test_from_path_puts_database_in_wal_mode(tmp_path: Path) -> None:
+    # given
+    path = tmp_path / "candles.db"
+
+    # when
+    _ = SqliteCandleStorage.from_path(str(path))
+
+    # then the journal mode persists in the file, for every connection
+    with sqlite3.connect(path) as conn:
+        assert conn.execute("PRAGMA journal_mode").fetchone() == ("wal",)
+
+
+@pytest.mark.asyncio
+async def test_close_releases_the_database_file(tmp_path: Path) -> None:
+    # given
+    path = tmp_path / "candles.db"
+    storage = SqliteCandleStorage.from_path(str(path))
+    await storage.store_candles(mock_dydx_v4_candles("ETH-USD", res, 100, start_date))
+    await storage.retrieve_cluster(exchange, "ETH-USD", res)
+
+    # when
+    storage.close()
+
+    # then the last connection closing checkpointed and removed the write-ahead log
+    assert not (tmp_path / "candles.db-wal").exists()
+
+
+@pytest.mark.asyncio
+async def test_reads_do_not_wait_on_a_write_in_progress(tmp_path: Path) -> None:
+    # given
+    path = tmp_path / "candles.db"
+    storage = SqliteCandleStorage.from_path(
+        str(path), busy_timeout=timedelta(seconds=1)
+    )
+    candles = mock_dydx_v4_candles("ETH-USD", res, 100, start_date)
+    await storage.store_candles(candles)
+
+    # when another writer holds the database exclusively
+    writer = sqlite3.connect(path, isolation_level=None)
+    writer.execute("BEGIN EXCLUSIVE")
+    writer.execute("DELETE FROM candle")
+    try:
+        retrieved = await storage.retrieve_cluster(exchange, "ETH-USD", res)
+        info = await storage.get_cluster_info(exchange, "ETH-USD", res)
+    finally:
+        writer.rollback()
+        writer.close()
+
+    # then the last commit is read
+    assert len(retrieved) == 100
+    assert info.size == 100
+
+
+@pytest.mark.asyncio
+async def test_concurrent_writes_are_serialized(tmp_path: Path) -> None:
+    # given
+    storage = SqliteCandleStorage.from_path(str(tmp_path / "candles.db"))
+    markets = [f"MARKET{i}-USD" for i in range(8)]
+
+    async def store(market: str) -> None:
+        candles = mock_dydx_v4_candles(market, res, 6000, start_date)
+        await asyncio.to_thread(asyncio.run, storage.store_candles(candles))
+
+    # when
+    await asyncio.gather(*(store(market) for market in markets))
+
+    # then
+    for market in markets:
+        info = await storage.get_cluster_info(exchange, market, res)
+        assert info.size == 6000
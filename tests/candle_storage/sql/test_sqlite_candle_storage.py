@@ -1,20 +1,34 @@
-from datetime import timedelta
-from typing import List, Type
+import asyncio
+from dataclasses import replace
+from datetime import datetime, timedelta
+from decimal import Decimal
+from typing import Any, List, Tuple, Type
+import numpy as np
 import pytest
-from sqlalchemy import Engine, MetaData
+from sqlalchemy import Engine, MetaData, create_engine, event
+from sqlalchemy.exc import IntegrityError
 from sqlmodel import SQLModel, Session, select
 
 from sir_utilities.date_time import string_to_datetime
 
+from locast.candle.candle import Candle
 from locast.candle.exchange import Exchange
 from locast.candle.exchange_resolution import ResolutionDetail, Seconds
+from locast.candle.gap import Gap
 from locast.candle_storage.sql.table_utility import TableUtility as tu
 from locast.candle_storage.sql.sqlite_candle_storage import SqliteCandleStorage
+from locast.candle_storage.backfill_checkpoint import BackfillCheckpoint
+from locast.candle_storage.market_horizon import MarketHorizon
+from locast.candle_storage.on_conflict import OnConflict
 from locast.candle_storage.sql.tables import (
+    SqliteBackfillCheckpoint,
     SqliteCandle,
+    SqliteCluster,
     SqliteExchange,
     SqliteMarket,
+    SqliteMarketHorizon,
     SqliteResolution,
+    SqliteUnfillableGap,
 )
 
 from locast.candle.candle_utility import CandleUtility as cu
@@ -32,6 +46,10 @@ tables: List[Type[SQLModel]] = [
     SqliteMarket,
     SqliteResolution,
     SqliteCandle,
+    SqliteBackfillCheckpoint,
+    SqliteMarketHorizon,
+    SqliteCluster,
+    SqliteUnfillableGap,
 ]
 
 
@@ -48,6 +66,39 @@ def test_initialization_creates_all_tables_empty(
     assert _table_is_empty(Session(sqlite_engine_in_memory), table)
 
 
+@pytest.mark.asyncio
+async def test_storage_on_engine_with_connection_per_thread_works() -> None:
+    # given an in-memory database of the default pool, which exists for one thread only
+    storage = SqliteCandleStorage(create_engine("sqlite://"))
+    res = ResolutionDetail(Seconds.ONE_MINUTE, "1MIN")
+    start_date = string_to_datetime("2022-01-01T00:00:00.000Z")
+    candles = mock_dydx_v4_candles("ETH-USD", res, 10, start_date)
+
+    # when
+    await storage.store_candles(candles)
+    cluster = await storage.retrieve_cluster(Exchange.DYDX_V4, "ETH-USD", res)
+    storage.close()
+
+    # then
+    assert len(cluster) == 10
+
+
+@pytest.mark.asyncio
+async def test_closed_storage_runs_no_more_queries(
+    sqlite_engine_in_memory: Engine,
+) -> None:
+    # given
+    storage = SqliteCandleStorage(sqlite_engine_in_memory)
+    res = ResolutionDetail(Seconds.ONE_MINUTE, "1MIN")
+
+    # when
+    storage.close()
+
+    # then
+    with pytest.raises(RuntimeError):
+        await storage.retrieve_cluster(Exchange.DYDX_V4, "ETH-USD", res)
+
+
 @pytest.mark.parametrize("amount", few_amounts)
 @pytest.mark.asyncio
 async def test_store_candles_results_in_correct_storage_state(
@@ -75,6 +126,196 @@ async def test_store_candles_results_in_correct_storage_state(
     assert _table_has_amount_of_rows(engine, SqliteResolution, 1)
 
 
+@pytest.mark.asyncio
+async def test_store_candles_inserts_each_batch_at_once(
+    sqlite_engine_in_memory: Engine,
+    sqlite_candle_storage_memory: SqliteCandleStorage,
+) -> None:
+    # given
+    engine = sqlite_engine_in_memory
+    storage = sqlite_candle_storage_memory
+
+    res = ResolutionDetail(Seconds.ONE_MINUTE, "1MIN")
+    start_date = string_to_datetime("2022-01-01T00:00:00.000Z")
+    candles = mock_dydx_v4_candles("ETH-USD", res, 12000, start_date)
+
+    # when
+    statements = _count_statements(engine)
+    await storage.store_candles(candles)
+
+    # then
+    inserts = [s for s in statements if s.startswith("INSERT INTO candle")]
+    assert len(inserts) == 3
+    assert _table_has_amount_of_rows(engine, SqliteCandle, 12000)
+
+
+@pytest.mark.asyncio
+async def test_store_candles_does_not_block_event_loop(
+    sqlite_candle_storage_memory: SqliteCandleStorage,
+) -> None:
+    # given
+    storage = sqlite_candle_storage_memory
+
+    res = ResolutionDetail(Seconds.ONE_MINUTE, "1MIN")
+    start_date = string_to_datetime("2022-01-01T00:00:00.000Z")
+    candles = mock_dydx_v4_candles("ETH-USD", res, 20000, start_date)
+
+    ticks = 0
+
+    async def tick() -> None:
+        nonlocal ticks
+        while True:
+            ticks += 1
+            await asyncio.sleep(0)
+
+    # when
+    ticker = asyncio.create_task(tick())
+    await storage.store_candles(candles)
+    ticker.cancel()
+
+    # then other tasks kept running while the candles were written
+    assert ticks > 1
+
+
+@pytest.mark.parametrize("on_conflict", list(OnConflict))
+@pytest.mark.asyncio
+async def test_store_candles_resolves_overlaps(
+    sqlite_candle_storage_memory: SqliteCandleStorage,
+    on_conflict: OnConflict,
+) -> None:
+    # given a cluster and candles overlapping half of it, with a changed close
+    storage = sqlite_candle_storage_memory
+    exchange = Exchange.DYDX_V4
+    market = "ETH-USD"
+    res = ResolutionDetail(Seconds.ONE_MINUTE, "1MIN")
+    start_date = string_to_datetime("2022-01-01T00:00:00.000Z")
+
+    stored = mock_dydx_v4_candles(market, res, 100, start_date)
+    overlap_start = start_date + timedelta(minutes=50)
+    overlapping = [
+        replace(candle, close=Decimal("1.5"))
+        for candle in mock_dydx_v4_candles(market, res, 100, overlap_start)
+    ]
+    await storage.store_candles(stored)
+
+    # when
+    await storage.store_candles(overlapping, on_conflict)
+
+    # then
+    cluster = await storage.retrieve_cluster(exchange, market, res)
+    cluster_info = await storage.get_cluster_info(exchange, market, res)
+    assert len(cluster) == cluster_info.size == 150
+
+    overlapped = [c for c in cluster if c.started_at >= overlap_start][-50:]
+    expected = {
+        OnConflict.IGNORE: stored[0].close,
+        OnConflict.REPLACE: Decimal("1.5"),
+    }[on_conflict]
+    assert {candle.close for candle in overlapped} == {expected}
+
+
+@pytest.mark.asyncio
+async def test_store_candles_raises_on_overlap(
+    sqlite_candle_storage_memory: SqliteCandleStorage,
+) -> None:
+    # given
+    storage = sqlite_candle_storage_memory
+    res = ResolutionDetail(Seconds.ONE_MINUTE, "1MIN")
+    start_date = string_to_datetime("2022-01-01T00:00:00.000Z")
+    candles = mock_dydx_v4_candles("ETH-USD", res, 100, start_date)
+    await storage.store_candles(candles)
+
+    # when & then
+    with pytest.raises(IntegrityError):
+        await storage.store_candles(candles[:10])
+
+
+@pytest.mark.parametrize("amount", few_amounts)
+@pytest.mark.asyncio
+async def test_store_clusters_results_in_correct_storage_state(
+    sqlite_engine_in_memory: Engine,
+    sqlite_candle_storage_memory: SqliteCandleStorage,
+    amount: int,
+) -> None:
+    # given
+    engine = sqlite_engine_in_memory
+    storage = sqlite_candle_storage_memory
+
+    one_min = ResolutionDetail(Seconds.ONE_MINUTE, "1MIN")
+    five_mins = ResolutionDetail(Seconds.FIVE_MINUTES, "5MINS")
+    start_date = string_to_datetime("2022-01-01T00:00:00.000Z")
+
+    clusters = [
+        mock_dydx_v4_candles("ETH-USD", one_min, amount, start_date),
+        mock_dydx_v4_candles("BTC-USD", one_min, amount, start_date),
+        mock_dydx_v4_candles("ETH-USD", five_mins, amount, start_date),
+        [],
+    ]
+
+    # when
+    await storage.store_clusters(clusters)
+
+    # then
+    eth = await storage.get_cluster_info(Exchange.DYDX_V4, "ETH-USD", five_mins)
+    assert eth.size == amount
+    assert _table_has_amount_of_rows(engine, SqliteCandle, amount * 3)
+    assert _table_has_amount_of_rows(engine, SqliteMarket, 2)
+    assert _table_has_amount_of_rows(engine, SqliteResolution, 2)
+
+
+@pytest.mark.asyncio
+async def test_store_clusters_resolves_conflicts_per_cluster(
+    sqlite_candle_storage_memory: SqliteCandleStorage,
+) -> None:
+    # given two stored clusters and changed candles of both
+    storage = sqlite_candle_storage_memory
+    exchange = Exchange.DYDX_V4
+    res = ResolutionDetail(Seconds.ONE_MINUTE, "1MIN")
+    start_date = string_to_datetime("2022-01-01T00:00:00.000Z")
+
+    eth = mock_dydx_v4_candles("ETH-USD", res, 10, start_date)
+    btc = mock_dydx_v4_candles("BTC-USD", res, 10, start_date)
+    await storage.store_clusters([eth, btc])
+
+    # when
+    await storage.store_clusters(
+        [
+            [replace(candle, close=Decimal("1.5")) for candle in eth],
+            [replace(candle, close=Decimal("1.5")) for candle in btc],
+        ],
+        [OnConflict.IGNORE, OnConflict.REPLACE],
+    )
+
+    # then
+    stored_eth = await storage.retrieve_cluster(exchange, "ETH-USD", res)
+    stored_btc = await storage.retrieve_cluster(exchange, "BTC-USD", res)
+    assert [c.close for c in stored_eth] == [c.close for c in eth]
+    assert {c.close for c in stored_btc} == {Decimal("1.5")}
+
+
+@pytest.mark.asyncio
+async def test_store_clusters_failing_stores_no_cluster(
+    sqlite_engine_in_memory: Engine,
+    sqlite_candle_storage_memory: SqliteCandleStorage,
+) -> None:
+    # given clusters of which one is new to the storage and the last one conflicts with the first
+    engine = sqlite_engine_in_memory
+    storage = sqlite_candle_storage_memory
+    res = ResolutionDetail(Seconds.ONE_MINUTE, "1MIN")
+    start_date = string_to_datetime("2022-01-01T00:00:00.000Z")
+
+    eth = mock_dydx_v4_candles("ETH-USD", res, 10, start_date)
+    btc = mock_dydx_v4_candles("BTC-USD", res, 10, start_date)
+
+    # when
+    with pytest.raises(IntegrityError):
+        await storage.store_clusters([eth, btc, eth])
+
+    # then
+    assert _table_has_amount_of_rows(engine, SqliteCandle, 0)
+    assert _table_has_amount_of_rows(engine, SqliteCluster, 0)
+
+
 @pytest.mark.parametrize("amount", few_amounts)
 @pytest.mark.asyncio
 async def test_retrieve_cluster_results_in_correct_cluster(
@@ -102,6 +343,47 @@ async def test_retrieve_cluster_results_in_correct_cluster(
     assert retrieved_candles[0].resolution == res
 
 
+@pytest.mark.asyncio
+async def test_retrieve_cluster_results_in_stored_candles(
+    sqlite_candle_storage_memory: SqliteCandleStorage,
+) -> None:
+    # given
+    storage = sqlite_candle_storage_memory
+
+    exchange = Exchange.DYDX_V4
+    res = ResolutionDetail(Seconds.ONE_MINUTE, "1MIN")
+    start_date = string_to_datetime("2022-01-01T00:00:00.000Z")
+    market = "ETH-USD"
+
+    candles = mock_dydx_v4_candles(market, res, 10, start_date)
+    for i, candle in enumerate(candles):
+        candle.open = Decimal("3456.7891") + i
+        candle.high = Decimal("3500.1") + i
+        candle.low = Decimal("3400.2") + i
+        candle.close = Decimal("3456.3") + i
+        candle.base_token_volume = Decimal("12.5") * i
+        candle.trades = i
+        candle.usd_volume = Decimal("1234567.0001") * i
+        candle.starting_open_interest = Decimal("11132.7") + i
+    await storage.store_candles(candles)
+
+    # when
+    retrieved_candles = await storage.retrieve_cluster(exchange, market, res)
+    info = await storage.get_cluster_info(exchange, market, res)
+
+    # then
+    for candle in retrieved_candles:
+        candle.id = None
+    assert retrieved_candles == sorted(
+        candles,
+        key=lambda c: c.started_at,
+        reverse=True,
+    )
+    assert info.newest_candle and info.oldest_candle
+    assert info.newest_candle.started_at == retrieved_candles[0].started_at
+    assert info.oldest_candle.close == retrieved_candles[-1].close
+
+
 @pytest.mark.asyncio
 async def test_retrieve_cluster_results_in_empty_list(
     sqlite_candle_storage_memory: SqliteCandleStorage,
@@ -120,6 +402,200 @@ async def test_retrieve_cluster_results_in_empty_list(
     assert len(retrieved_candles) == 0
 
 
+@pytest.mark.parametrize("scale", [None, 4])
+@pytest.mark.parametrize("amount", few_amounts)
+@pytest.mark.asyncio
+async def test_retrieve_cluster_frame_results_in_correct_frame(
+    sqlite_candle_storage_memory: SqliteCandleStorage,
+    amount: int,
+    scale: int | None,
+) -> None:
+    # given
+    storage = sqlite_candle_storage_memory
+
+    exchange = Exchange.DYDX_V4
+    res = ResolutionDetail(Seconds.ONE_MINUTE, "1MIN")
+    start_date = string_to_datetime("2022-01-01T00:00:00.000Z")
+    market = "ETH-USD"
+
+    candles = mock_dydx_v4_candles(market, res, amount, start_date)
+    for i, candle in enumerate(candles):
+        candle.open = Decimal("3456.7891") + i
+        candle.usd_volume = Decimal("1234567.0001") * i
+        candle.trades = i
+    await storage.store_candles(candles)
+
+    # when
+    frame = await storage.retrieve_cluster_frame(exchange, market, res, scale)
+
+    # then
+    cluster = await storage.retrieve_cluster(exchange, market, res)
+    assert len(frame) == amount
+    assert (frame.exchange, frame.market, frame.resolution) == (exchange, market, res)
+    assert frame.scale == scale
+    assert frame.started_at.tolist() == [
+        int(candle.started_at.timestamp()) for candle in cluster
+    ]
+    assert frame.trades.tolist() == [candle.trades for candle in cluster]
+    if scale is None:
+        assert frame.open.tolist() == [float(candle.open) for candle in cluster]
+        assert frame.usd_volume.tolist() == [
+            float(candle.usd_volume) for candle in cluster
+        ]
+    else:
+        assert frame.open.tolist() == [
+            int(candle.open * 10**scale) for candle in cluster
+        ]
+        assert frame.usd_volume.tolist() == [
+            int(candle.usd_volume * 10**scale) for candle in cluster
+        ]
+
+
+@pytest.mark.asyncio
+async def test_retrieve_cluster_frame_results_in_empty_frame(
+    sqlite_candle_storage_memory: SqliteCandleStorage,
+) -> None:
+    # given
+    storage = sqlite_candle_storage_memory
+
+    exchange = Exchange.DYDX_V4
+    res = ResolutionDetail(Seconds.ONE_MINUTE, "1MIN")
+    market = "ETH-USD"
+
+    # when no cluster in storage
+    frame = await storage.retrieve_cluster_frame(exchange, market, res)
+
+    # then
+    assert len(frame) == 0
+    assert len(frame.close) == 0
+
+
+@pytest.mark.asyncio
+async def test_retrieve_started_at_results_in_epoch_seconds(
+    sqlite_candle_storage_memory: SqliteCandleStorage,
+) -> None:
+    # given
+    storage = sqlite_candle_storage_memory
+
+    exchange = Exchange.DYDX_V4
+    market = "ETH-USD"
+    res = ResolutionDetail(Seconds.ONE_MINUTE, "1MIN")
+    start_date = string_to_datetime("2022-01-01T00:00:00.000Z")
+
+    candles = mock_dydx_v4_candles(market, res, 100, start_date)
+    await storage.store_candles(candles)
+
+    # when
+    started_at = await storage.retrieve_started_at(exchange, market, res)
+    none_stored = await storage.retrieve_started_at(exchange, "BTC-USD", res)
+
+    # then newest-first, like the candles of a cluster
+    assert started_at.dtype == np.int64
+    assert started_at.tolist() == [int(c.started_at.timestamp()) for c in candles]
+    assert len(none_stored) == 0
+
+
+@pytest.mark.parametrize("start_offset, end_offset", [(0, 1000), (10, 20), (999, 1000)])
+@pytest.mark.asyncio
+async def test_retrieve_segment_results_in_correct_segment(
+    sqlite_candle_storage_memory: SqliteCandleStorage,
+    start_offset: int,
+    end_offset: int,
+) -> None:
+    # given
+    storage = sqlite_candle_storage_memory
+
+    exchange = Exchange.DYDX_V4
+    res = ResolutionDetail(Seconds.ONE_MINUTE, "1MIN")
+    start_date = string_to_datetime("2022-01-01T00:00:00.000Z")
+    market = "ETH-USD"
+
+    await storage.store_candles(mock_dydx_v4_candles(market, res, 1000, start_date))
+    segment_start = start_date + timedelta(minutes=start_offset)
+    segment_end = start_date + timedelta(minutes=end_offset)
+
+    # when
+    segment = await storage.retrieve_segment(
+        exchange,
+        market,
+        res,
+        segment_start,
+        segment_end,
+    )
+
+    # then
+    assert len(segment) == end_offset - start_offset
+    assert segment[0].started_at == segment_end - timedelta(minutes=1)
+    assert segment[-1].started_at == segment_start
+
+
+@pytest.mark.asyncio
+async def test_retrieve_segment_uses_index(
+    sqlite_engine_in_memory: Engine,
+    sqlite_candle_storage_memory: SqliteCandleStorage,
+) -> None:
+    # given
+    engine = sqlite_engine_in_memory
+    storage = sqlite_candle_storage_memory
+
+    exchange = Exchange.DYDX_V4
+    res = ResolutionDetail(Seconds.ONE_MINUTE, "1MIN")
+    start_date = string_to_datetime("2022-01-01T00:00:00.000Z")
+    market = "ETH-USD"
+
+    await storage.store_candles(mock_dydx_v4_candles(market, res, 100, start_date))
+    statements: List[Tuple[str, Any]] = []
+
+    def capture(conn: Any, cursor: Any, statement: str, params: Any, *_: Any) -> None:
+        if "FROM candle" in statement and "started_at >=" in statement:
+            statements.append((statement, params))
+
+    event.listen(engine, "before_cursor_execute", capture)
+
+    # when
+    await storage.retrieve_segment(
+        exchange,
+        market,
+        res,
+        start_date,
+        start_date + timedelta(minutes=10),
+    )
+    event.remove(engine, "before_cursor_execute", capture)
+
+    # then
+    statement, params = statements[0]
+    with engine.connect() as conn:
+        plan = conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", params).all()
+    details = " ".join(str(row[-1]) for row in plan)
+    assert "USING INDEX" in details
+    assert "started_at>? AND started_at<?" in details
+
+
+@pytest.mark.asyncio
+async def test_retrieve_segment_results_in_empty_list(
+    sqlite_candle_storage_memory: SqliteCandleStorage,
+) -> None:
+    # given
+    storage = sqlite_candle_storage_memory
+
+    exchange = Exchange.DYDX_V4
+    res = ResolutionDetail(Seconds.ONE_MINUTE, "1MIN")
+    start_date = string_to_datetime("2022-01-01T00:00:00.000Z")
+    market = "ETH-USD"
+
+    # when no cluster in storage
+    segment = await storage.retrieve_segment(
+        exchange,
+        market,
+        res,
+        start_date,
+        start_date + timedelta(minutes=10),
+    )
+
+    # then
+    assert len(segment) == 0
+
+
 @pytest.mark.asyncio
 async def test_retrieve_newest_candles_results_in_correct_list(
     sqlite_candle_storage_memory: SqliteCandleStorage,
@@ -266,6 +742,60 @@ async def test_delete_cluster_only_deletes_one_cluster(
     assert _table_has_amount_of_rows(engine, SqliteResolution, 1)
 
 
+@pytest.mark.asyncio
+async def test_trim_cluster_results_in_correct_state(
+    sqlite_engine_in_memory: Engine,
+    sqlite_candle_storage_memory: SqliteCandleStorage,
+) -> None:
+    # given a cluster spanning several delete batches and another cluster
+    engine = sqlite_engine_in_memory
+    storage = sqlite_candle_storage_memory
+
+    exchange = Exchange.DYDX_V4
+    market = "ETH-USD"
+    res = ResolutionDetail(Seconds.ONE_MINUTE, "1MIN")
+    start_date = string_to_datetime("2024-01-01T00:00:00.000Z")
+    before = start_date + timedelta(minutes=11000)
+
+    await storage.store_candles(mock_dydx_v4_candles(market, res, 12000, start_date))
+    await storage.store_candles(mock_dydx_v4_candles("BTC-USD", res, 10, start_date))
+
+    # when
+    await storage.trim_cluster(exchange, market, res, before)
+
+    # then
+    cluster_info = await storage.get_cluster_info(exchange, market, res)
+    assert cluster_info.oldest_candle
+    assert cluster_info.oldest_candle.started_at == before
+    assert cluster_info.size == 1000
+    assert _table_has_amount_of_rows(engine, SqliteCandle, 1010)
+
+
+@pytest.mark.asyncio
+async def test_trim_cluster_deletes_whole_cluster(
+    sqlite_engine_in_memory: Engine,
+    sqlite_candle_storage_memory: SqliteCandleStorage,
+) -> None:
+    # given
+    engine = sqlite_engine_in_memory
+    storage = sqlite_candle_storage_memory
+
+    exchange = Exchange.DYDX_V4
+    market = "ETH-USD"
+    res = ResolutionDetail(Seconds.ONE_MINUTE, "1MIN")
+    start_date = string_to_datetime("2024-01-01T00:00:00.000Z")
+    await storage.store_candles(mock_dydx_v4_candles(market, res, 100, start_date))
+
+    # when
+    await storage.trim_cluster(exchange, market, res, start_date + timedelta(days=1))
+
+    # then
+    cluster_info = await storage.get_cluster_info(exchange, market, res)
+    assert cluster_info.size == 0
+    assert _table_is_empty(Session(engine), SqliteCandle)
+    assert _table_is_empty(Session(engine), SqliteCluster)
+
+
 @pytest.mark.asyncio
 async def test_get_cluster_head_results_in_newest_candle(
     sqlite_candle_storage_memory: SqliteCandleStorage,
@@ -370,6 +900,67 @@ async def test_get_cluster_info_results_in_correct_info(
     assert cluster_info.is_uptodate
 
 
+@pytest.mark.asyncio
+async def test_get_cluster_info_is_maintained_across_stores(
+    sqlite_engine_in_memory: Engine,
+    sqlite_candle_storage_memory: SqliteCandleStorage,
+) -> None:
+    # given
+    engine = sqlite_engine_in_memory
+    storage = sqlite_candle_storage_memory
+
+    exchange = Exchange.DYDX_V4
+    market = "ETH-USD"
+    res = ResolutionDetail(Seconds.ONE_MINUTE, "1MIN")
+    start_date = string_to_datetime("2024-01-01T00:00:00.000Z")
+
+    older = mock_dydx_v4_candles(market, res, 7000, start_date)
+    newer_start = start_date + timedelta(minutes=7000)
+    newer = mock_dydx_v4_candles(market, res, 10, newer_start)
+    btc = mock_dydx_v4_candles("BTC-USD", res, 5, start_date)
+
+    # when
+    await storage.store_candles(older)
+    await storage.store_clusters([newer, btc])
+    statements = _count_statements(engine)
+    cluster_info = await storage.get_cluster_info(exchange, market, res)
+
+    # then
+    assert cluster_info.newest_candle and cluster_info.oldest_candle
+    newest, oldest = max(newer, key=_started_at), min(older, key=_started_at)
+    assert _without_id(cluster_info.newest_candle) == _without_id(newest)
+    assert _without_id(cluster_info.oldest_candle) == _without_id(oldest)
+    assert cluster_info.size == 7010
+    assert len(statements) == 1
+    assert _table_has_amount_of_rows(engine, SqliteCluster, 2)
+
+
+@pytest.mark.asyncio
+async def test_initialization_derives_cluster_table(
+    sqlite_engine_in_memory: Engine,
+    sqlite_candle_storage_memory: SqliteCandleStorage,
+) -> None:
+    # given a database created before cluster metadata existed
+    engine = sqlite_engine_in_memory
+    storage = sqlite_candle_storage_memory
+
+    exchange = Exchange.DYDX_V4
+    market = "ETH-USD"
+    res = ResolutionDetail(Seconds.ONE_MINUTE, "1MIN")
+    start_date = string_to_datetime("2024-01-01T00:00:00.000Z")
+
+    await storage.store_candles(mock_dydx_v4_candles(market, res, 10, start_date))
+    expected_info = await storage.get_cluster_info(exchange, market, res)
+    SqliteCluster.__table__.drop(engine)  # type: ignore
+
+    # when
+    storage = SqliteCandleStorage(engine)
+
+    # then
+    cluster_info = await storage.get_cluster_info(exchange, market, res)
+    assert cluster_info == expected_info
+
+
 @pytest.mark.asyncio
 async def test_get_cluster_info_results_in_none(
     sqlite_session_in_memory: Session,
@@ -392,6 +983,175 @@ async def test_get_cluster_info_results_in_none(
     assert cluster_info.is_uptodate is False
 
 
+@pytest.mark.asyncio
+async def test_store_checkpoint_results_in_correct_checkpoint(
+    sqlite_candle_storage_memory: SqliteCandleStorage,
+) -> None:
+    # given
+    storage = sqlite_candle_storage_memory
+
+    exchange = Exchange.DYDX_V4
+    market = "ETH-USD"
+    res = ResolutionDetail(Seconds.ONE_MINUTE, "1MIN")
+    checkpoint = BackfillCheckpoint(
+        start_date=string_to_datetime("2024-01-01T00:00:00.000Z"),
+        oldest_started_at=string_to_datetime("2024-02-01T00:00:00.000Z"),
+        updated_at=string_to_datetime("2024-03-01T00:00:00.000Z"),
+    )
+    await storage.store_checkpoint(exchange, market, res, checkpoint)
+
+    # when progress is stored again
+    checkpoint.oldest_started_at = string_to_datetime("2024-01-15T00:00:00.000Z")
+    await storage.store_checkpoint(exchange, market, res, checkpoint)
+
+    # then
+    stored_checkpoint = await storage.retrieve_checkpoint(exchange, market, res)
+    assert stored_checkpoint == checkpoint
+
+
+@pytest.mark.asyncio
+async def test_retrieve_checkpoint_results_in_none(
+    sqlite_candle_storage_memory: SqliteCandleStorage,
+) -> None:
+    # given
+    storage = sqlite_candle_storage_memory
+
+    exchange = Exchange.DYDX_V4
+    market = "ETH-USD"
+    res = ResolutionDetail(Seconds.ONE_MINUTE, "1MIN")
+
+    # when no checkpoint in storage
+    checkpoint = await storage.retrieve_checkpoint(exchange, market, res)
+
+    # then
+    assert checkpoint is None
+
+
+@pytest.mark.asyncio
+async def test_store_horizon_results_in_correct_horizon(
+    sqlite_candle_storage_memory: SqliteCandleStorage,
+) -> None:
+    # given
+    storage = sqlite_candle_storage_memory
+
+    exchange = Exchange.DYDX_V4
+    market = "ETH-USD"
+    res = ResolutionDetail(Seconds.ONE_MINUTE, "1MIN")
+    horizon = MarketHorizon(
+        horizon=string_to_datetime("2023-10-26T00:00:00.000Z"),
+        found_at=string_to_datetime("2024-03-01T00:00:00.000Z"),
+    )
+    await storage.store_horizon(exchange, market, res, horizon)
+
+    # when horizon is searched and stored again
+    horizon.found_at = string_to_datetime("2024-04-01T00:00:00.000Z")
+    await storage.store_horizon(exchange, market, res, horizon)
+
+    # then
+    stored_horizon = await storage.retrieve_horizon(exchange, market, res)
+    assert stored_horizon == horizon
+
+
+@pytest.mark.asyncio
+async def test_retrieve_horizon_results_in_none(
+    sqlite_candle_storage_memory: SqliteCandleStorage,
+) -> None:
+    # given
+    storage = sqlite_candle_storage_memory
+
+    exchange = Exchange.DYDX_V4
+    market = "ETH-USD"
+    res = ResolutionDetail(Seconds.ONE_MINUTE, "1MIN")
+
+    # when no horizon in storage
+    horizon = await storage.retrieve_horizon(exchange, market, res)
+
+    # then
+    assert horizon is None
+
+
+@pytest.mark.asyncio
+async def test_delete_cluster_deletes_checkpoint(
+    sqlite_engine_in_memory: Engine,
+    sqlite_candle_storage_memory: SqliteCandleStorage,
+) -> None:
+    # given
+    engine = sqlite_engine_in_memory
+    storage = sqlite_candle_storage_memory
+
+    exchange = Exchange.DYDX_V4
+    market = "ETH-USD"
+    res = ResolutionDetail(Seconds.ONE_MINUTE, "1MIN")
+    start_date = string_to_datetime("2022-01-01T00:00:00.000Z")
+
+    candles = mock_dydx_v4_candles(market, res, 10, start_date)
+    await storage.store_candles(candles)
+    await storage.store_checkpoint(
+        exchange,
+        market,
+        res,
+        BackfillCheckpoint(start_date, start_date, start_date),
+    )
+
+    # when
+    await storage.delete_cluster(exchange, market, res)
+
+    # then
+    assert _table_has_amount_of_rows(engine, SqliteBackfillCheckpoint, 0)
+    assert _table_has_amount_of_rows(engine, SqliteCluster, 0)
+
+
+@pytest.mark.asyncio
+async def test_store_unfillable_gaps_results_in_correct_gaps(
+    sqlite_candle_storage_memory: SqliteCandleStorage,
+) -> None:
+    # given
+    storage = sqlite_candle_storage_memory
+
+    exchange = Exchange.DYDX_V4
+    market = "ETH-USD"
+    res = ResolutionDetail(Seconds.ONE_MINUTE, "1MIN")
+    start_date = string_to_datetime("2022-01-01T00:00:00.000Z")
+    older, newer = Gap(start_date, 3), Gap(start_date + timedelta(hours=1), 1)
+
+    # when a gap is recorded again, having shrunk in the meantime
+    await storage.store_unfillable_gaps(exchange, market, res, [Gap(start_date, 5)])
+    await storage.store_unfillable_gaps(exchange, market, res, [older, newer])
+    gaps = await storage.retrieve_unfillable_gaps(exchange, market, res)
+    none_stored = await storage.retrieve_unfillable_gaps(exchange, "BTC-USD", res)
+
+    # then
+    assert gaps == [newer, older]
+    assert none_stored == []
+
+
+@pytest.mark.asyncio
+async def test_delete_cluster_deletes_unfillable_gaps(
+    sqlite_engine_in_memory: Engine,
+    sqlite_candle_storage_memory: SqliteCandleStorage,
+) -> None:
+    # given
+    engine = sqlite_engine_in_memory
+    storage = sqlite_candle_storage_memory
+
+    exchange = Exchange.DYDX_V4
+    market = "ETH-USD"
+    res = ResolutionDetail(Seconds.ONE_MINUTE, "1MIN")
+    start_date = string_to_datetime("2022-01-01T00:00:00.000Z")
+
+    candles = mock_dydx_v4_candles(market, res, 10, start_date)
+    await storage.store_candles(candles[:4] + candles[5:])
+    await storage.store_unfillable_gaps(
+        exchange, market, res, [Gap(candles[4].started_at, 1)]
+    )
+
+    # when
+    await storage.delete_cluster(exchange, market, res)
+
+    # then
+    assert _table_has_amount_of_rows(engine, SqliteUnfillableGap, 0)
+
+
 def _table_exists(engine: Engine, table: Type[SQLModel]) -> bool:
     metadata = MetaData()
     metadata.reflect(bind=engine)
@@ -413,3 +1173,21 @@ def _table_has_amount_of_rows(
         statement = select(table)
         result = session.exec(statement).all()
         return amount == len(result)
+
+
+def _count_statements(engine: Engine) -> List[str]:
+    statements: List[str] = []
+
+    def capture(conn: Any, cursor: Any, statement: str, *_: Any) -> None:
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", capture)
+    return statements
+
+
+def _started_at(candle: Candle) -> datetime:
+    return candle.started_at
+
+
+def _without_id(candle: Candle) -> Candle:
+    return replace(candle, id=None)
@@ -1,3 +1,4 @@
+from datetime import timedelta
 from typing import AsyncGenerator, Generator, List
 import pytest
 import pytest_asyncio
@@ -17,6 +18,7 @@ from locast.candle.dydx.dydx_candle_mapping import DydxV4CandleMapping
 from locast.candle.dydx.dydx_resolution import DydxResolution
 from locast.candle.exchange import Exchange
 from locast.candle.exchange_candle_mapper import ExchangeCandleMapper
+from locast.candle_feed.dydx.dydx_v4_candle_feed import DydxV4CandleFeed
 from locast.candle_fetcher.dydx.api_fetcher.dydx_v4_fetcher import DydxV4Fetcher
 from locast.candle_fetcher.dydx.candle_fetcher.dydx_candle_fetcher import (
     DydxCandleFetcher,
@@ -28,6 +30,7 @@ from locast.candle.candle_utility import CandleUtility as cu
 from locast.store_manager.store_manager import StoreManager
 from tests.helper.candle_mockery.dydx_candle_backend_mock import DydxCandleBackendMock
 from tests.helper.candle_mockery.v4_indexer_mock import V4IndexerClientMock
+from tests.helper.candle_mockery.v4_indexer_socket_mock import V4IndexerSocketMock
 from tests.helper.candle_mockery.mock_dydx_candle_dicts import (
     mock_dydx_candle_dict_batch,
 )
@@ -110,6 +113,21 @@ async def dydx_v4_candle_fetcher_mainnet() -> AsyncGenerator[DydxCandleFetcher,
     yield DydxCandleFetcher(api_fetcher=DydxV4Fetcher(mainnet_client))
 
 
+@pytest_asyncio.fixture  # type: ignore
+async def v4_indexer_socket_mock() -> AsyncGenerator[V4IndexerSocketMock, None]:
+    socket_mock = V4IndexerSocketMock()
+    yield socket_mock
+    await socket_mock.stop()
+
+
+@pytest_asyncio.fixture  # type: ignore
+async def dydx_v4_candle_feed_mock(
+    v4_indexer_socket_mock: V4IndexerSocketMock,
+) -> AsyncGenerator[DydxV4CandleFeed, None]:
+    url = await v4_indexer_socket_mock.start()
+    yield DydxV4CandleFeed(url, reconnect_delay=timedelta(0))
+
+
 # region - SQLite
 @pytest.fixture
 def sqlite_engine_in_memory() -> Generator[Engine, None, None]:
@@ -132,7 +150,9 @@ def sqlite_session_in_memory(
 def sqlite_candle_storage_memory(
     sqlite_engine_in_memory: Engine,
 ) -> Generator[SqliteCandleStorage, None, None]:
-    yield SqliteCandleStorage(sqlite_engine_in_memory)
+    storage = SqliteCandleStorage(sqlite_engine_in_memory)
+    yield storage
+    storage.close()
 
 
 # endregion
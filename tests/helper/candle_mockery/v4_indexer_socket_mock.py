@@ -0,0 +1,175 @@
+import asyncio
+import base64
+import hashlib
+import json
+import struct
+from datetime import datetime
+from typing import Any, Dict, List
+
+from locast.candle.exchange_resolution import ResolutionDetail
+from tests.helper.candle_mockery.dydx_candle_dicts import copy_dydx_v4_base_candle_dict
+from tests.helper.candle_mockery.mock_dydx_candle_dicts import replace_date
+
+WEBSOCKET_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+OPCODE_TEXT, OPCODE_CLOSE, OPCODE_PING, OPCODE_PONG = 0x1, 0x8, 0x9, 0xA
+
+
+class V4IndexerSocketMock:
+    """
+    A local stand-in for the websocket of the v4 indexer, serving its v4_candles channel on localhost. Candles are
+    pushed to the subscribers of their channel by send_candle, and drop_connections cuts all connections off, like
+    a network failure would.
+    """
+
+    def __init__(self) -> None:
+        self.connections = 0
+        self._subscribers: Dict[str, List[asyncio.StreamWriter]] = {}
+        self._subscribed = asyncio.Condition()
+        self._held_channels: Dict[str, asyncio.Event] = {}
+        self._server: asyncio.Server | None = None
+
+    async def start(self) -> str:
+        self._server = await asyncio.start_server(self._serve, "127.0.0.1", 0)
+        port = self._server.sockets[0].getsockname()[1]
+        return f"ws://127.0.0.1:{port}"
+
+    async def stop(self) -> None:
+        await self.drop_connections()
+        if self._server:
+            self._server.close()
+            await self._server.wait_closed()
+
+    async def subscriptions(self, amount: int) -> List[str]:
+        # Waits until the channels got subscribed amount times in total, over all connections
+        async with self._subscribed:
+            await self._subscribed.wait_for(
+                lambda: sum(map(len, self._subscribers.values())) >= amount
+            )
+            return sorted(self._subscribers)
+
+    def hold_subscription(self, channel: str) -> None:
+        # Subscribing the channel takes until release_subscription, which also holds up the connection's later ones
+        self._held_channels[channel] = asyncio.Event()
+
+    def release_subscription(self, channel: str) -> None:
+        self._held_channels.pop(channel).set()
+
+    async def send_candle(self, candle_dict: Dict[str, Any]) -> None:
+        channel = f"{candle_dict['ticker']}/{candle_dict['resolution']}"
+        message = {
+            "type": "channel_data",
+            "channel": "v4_candles",
+            "id": channel,
+            "contents": candle_dict,
+        }
+        for writer in self._subscribers.get(channel, []):
+            await self._send(writer, OPCODE_TEXT, json.dumps(message).encode())
+
+    async def drop_connections(self) -> None:
+        writers = {w for writers in self._subscribers.values() for w in writers}
+        self._subscribers.clear()
+        for writer in writers:
+            writer.close()
+
+    async def _serve(
+        self,
+        reader: asyncio.StreamReader,
+        writer: asyncio.StreamWriter,
+    ) -> None:
+        request = (await reader.readuntil(b"\r\n\r\n")).decode()
+        headers = dict(
+            line.split(": ", 1) for line in request.split("\r\n")[1:] if ": " in line
+        )
+        key = headers["Sec-WebSocket-Key"] + WEBSOCKET_GUID
+        accept = base64.b64encode(hashlib.sha1(key.encode()).digest()).decode()
+        writer.write(
+            "HTTP/1.1 101 Switching Protocols\r\n"
+            "Upgrade: websocket\r\n"
+            "Connection: Upgrade\r\n"
+            f"Sec-WebSocket-Accept: {accept}\r\n\r\n".encode()
+        )
+        self.connections += 1
+        await self._send(
+            writer, OPCODE_TEXT, json.dumps({"type": "connected"}).encode()
+        )
+
+        try:
+            while True:
+                opcode, payload = await self._receive(reader)
+                if opcode == OPCODE_TEXT:
+                    await self._handle(writer, json.loads(payload))
+                elif opcode == OPCODE_PING:
+                    await self._send(writer, OPCODE_PONG, payload)
+                elif opcode == OPCODE_CLOSE:
+                    await self._send(writer, OPCODE_CLOSE, payload)
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def _handle(
+        self,
+        writer: asyncio.StreamWriter,
+        message: Dict[str, Any],
+    ) -> None:
+        if message["type"] != "subscribe" or message["channel"] != "v4_candles":
+            error = {"type": "error", "message": f"Invalid message: {message}"}
+            await self._send(writer, OPCODE_TEXT, json.dumps(error).encode())
+            return
+
+        if held := self._held_channels.get(message["id"]):
+            await held.wait()
+
+        subscribed = {
+            "type": "subscribed",
+            "channel": "v4_candles",
+            "id": message["id"],
+            "contents": {"candles": []},
+        }
+        await self._send(writer, OPCODE_TEXT, json.dumps(subscribed).encode())
+        async with self._subscribed:
+            self._subscribers.setdefault(message["id"], []).append(writer)
+            self._subscribed.notify_all()
+
+    async def _receive(self, reader: asyncio.StreamReader) -> tuple[int, bytes]:
+        # Frames of clients are always masked
+        first, second = await reader.readexactly(2)
+        length = second & 0x7F
+        if length == 126:
+            (length,) = struct.unpack(">H", await reader.readexactly(2))
+        elif length == 127:
+            (length,) = struct.unpack(">Q", await reader.readexactly(8))
+        mask = await reader.readexactly(4)
+        payload = await reader.readexactly(length)
+        return first & 0x0F, bytes(b ^ mask[i % 4] for i, b in enumerate(payload))
+
+    async def _send(
+        self,
+        writer: asyncio.StreamWriter,
+        opcode: int,
+        payload: bytes,
+    ) -> None:
+        length = len(payload)
+        if length < 126:
+            header = struct.pack(">BB", 0x80 | opcode, length)
+        elif length < 1 << 16:
+            header = struct.pack(">BBH", 0x80 | opcode, 126, length)
+        else:
+            header = struct.pack(">BBQ", 0x80 | opcode, 127, length)
+        writer.write(header + payload)
+        await writer.drain()
+
+
+def mock_v4_candle_dict(
+    market: str,
+    resolution: ResolutionDetail,
+    started_at: datetime,
+    close: str | None = None,
+) -> Dict[str, Any]:
+    candle_dict = replace_date(copy_dydx_v4_base_candle_dict(), started_at)
+    candle_dict["ticker"] = market
+    candle_dict["resolution"] = resolution.notation
+    if close:
+        candle_dict["close"] = close
+    return candle_dict
@@ -1,16 +1,45 @@
-from datetime import timedelta
+import asyncio
+from dataclasses import replace
+from datetime import datetime, timedelta
+from decimal import Decimal
+from typing import Any, AsyncIterator, List, Tuple
 import pytest
 
+from sir_utilities.date_time import string_to_datetime
+
+from locast.candle.candle import Candle
 from locast.candle.candle_utility import CandleUtility as cu
 from locast.candle.exchange import Exchange
 from locast.candle.exchange_resolution import ResolutionDetail, Seconds
+from locast.candle.gap import Gap
+from locast.candle_feed.dydx.dydx_v4_candle_feed import DydxV4CandleFeed
+from locast.candle_fetcher.dydx.api_fetcher.dydx_v4_fetcher import DydxV4Fetcher
+from locast.candle_fetcher.dydx.candle_fetcher.dydx_candle_fetcher import (
+    DydxCandleFetcher,
+)
+from locast.candle_fetcher.exceptions import APIException
+from locast.candle_storage.backfill_checkpoint import BackfillCheckpoint
+from locast.candle_storage.cluster_info import ClusterInfo
+from locast.candle_storage.market_horizon import MarketHorizon
+from locast.candle_storage.on_conflict import OnConflict
 from locast.candle_storage.sql.sqlite_candle_storage import SqliteCandleStorage
 from locast.store_manager.store_manager import (
     ExistingClusterException,
+    MissingCheckpointException,
     MissingClusterException,
     StoreManager,
 )
-from tests.helper.candle_mockery.mock_dydx_v4_candles import mock_dydx_v4_candle_range
+from locast.store_manager.cluster_spec import ClusterSpec
+from locast.store_manager.retention_policy import RetentionPolicy
+from locast.store_manager.rollup_policy import RollupPolicy
+from tests.helper.candle_mockery.mock_dydx_v4_candles import (
+    mock_dydx_v4_candle_range,
+    mock_dydx_v4_candles,
+)
+from tests.helper.candle_mockery.v4_indexer_socket_mock import (
+    V4IndexerSocketMock,
+    mock_v4_candle_dict,
+)
 
 
 @pytest.mark.asyncio
@@ -215,8 +244,201 @@ async def test_update_cluster_results_in_no_error_when_cluster_is_uptodate(
     await manager.update_cluster(exchange, market, resolution)
 
 
+@pytest.mark.parametrize("retained", [True, False])
 @pytest.mark.asyncio
-async def test_delete_cluster_results_in_error(
+async def test_update_cluster_applies_retention_policy(
+    dydx_v4_candle_fetcher_mock: DydxCandleFetcher,
+    sqlite_candle_storage_memory: SqliteCandleStorage,
+    retained: bool,
+) -> None:
+    # given an out of date cluster, older than the retention of its resolution (if any)
+    storage = sqlite_candle_storage_memory
+
+    exchange = Exchange.DYDX_V4
+    market = "ETH-USD"
+    resolution = ResolutionDetail(Seconds.FOUR_HOURS, "4HOURS")
+    max_age = timedelta(seconds=resolution.seconds * 6)
+    policy_resolution = Seconds.FOUR_HOURS if retained else Seconds.ONE_HOUR
+    manager = StoreManager(
+        dydx_v4_candle_fetcher_mock,
+        storage,
+        retention_policy=RetentionPolicy({policy_resolution: max_age}),
+    )
+
+    now = cu.normalized_now(resolution)
+    start_date = cu.subtract_n_resolutions(now, resolution, 10)
+    end_date = cu.subtract_n_resolutions(now, resolution, 5)
+    await storage.store_candles(
+        mock_dydx_v4_candle_range(market, resolution, start_date, end_date)
+    )
+
+    # when
+    await manager.update_cluster(exchange, market, resolution)
+
+    # then
+    info = await storage.get_cluster_info(exchange, market, resolution)
+    assert info.is_uptodate and info.oldest_candle
+    if retained:
+        assert info.oldest_candle.started_at >= now - max_age
+        assert info.size <= 7
+    else:
+        assert info.oldest_candle.started_at == start_date
+
+
+@pytest.mark.parametrize("batched", [True, False])
+@pytest.mark.asyncio
+async def test_update_cluster_refreshes_rollups(
+    dydx_v4_candle_fetcher_mock: DydxCandleFetcher,
+    sqlite_candle_storage_memory: SqliteCandleStorage,
+    batched: bool,
+) -> None:
+    # given an out of date one minute cluster and its rollup, holding an unfinished hour
+    storage = sqlite_candle_storage_memory
+
+    exchange = Exchange.DYDX_V4
+    market = "ETH-USD"
+    resolution = ResolutionDetail(Seconds.ONE_MINUTE, "1MIN")
+    five_mins = ResolutionDetail(Seconds.FIVE_MINUTES, "5MINS")
+    one_hour = ResolutionDetail(Seconds.ONE_HOUR, "1HOUR")
+    manager = StoreManager(
+        dydx_v4_candle_fetcher_mock,
+        storage,
+        rollup_policy=RollupPolicy({Seconds.ONE_MINUTE: [five_mins, one_hour]}),
+    )
+
+    start_date = cu.normalized_now(one_hour) - timedelta(hours=2)
+    stored = mock_dydx_v4_candles(market, resolution, 30, start_date)
+    await storage.store_candles(stored)
+    await storage.store_candles(cu.resample(stored, one_hour))
+
+    # when
+    if batched:
+        await manager.update_clusters([ClusterSpec(market, resolution)])
+    else:
+        await manager.update_cluster(exchange, market, resolution)
+
+    # then the unfinished hour got completed and the missing rollup derived from the whole cluster, both up to
+    # their last closed bucket
+    base = await storage.retrieve_cluster(exchange, market, resolution)
+    hours = await storage.retrieve_cluster(exchange, market, one_hour)
+    fives = await storage.retrieve_cluster(exchange, market, five_mins)
+    assert [_without_id(c) for c in hours] == _closed_buckets(base, one_hour)
+    assert [_without_id(c) for c in fives] == _closed_buckets(base, five_mins)
+
+
+@pytest.mark.asyncio
+async def test_update_cluster_failing_on_rollup_stores_nothing(
+    dydx_v4_candle_fetcher_mock: DydxCandleFetcher,
+    sqlite_candle_storage_memory: SqliteCandleStorage,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    # given an out of date cluster and its rollups, the last of which fails to be stored
+    storage = sqlite_candle_storage_memory
+
+    exchange = Exchange.DYDX_V4
+    market = "ETH-USD"
+    resolution = ResolutionDetail(Seconds.ONE_MINUTE, "1MIN")
+    five_mins = ResolutionDetail(Seconds.FIVE_MINUTES, "5MINS")
+    one_hour = ResolutionDetail(Seconds.ONE_HOUR, "1HOUR")
+    manager = StoreManager(
+        dydx_v4_candle_fetcher_mock,
+        storage,
+        rollup_policy=RollupPolicy({Seconds.ONE_MINUTE: [five_mins, one_hour]}),
+    )
+
+    start_date = cu.normalized_now(one_hour) - timedelta(hours=2)
+    stored = mock_dydx_v4_candles(market, resolution, 30, start_date)
+    await storage.store_candles(stored)
+    await storage.store_candles(cu.resample(stored, five_mins))
+    await storage.store_candles(cu.resample(stored, one_hour))
+    insert_candles = storage._insert_candles
+
+    def failing_insert_candles(candles: List[Candle], *args: Any) -> None:
+        if candles and candles[0].resolution == one_hour:
+            raise ValueError("Storing failed.")
+        insert_candles(candles, *args)
+
+    monkeypatch.setattr(storage, "_insert_candles", failing_insert_candles)
+
+    # when
+    with pytest.raises(ValueError):
+        await manager.update_cluster(exchange, market, resolution)
+
+    # then neither the new candles nor the first rollup got committed
+    info = await storage.get_cluster_info(exchange, market, resolution)
+    fives = await storage.retrieve_cluster(exchange, market, five_mins)
+    assert info.size == 30
+    assert [_without_id(c) for c in fives] == cu.resample(stored, five_mins)
+
+
+@pytest.mark.parametrize("streaming", [False, True])
+@pytest.mark.asyncio
+async def test_create_cluster_derives_rollups(
+    dydx_v4_candle_fetcher_mock: DydxCandleFetcher,
+    sqlite_candle_storage_memory: SqliteCandleStorage,
+    streaming: bool,
+) -> None:
+    # given a rollup policy and a start date within an hour
+    storage = sqlite_candle_storage_memory
+
+    exchange = Exchange.DYDX_V4
+    market = "ETH-USD"
+    resolution = ResolutionDetail(Seconds.ONE_MINUTE, "1MIN")
+    one_hour = ResolutionDetail(Seconds.ONE_HOUR, "1HOUR")
+    manager = StoreManager(
+        dydx_v4_candle_fetcher_mock,
+        storage,
+        rollup_policy=RollupPolicy({Seconds.ONE_MINUTE: [one_hour]}),
+    )
+    start_date = cu.subtract_n_resolutions(
+        cu.normalized_now(resolution), resolution, 2500
+    )
+
+    # when
+    await manager.create_cluster(market, resolution, start_date, streaming=streaming)
+
+    # then the rollup holds every hour closed within the cluster, also of pages stored one by one
+    base = await storage.retrieve_cluster(exchange, market, resolution)
+    hours = await storage.retrieve_cluster(exchange, market, one_hour)
+    assert len(hours) >= 40
+    assert [_without_id(c) for c in hours] == _closed_buckets(base, one_hour)
+
+
+@pytest.mark.asyncio
+async def test_repair_cluster_refreshes_rollups(
+    dydx_v4_candle_fetcher_mock: DydxCandleFetcher,
+    sqlite_candle_storage_memory: SqliteCandleStorage,
+) -> None:
+    # given a cluster lacking a range and its rollup, derived with a partial hour
+    storage = sqlite_candle_storage_memory
+
+    exchange = Exchange.DYDX_V4
+    market = "ETH-USD"
+    resolution = ResolutionDetail(Seconds.ONE_MINUTE, "1MIN")
+    one_hour = ResolutionDetail(Seconds.ONE_HOUR, "1HOUR")
+    manager = StoreManager(
+        dydx_v4_candle_fetcher_mock,
+        storage,
+        rollup_policy=RollupPolicy({Seconds.ONE_MINUTE: [one_hour]}),
+    )
+
+    end_date = cu.normalized_now(one_hour)
+    start_date = end_date - timedelta(hours=5)
+    candles = mock_dydx_v4_candle_range(market, resolution, start_date, end_date)
+    await storage.store_candles(candles[:100] + candles[110:])
+    partial = await manager.derive_cluster(exchange, market, one_hour, resolution)
+
+    # when
+    await manager.repair_cluster(exchange, market, resolution)
+
+    # then the partial hour got recomputed from the refetched candles
+    hours = await storage.retrieve_cluster(exchange, market, one_hour)
+    assert len(partial) == 1
+    assert [_without_id(c) for c in hours] == cu.resample(candles, one_hour)
+
+
+@pytest.mark.asyncio
+async def test_trim_cluster_results_in_error(
     store_manager_mock_memory: StoreManager,
 ) -> None:
     # given storage containing no cluster
@@ -225,14 +447,178 @@ async def test_delete_cluster_results_in_error(
     exchange = Exchange.DYDX_V4
     market = "ETH-USD"
     resolution = ResolutionDetail(Seconds.FOUR_HOURS, "4HOURS")
+    before = cu.normalized_now(resolution)
 
     # when & then
     with pytest.raises(MissingClusterException):
-        await manager.delete_cluster(exchange, market, resolution)
+        await manager.trim_cluster(exchange, market, resolution, before)
 
 
 @pytest.mark.asyncio
-async def test_retrieve_cluster_results_in_error(
+async def test_find_gaps_results_in_missing_ranges(
+    store_manager_mock_memory: StoreManager,
+    sqlite_candle_storage_memory: SqliteCandleStorage,
+) -> None:
+    # given a cluster lacking two ranges of candles
+    manager = store_manager_mock_memory
+    storage = sqlite_candle_storage_memory
+
+    exchange = Exchange.DYDX_V4
+    market = "ETH-USD"
+    resolution = ResolutionDetail(Seconds.ONE_MINUTE, "1MIN")
+
+    end_date = cu.normalized_now(resolution)
+    start_date = cu.subtract_n_resolutions(end_date, resolution, 100)
+    candles = mock_dydx_v4_candle_range(market, resolution, start_date, end_date)
+    await storage.store_candles(candles[:10] + candles[15:50] + candles[51:])
+
+    # when
+    gaps = await manager.find_gaps(exchange, market, resolution)
+
+    # then
+    assert gaps == [
+        Gap(start=candles[14].started_at, count=5),
+        Gap(start=candles[50].started_at, count=1),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_find_gaps_results_in_empty_list(
+    store_manager_mock_memory: StoreManager,
+) -> None:
+    # given a cluster without gaps
+    manager = store_manager_mock_memory
+
+    exchange = Exchange.DYDX_V4
+    market = "ETH-USD"
+    resolution = ResolutionDetail(Seconds.ONE_MINUTE, "1MIN")
+
+    end_date = cu.normalized_now(resolution)
+    start_date = cu.subtract_n_resolutions(end_date, resolution, 100)
+    await manager.create_cluster(market, resolution, start_date)
+
+    # when
+    gaps = await manager.find_gaps(exchange, market, resolution)
+
+    # then
+    assert gaps == []
+
+
+@pytest.mark.asyncio
+async def test_repair_cluster_refetches_coalesced_gaps(
+    store_manager_mock_memory: StoreManager,
+    sqlite_candle_storage_memory: SqliteCandleStorage,
+    dydx_v4_candle_fetcher_mock: DydxCandleFetcher,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    # given a cluster lacking two nearby ranges and a far off one
+    manager = store_manager_mock_memory
+    storage = sqlite_candle_storage_memory
+
+    exchange = Exchange.DYDX_V4
+    market = "ETH-USD"
+    resolution = ResolutionDetail(Seconds.ONE_MINUTE, "1MIN")
+
+    end_date = cu.normalized_now(resolution)
+    start_date = cu.subtract_n_resolutions(end_date, resolution, 3000)
+    candles = mock_dydx_v4_candle_range(market, resolution, start_date, end_date)
+    holes = {*range(10, 15), *range(50, 51), *range(2500, 2510)}
+    await storage.store_candles([c for i, c in enumerate(candles) if i not in holes])
+
+    windows = _record_fetched_windows(dydx_v4_candle_fetcher_mock, monkeypatch)
+
+    # when
+    gaps = await manager.repair_cluster(exchange, market, resolution)
+
+    # then
+    cluster = await storage.retrieve_cluster(exchange, market, resolution)
+    assert gaps == []
+    assert [c.started_at for c in cluster] == [c.started_at for c in candles]
+    assert windows == [
+        (candles[50].started_at, candles[9].started_at),
+        (candles[2509].started_at, candles[2499].started_at),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_repair_cluster_records_unfillable_gaps(
+    store_manager_mock_memory: StoreManager,
+    sqlite_candle_storage_memory: SqliteCandleStorage,
+    dydx_v4_candle_fetcher_mock: DydxCandleFetcher,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    # given a cluster lacking candles, of which the exchange lost one for good
+    manager = store_manager_mock_memory
+    storage = sqlite_candle_storage_memory
+
+    exchange = Exchange.DYDX_V4
+    market = "ETH-USD"
+    resolution = ResolutionDetail(Seconds.ONE_MINUTE, "1MIN")
+
+    end_date = cu.normalized_now(resolution)
+    start_date = cu.subtract_n_resolutions(end_date, resolution, 100)
+    candles = mock_dydx_v4_candle_range(market, resolution, start_date, end_date)
+    await storage.store_candles(candles[:20] + candles[23:])
+
+    lost = candles[21].started_at
+    windows = _record_fetched_windows(dydx_v4_candle_fetcher_mock, monkeypatch, lost)
+
+    # when
+    gaps = await manager.repair_cluster(exchange, market, resolution)
+    regaps = await manager.repair_cluster(exchange, market, resolution)
+
+    # then the lost candle was confirmed missing by its own request, and not fetched again
+    assert gaps == regaps == [Gap(start=lost, count=1)]
+    assert await storage.retrieve_unfillable_gaps(exchange, market, resolution) == gaps
+    assert windows == [
+        (candles[22].started_at, candles[19].started_at),
+        (lost, candles[20].started_at),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_repair_cluster_does_not_record_gaps_a_cut_short_window_missed(
+    store_manager_mock_memory: StoreManager,
+    sqlite_candle_storage_memory: SqliteCandleStorage,
+    dydx_v4_candle_fetcher_mock: DydxCandleFetcher,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    # given a cluster lacking candles, whose window comes back without the older ones
+    manager = store_manager_mock_memory
+    storage = sqlite_candle_storage_memory
+
+    exchange = Exchange.DYDX_V4
+    market = "ETH-USD"
+    resolution = ResolutionDetail(Seconds.ONE_MINUTE, "1MIN")
+
+    end_date = cu.normalized_now(resolution)
+    start_date = cu.subtract_n_resolutions(end_date, resolution, 100)
+    candles = mock_dydx_v4_candle_range(market, resolution, start_date, end_date)
+    await storage.store_candles(candles[:20] + candles[22:40] + candles[45:])
+
+    fetch_candles = dydx_v4_candle_fetcher_mock.fetch_candles
+    cut_short = candles[21].started_at
+
+    async def cut_short_fetch_candles(*args: Any) -> List[Candle]:
+        monkeypatch.setattr(dydx_v4_candle_fetcher_mock, "fetch_candles", fetch_candles)
+        return [c for c in await fetch_candles(*args) if c.started_at >= cut_short]
+
+    monkeypatch.setattr(
+        dydx_v4_candle_fetcher_mock, "fetch_candles", cut_short_fetch_candles
+    )
+
+    # when
+    gaps = await manager.repair_cluster(exchange, market, resolution)
+
+    # then the gap the window missed was filled by its own request
+    cluster = await storage.retrieve_cluster(exchange, market, resolution)
+    assert gaps == []
+    assert await storage.retrieve_unfillable_gaps(exchange, market, resolution) == []
+    assert [c.started_at for c in cluster] == [c.started_at for c in candles]
+
+
+@pytest.mark.asyncio
+async def test_repair_cluster_results_in_error(
     store_manager_mock_memory: StoreManager,
 ) -> None:
     # given storage containing no cluster
@@ -244,58 +630,1058 @@ async def test_retrieve_cluster_results_in_error(
 
     # when & then
     with pytest.raises(MissingClusterException):
-        await manager.retrieve_cluster(exchange, market, resolution)
+        await manager.repair_cluster(exchange, market, resolution)
 
 
 @pytest.mark.asyncio
-async def test_retrieve_cluster_results_in_correct_cluster(
+async def test_derive_cluster_results_in_resampled_base_cluster(
     store_manager_mock_memory: StoreManager,
     sqlite_candle_storage_memory: SqliteCandleStorage,
 ) -> None:
-    # given
+    # given a one minute cluster, neither starting nor ending on an hour
     manager = store_manager_mock_memory
     storage = sqlite_candle_storage_memory
 
     exchange = Exchange.DYDX_V4
     market = "ETH-USD"
-    resolution = ResolutionDetail(Seconds.FOUR_HOURS, "4HOURS")
+    base_resolution = ResolutionDetail(Seconds.ONE_MINUTE, "1MIN")
+    resolution = ResolutionDetail(Seconds.ONE_HOUR, "1HOUR")
 
-    end_date = cu.normalized_now(resolution)
-    start_date = cu.subtract_n_resolutions(end_date, resolution, 10)
-    await manager.create_cluster(market, resolution, start_date)
+    start_date = string_to_datetime("2024-01-01T00:30:00.000Z")
+    base = mock_dydx_v4_candles(market, base_resolution, 60 * 10, start_date)
+    await storage.store_candles(base)
 
     # when
-    cluster = await manager.retrieve_cluster(exchange, market, resolution)
+    await manager.derive_cluster(exchange, market, resolution, base_resolution)
 
-    # then
-    info = await storage.get_cluster_info(exchange, market, resolution)
-    cluster_dates = [candle.started_at for candle in cluster]
+    # then hours 01:00 up to 09:00, of which the one starting 10:00 is unfinished
+    cluster = await storage.retrieve_cluster(exchange, market, resolution)
+    complete = [c for c in base if c.started_at.hour not in (0, 10)]
+    assert [_without_id(c) for c in cluster] == cu.resample(complete, resolution)
+    assert cluster[-1].started_at == string_to_datetime("2024-01-01T01:00:00.000Z")
+    assert cluster[0].started_at == string_to_datetime("2024-01-01T09:00:00.000Z")
 
-    assert cluster[0] == info.newest_candle
-    assert cluster[-1] == info.oldest_candle
-    cu.assert_candle_unity(cluster)
-    assert len(cu.detect_missing_dates(cluster_dates, resolution)) == 0
+
+@pytest.mark.asyncio
+async def test_derive_cluster_extends_derived_cluster(
+    store_manager_mock_memory: StoreManager,
+    sqlite_candle_storage_memory: SqliteCandleStorage,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    # given a derived cluster, whose base cluster grew afterwards
+    manager = store_manager_mock_memory
+    storage = sqlite_candle_storage_memory
+
+    exchange = Exchange.DYDX_V4
+    market = "ETH-USD"
+    base_resolution = ResolutionDetail(Seconds.ONE_MINUTE, "1MIN")
+    resolution = ResolutionDetail(Seconds.FIVE_MINUTES, "5MINS")
+
+    start_date = string_to_datetime("2024-01-01T00:00:00.000Z")
+    base = mock_dydx_v4_candles(market, base_resolution, 100, start_date)
+    await storage.store_candles(base[50:])
+    await manager.derive_cluster(exchange, market, resolution, base_resolution)
+
+    # when
+    await storage.store_candles(base[:50])
+    segments = _record_segments(storage, monkeypatch)
+    await manager.derive_cluster(exchange, market, resolution, base_resolution)
+
+    # then only the new candles were aggregated
+    cluster = await storage.retrieve_cluster(exchange, market, resolution)
+    assert [_without_id(c) for c in cluster] == cu.resample(base, resolution)
+    assert segments == [
+        (
+            string_to_datetime("2024-01-01T00:50:00.000Z"),
+            start_date + timedelta(minutes=100),
+        )
+    ]
 
 
 @pytest.mark.asyncio
-async def test_get_cluster_info_returns_correctly(
+async def test_derive_cluster_reports_partial_buckets(
     store_manager_mock_memory: StoreManager,
+    sqlite_candle_storage_memory: SqliteCandleStorage,
 ) -> None:
-    # given
+    # given a one minute cluster, lacking candles within two of its hours
     manager = store_manager_mock_memory
+    storage = sqlite_candle_storage_memory
 
     exchange = Exchange.DYDX_V4
     market = "ETH-USD"
-    resolution = ResolutionDetail(Seconds.FOUR_HOURS, "4HOURS")
+    base_resolution = ResolutionDetail(Seconds.ONE_MINUTE, "1MIN")
+    resolution = ResolutionDetail(Seconds.ONE_HOUR, "1HOUR")
 
-    end_date = cu.normalized_now(resolution)
-    start_date = cu.subtract_n_resolutions(end_date, resolution, 10)
-    await manager.create_cluster(market, resolution, start_date)
+    start_date = string_to_datetime("2024-01-01T00:00:00.000Z")
+    base = mock_dydx_v4_candles(market, base_resolution, 60 * 5, start_date)
+    lacking = [c for c in base if not (110 <= _minutes_after(c, start_date) < 130)]
+    await storage.store_candles(lacking)
 
     # when
-    info = await manager.get_cluster_info(exchange, market, resolution)
+    partial = await manager.derive_cluster(
+        exchange, market, resolution, base_resolution
+    )
 
     # then
-    expected_cluster = await manager.retrieve_cluster(exchange, market, resolution)
-    assert info.newest_candle == expected_cluster[0]
-    assert info.oldest_candle == expected_cluster[-1]
+    cluster = await storage.retrieve_cluster(exchange, market, resolution)
+    assert [_without_id(c) for c in cluster] == cu.resample(lacking, resolution)
+    assert partial == [
+        string_to_datetime("2024-01-01T02:00:00.000Z"),
+        string_to_datetime("2024-01-01T01:00:00.000Z"),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_derive_cluster_results_in_error(
+    store_manager_mock_memory: StoreManager,
+) -> None:
+    # given storage containing no base cluster
+    manager = store_manager_mock_memory
+
+    exchange = Exchange.DYDX_V4
+    market = "ETH-USD"
+    base_resolution = ResolutionDetail(Seconds.ONE_MINUTE, "1MIN")
+    resolution = ResolutionDetail(Seconds.ONE_HOUR, "1HOUR")
+
+    # when & then
+    with pytest.raises(MissingClusterException):
+        await manager.derive_cluster(exchange, market, resolution, base_resolution)
+
+
+@pytest.mark.asyncio
+async def test_find_gaps_results_in_error(
+    store_manager_mock_memory: StoreManager,
+) -> None:
+    # given storage containing no cluster
+    manager = store_manager_mock_memory
+
+    exchange = Exchange.DYDX_V4
+    market = "ETH-USD"
+    resolution = ResolutionDetail(Seconds.FOUR_HOURS, "4HOURS")
+
+    # when & then
+    with pytest.raises(MissingClusterException):
+        await manager.find_gaps(exchange, market, resolution)
+
+
+@pytest.mark.asyncio
+async def test_delete_cluster_results_in_error(
+    store_manager_mock_memory: StoreManager,
+) -> None:
+    # given storage containing no cluster
+    manager = store_manager_mock_memory
+
+    exchange = Exchange.DYDX_V4
+    market = "ETH-USD"
+    resolution = ResolutionDetail(Seconds.FOUR_HOURS, "4HOURS")
+
+    # when & then
+    with pytest.raises(MissingClusterException):
+        await manager.delete_cluster(exchange, market, resolution)
+
+
+@pytest.mark.asyncio
+async def test_retrieve_cluster_results_in_error(
+    store_manager_mock_memory: StoreManager,
+) -> None:
+    # given storage containing no cluster
+    manager = store_manager_mock_memory
+
+    exchange = Exchange.DYDX_V4
+    market = "ETH-USD"
+    resolution = ResolutionDetail(Seconds.FOUR_HOURS, "4HOURS")
+
+    # when & then
+    with pytest.raises(MissingClusterException):
+        await manager.retrieve_cluster(exchange, market, resolution)
+
+
+@pytest.mark.asyncio
+async def test_retrieve_cluster_results_in_correct_cluster(
+    store_manager_mock_memory: StoreManager,
+    sqlite_candle_storage_memory: SqliteCandleStorage,
+) -> None:
+    # given
+    manager = store_manager_mock_memory
+    storage = sqlite_candle_storage_memory
+
+    exchange = Exchange.DYDX_V4
+    market = "ETH-USD"
+    resolution = ResolutionDetail(Seconds.FOUR_HOURS, "4HOURS")
+
+    end_date = cu.normalized_now(resolution)
+    start_date = cu.subtract_n_resolutions(end_date, resolution, 10)
+    await manager.create_cluster(market, resolution, start_date)
+
+    # when
+    cluster = await manager.retrieve_cluster(exchange, market, resolution)
+
+    # then
+    info = await storage.get_cluster_info(exchange, market, resolution)
+    cluster_dates = [candle.started_at for candle in cluster]
+
+    assert cluster[0] == info.newest_candle
+    assert cluster[-1] == info.oldest_candle
+    cu.assert_candle_unity(cluster)
+    assert len(cu.detect_missing_dates(cluster_dates, resolution)) == 0
+
+
+@pytest.mark.asyncio
+async def test_retrieve_segment_results_in_correct_segment(
+    store_manager_mock_memory: StoreManager,
+) -> None:
+    # given
+    manager = store_manager_mock_memory
+
+    exchange = Exchange.DYDX_V4
+    market = "ETH-USD"
+    resolution = ResolutionDetail(Seconds.FOUR_HOURS, "4HOURS")
+
+    end_date = cu.normalized_now(resolution)
+    start_date = cu.subtract_n_resolutions(end_date, resolution, 10)
+    await manager.create_cluster(market, resolution, start_date)
+
+    segment_start = cu.subtract_n_resolutions(end_date, resolution, 7)
+    segment_end = cu.subtract_n_resolutions(end_date, resolution, 2)
+
+    # when
+    segment = await manager.retrieve_segment(
+        exchange,
+        market,
+        resolution,
+        segment_start,
+        segment_end,
+    )
+
+    # then
+    cluster = await manager.retrieve_cluster(exchange, market, resolution)
+    assert segment == cluster[2:7]
+
+
+@pytest.mark.asyncio
+async def test_retrieve_segment_results_in_error(
+    store_manager_mock_memory: StoreManager,
+) -> None:
+    # given storage containing no cluster
+    manager = store_manager_mock_memory
+
+    exchange = Exchange.DYDX_V4
+    market = "ETH-USD"
+    resolution = ResolutionDetail(Seconds.FOUR_HOURS, "4HOURS")
+
+    end_date = cu.normalized_now(resolution)
+    start_date = cu.subtract_n_resolutions(end_date, resolution, 10)
+
+    # when & then
+    with pytest.raises(MissingClusterException):
+        await manager.retrieve_segment(
+            exchange,
+            market,
+            resolution,
+            start_date,
+            end_date,
+        )
+
+
+@pytest.mark.asyncio
+async def test_get_cluster_info_returns_correctly(
+    store_manager_mock_memory: StoreManager,
+) -> None:
+    # given
+    manager = store_manager_mock_memory
+
+    exchange = Exchange.DYDX_V4
+    market = "ETH-USD"
+    resolution = ResolutionDetail(Seconds.FOUR_HOURS, "4HOURS")
+
+    end_date = cu.normalized_now(resolution)
+    start_date = cu.subtract_n_resolutions(end_date, resolution, 10)
+    await manager.create_cluster(market, resolution, start_date)
+
+    # when
+    info = await manager.get_cluster_info(exchange, market, resolution)
+
+    # then
+    expected_cluster = await manager.retrieve_cluster(exchange, market, resolution)
+    assert info.newest_candle == expected_cluster[0]
+    assert info.oldest_candle == expected_cluster[-1]
+
+
+@pytest.mark.asyncio
+async def test_retrieve_cluster_frame_results_in_error(
+    store_manager_mock_memory: StoreManager,
+) -> None:
+    # given
+    manager = store_manager_mock_memory
+
+    exchange = Exchange.DYDX_V4
+    market = "ETH-USD"
+    resolution = ResolutionDetail(Seconds.FOUR_HOURS, "4HOURS")
+
+    # when & then
+    with pytest.raises(MissingClusterException):
+        await manager.retrieve_cluster_frame(exchange, market, resolution)
+
+
+@pytest.mark.asyncio
+async def test_create_cluster_streaming_results_in_correct_cluster_state(
+    store_manager_mock_memory: StoreManager,
+    sqlite_candle_storage_memory: SqliteCandleStorage,
+) -> None:
+    # given
+    manager = store_manager_mock_memory
+    storage = sqlite_candle_storage_memory
+
+    exchange = Exchange.DYDX_V4
+    market = "ETH-USD"
+    resolution = ResolutionDetail(Seconds.ONE_MINUTE, "1MIN")
+
+    end_date = cu.normalized_now(resolution)
+    start_date = cu.subtract_n_resolutions(end_date, resolution, 2500)
+
+    # when
+    await manager.create_cluster(market, resolution, start_date, streaming=True)
+
+    # then
+    info = await storage.get_cluster_info(exchange, market, resolution)
+    cluster = await storage.retrieve_cluster(exchange, market, resolution)
+    cluster_dates = [candle.started_at for candle in cluster]
+
+    assert info.newest_candle and info.oldest_candle
+    assert info.is_uptodate
+    assert info.size == _amount_up_to_head(info, start_date, resolution)
+    assert info.oldest_candle.started_at == start_date
+    assert len(cu.detect_missing_dates(cluster_dates, resolution)) == 0
+
+
+@pytest.mark.asyncio
+async def test_create_cluster_streaming_keeps_stored_pages_on_error(
+    store_manager_mock_memory: StoreManager,
+    sqlite_candle_storage_memory: SqliteCandleStorage,
+    dydx_v4_fetcher_mock: DydxV4Fetcher,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    # given an api fetcher that fails after delivering the first page
+    manager = store_manager_mock_memory
+    storage = sqlite_candle_storage_memory
+
+    exchange = Exchange.DYDX_V4
+    market = "ETH-USD"
+    resolution = ResolutionDetail(Seconds.ONE_MINUTE, "1MIN")
+
+    end_date = cu.normalized_now(resolution)
+    start_date = cu.subtract_n_resolutions(end_date, resolution, 2500)
+
+    # Warm up the horizon cache, so the failing fetcher only affects the backfill
+    await manager.create_cluster(market, resolution, start_date)
+    await manager.delete_cluster(exchange, market, resolution)
+
+    _fail_after_first_page(dydx_v4_fetcher_mock, monkeypatch)
+
+    # when
+    with pytest.raises(APIException):
+        await manager.create_cluster(market, resolution, start_date, streaming=True)
+
+    # then
+    info = await storage.get_cluster_info(exchange, market, resolution)
+    checkpoint = await storage.retrieve_checkpoint(exchange, market, resolution)
+    assert info.size == 1000
+    assert info.oldest_candle
+    assert checkpoint
+    assert checkpoint.start_date == start_date
+    assert checkpoint.oldest_started_at == info.oldest_candle.started_at
+
+
+@pytest.mark.parametrize("resume_by_create", [False, True])
+@pytest.mark.asyncio
+async def test_resume_cluster_results_in_complete_cluster(
+    store_manager_mock_memory: StoreManager,
+    sqlite_candle_storage_memory: SqliteCandleStorage,
+    dydx_v4_fetcher_mock: DydxV4Fetcher,
+    resume_by_create: bool,
+) -> None:
+    # given an interrupted streaming backfill
+    manager = store_manager_mock_memory
+    storage = sqlite_candle_storage_memory
+
+    exchange = Exchange.DYDX_V4
+    market = "ETH-USD"
+    resolution = ResolutionDetail(Seconds.ONE_MINUTE, "1MIN")
+
+    end_date = cu.normalized_now(resolution)
+    start_date = cu.subtract_n_resolutions(end_date, resolution, 2500)
+
+    # Warm up the horizon cache, so the failing fetcher only affects the backfill
+    await manager.create_cluster(market, resolution, start_date)
+    await manager.delete_cluster(exchange, market, resolution)
+
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        _fail_after_first_page(dydx_v4_fetcher_mock, monkeypatch)
+        with pytest.raises(APIException):
+            await manager.create_cluster(market, resolution, start_date, streaming=True)
+
+    # when
+    if resume_by_create:
+        await manager.create_cluster(market, resolution, start_date, streaming=True)
+    else:
+        await manager.resume_cluster(market, resolution)
+
+    # then
+    info = await storage.get_cluster_info(exchange, market, resolution)
+    cluster = await storage.retrieve_cluster(exchange, market, resolution)
+    cluster_dates = [candle.started_at for candle in cluster]
+
+    assert info.oldest_candle
+    assert info.oldest_candle.started_at == start_date
+    assert info.is_uptodate
+    assert info.size == _amount_up_to_head(info, start_date, resolution)
+    assert len(cu.detect_missing_dates(cluster_dates, resolution)) == 0
+    assert not await storage.retrieve_checkpoint(exchange, market, resolution)
+
+
+@pytest.mark.asyncio
+async def test_resume_cluster_fills_hole_between_interrupted_passes(
+    store_manager_mock_memory: StoreManager,
+    sqlite_candle_storage_memory: SqliteCandleStorage,
+) -> None:
+    # given the pages of two interrupted streaming passes, with a hole in between them
+    manager = store_manager_mock_memory
+    storage = sqlite_candle_storage_memory
+
+    exchange = Exchange.DYDX_V4
+    market = "ETH-USD"
+    resolution = ResolutionDetail(Seconds.ONE_MINUTE, "1MIN")
+
+    end_date = cu.normalized_now(resolution)
+    start_date = cu.subtract_n_resolutions(end_date, resolution, 2500)
+    candles = mock_dydx_v4_candle_range(market, resolution, start_date, end_date)
+    await storage.store_candles(candles[:1000] + candles[1500:])
+    await storage.store_checkpoint(
+        exchange,
+        market,
+        resolution,
+        BackfillCheckpoint(
+            start_date=start_date,
+            oldest_started_at=candles[-1].started_at,
+            updated_at=end_date,
+        ),
+    )
+
+    # when
+    await manager.resume_cluster(market, resolution)
+
+    # then
+    cluster = await storage.retrieve_cluster(exchange, market, resolution)
+    cluster_dates = [candle.started_at for candle in cluster]
+    assert cluster_dates[-1] == start_date
+    assert len(cu.detect_missing_dates(cluster_dates, resolution)) == 0
+    assert not await storage.retrieve_checkpoint(exchange, market, resolution)
+
+
+@pytest.mark.asyncio
+async def test_resume_cluster_continues_from_checkpoint(
+    store_manager_mock_memory: StoreManager,
+    sqlite_candle_storage_memory: SqliteCandleStorage,
+    dydx_v4_candle_fetcher_mock: DydxCandleFetcher,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    # given the first page of an interrupted backfill and older candles stored otherwise
+    manager = store_manager_mock_memory
+    storage = sqlite_candle_storage_memory
+
+    exchange = Exchange.DYDX_V4
+    market = "ETH-USD"
+    resolution = ResolutionDetail(Seconds.ONE_MINUTE, "1MIN")
+
+    end_date = cu.normalized_now(resolution)
+    start_date = cu.subtract_n_resolutions(end_date, resolution, 2500)
+    candles = mock_dydx_v4_candle_range(market, resolution, start_date, end_date)
+    await storage.store_candles(candles[:1000] + candles[2400:])
+    await storage.store_checkpoint(
+        exchange,
+        market,
+        resolution,
+        BackfillCheckpoint(
+            start_date=start_date,
+            oldest_started_at=candles[999].started_at,
+            updated_at=end_date,
+        ),
+    )
+    ranges = _record_streamed_ranges(dydx_v4_candle_fetcher_mock, monkeypatch)
+
+    # when
+    await manager.resume_cluster(market, resolution)
+
+    # then
+    cluster = await storage.retrieve_cluster(exchange, market, resolution)
+    cluster_dates = [candle.started_at for candle in cluster]
+    assert ranges[0] == (start_date, candles[999].started_at)
+    assert cluster_dates[-1] == start_date
+    assert len(cu.detect_missing_dates(cluster_dates, resolution)) == 0
+
+
+@pytest.mark.asyncio
+async def test_create_cluster_reuses_persisted_horizon(
+    store_manager_mock_memory: StoreManager,
+    sqlite_candle_storage_memory: SqliteCandleStorage,
+    dydx_v4_candle_fetcher_mock: DydxCandleFetcher,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    # given a horizon found by a previous manager
+    storage = sqlite_candle_storage_memory
+
+    exchange = Exchange.DYDX_V4
+    market = "ETH-USD"
+    resolution = ResolutionDetail(Seconds.FOUR_HOURS, "4HOURS")
+
+    end_date = cu.normalized_now(resolution)
+    start_date = cu.subtract_n_resolutions(end_date, resolution, 10)
+
+    await store_manager_mock_memory.create_cluster(market, resolution, start_date)
+    await store_manager_mock_memory.delete_cluster(exchange, market, resolution)
+
+    horizon = await storage.retrieve_horizon(exchange, market, resolution)
+    searches = _record_horizon_searches(dydx_v4_candle_fetcher_mock, monkeypatch)
+
+    # when a new manager creates the cluster
+    manager = StoreManager(dydx_v4_candle_fetcher_mock, storage)
+    await manager.create_cluster(market, resolution, start_date)
+
+    # then
+    info = await storage.get_cluster_info(exchange, market, resolution)
+    assert horizon
+    assert info.size == 10
+    assert len(searches) == 0
+
+
+@pytest.mark.parametrize("expired", [False, True])
+@pytest.mark.asyncio
+async def test_create_cluster_searches_expired_horizon_again(
+    sqlite_candle_storage_memory: SqliteCandleStorage,
+    dydx_v4_candle_fetcher_mock: DydxCandleFetcher,
+    monkeypatch: pytest.MonkeyPatch,
+    expired: bool,
+) -> None:
+    # given a persisted horizon found some days ago
+    storage = sqlite_candle_storage_memory
+    manager = StoreManager(
+        dydx_v4_candle_fetcher_mock,
+        storage,
+        horizon_ttl=timedelta(days=1 if expired else 7),
+    )
+
+    exchange = Exchange.DYDX_V4
+    market = "ETH-USD"
+    resolution = ResolutionDetail(Seconds.FOUR_HOURS, "4HOURS")
+
+    end_date = cu.normalized_now(resolution)
+    start_date = cu.subtract_n_resolutions(end_date, resolution, 10)
+
+    stale_horizon = MarketHorizon(
+        horizon=cu.subtract_n_resolutions(end_date, resolution, 20),
+        found_at=end_date - timedelta(days=3),
+    )
+    await storage.store_horizon(exchange, market, resolution, stale_horizon)
+    searches = _record_horizon_searches(dydx_v4_candle_fetcher_mock, monkeypatch)
+
+    # when
+    await manager.create_cluster(market, resolution, start_date)
+
+    # then
+    horizon = await storage.retrieve_horizon(exchange, market, resolution)
+    assert len(searches) == int(expired)
+    assert (horizon != stale_horizon) == expired
+
+
+@pytest.mark.asyncio
+async def test_create_cluster_derives_horizon_from_other_resolution(
+    store_manager_mock_memory: StoreManager,
+    sqlite_candle_storage_memory: SqliteCandleStorage,
+    dydx_v4_candle_fetcher_mock: DydxCandleFetcher,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    # given a horizon known for another resolution of the same market
+    manager = store_manager_mock_memory
+    storage = sqlite_candle_storage_memory
+
+    exchange = Exchange.DYDX_V4
+    market = "ETH-USD"
+    known_resolution = ResolutionDetail(Seconds.FOUR_HOURS, "4HOURS")
+    resolution = ResolutionDetail(Seconds.ONE_MINUTE, "1MIN")
+
+    end_date = cu.normalized_now(known_resolution)
+    start_date = cu.subtract_n_resolutions(end_date, known_resolution, 10)
+    await manager.create_cluster(market, known_resolution, start_date)
+    known_horizon = await storage.retrieve_horizon(exchange, market, known_resolution)
+
+    searches = _record_horizon_searches(dydx_v4_candle_fetcher_mock, monkeypatch)
+
+    # when
+    await manager.create_cluster(market, resolution, start_date)
+
+    # then
+    horizon = await storage.retrieve_horizon(exchange, market, resolution)
+    assert known_horizon and horizon
+    assert searches == [known_horizon.horizon]
+    assert horizon.horizon == known_horizon.horizon
+
+
+@pytest.mark.asyncio
+async def test_resume_cluster_results_in_error(
+    store_manager_mock_memory: StoreManager,
+) -> None:
+    # given storage containing no checkpoint
+    manager = store_manager_mock_memory
+
+    market = "ETH-USD"
+    resolution = ResolutionDetail(Seconds.FOUR_HOURS, "4HOURS")
+
+    # when & then
+    with pytest.raises(MissingCheckpointException):
+        await manager.resume_cluster(market, resolution)
+
+
+def _fail_after_first_page(
+    api_fetcher: DydxV4Fetcher,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    fetch = api_fetcher.fetch
+    calls = 0
+
+    async def failing_fetch(*args: Any, **kwargs: Any) -> List[Candle]:
+        nonlocal calls
+        calls += 1
+        if calls > 1:
+            raise ConnectionError("Connection lost.")
+        return await fetch(*args, **kwargs)
+
+    monkeypatch.setattr(api_fetcher, "fetch", failing_fetch)
+
+
+@pytest.mark.asyncio
+async def test_create_clusters_results_in_correct_cluster_states(
+    store_manager_mock_memory: StoreManager,
+    sqlite_candle_storage_memory: SqliteCandleStorage,
+) -> None:
+    # given
+    manager = store_manager_mock_memory
+    storage = sqlite_candle_storage_memory
+
+    exchange = Exchange.DYDX_V4
+    markets = ["ETH-USD", "BTC-USD", "SOL-USD"]
+    resolutions = [
+        ResolutionDetail(Seconds.ONE_HOUR, "1HOUR"),
+        ResolutionDetail(Seconds.FOUR_HOURS, "4HOURS"),
+    ]
+    specs = [
+        ClusterSpec(
+            market,
+            res,
+            cu.subtract_n_resolutions(cu.normalized_now(res), res, 10),
+        )
+        for market in markets
+        for res in resolutions
+    ]
+
+    # when
+    results = await manager.create_clusters(specs, concurrency=4)
+
+    # then
+    assert all(result.succeeded for result in results)
+    for spec in specs:
+        info = await storage.get_cluster_info(exchange, spec.market, spec.resolution)
+        assert info.oldest_candle
+        assert info.is_uptodate
+        assert info.size == 10
+        assert info.oldest_candle.started_at == spec.start_date
+
+
+@pytest.mark.asyncio
+async def test_create_clusters_fetches_markets_concurrently(
+    store_manager_mock_memory: StoreManager,
+    dydx_v4_fetcher_mock: DydxV4Fetcher,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    # given a candle fetcher with default settings
+    manager = store_manager_mock_memory
+    resolution = ResolutionDetail(Seconds.ONE_HOUR, "1HOUR")
+    start_date = cu.subtract_n_resolutions(
+        cu.normalized_now(resolution), resolution, 10
+    )
+    specs = [
+        ClusterSpec(market, resolution, start_date)
+        for market in ["ETH-USD", "BTC-USD", "SOL-USD", "LINK-USD"]
+    ]
+    in_flight = _track_in_flight(dydx_v4_fetcher_mock, monkeypatch)
+
+    # when
+    results = await manager.create_clusters(specs, concurrency=4)
+
+    # then requests of all markets were in flight at once
+    assert all(result.succeeded for result in results)
+    assert max(in_flight) == 4
+
+
+@pytest.mark.asyncio
+async def test_update_clusters_results_in_uptodate_clusters(
+    store_manager_mock_memory: StoreManager,
+    sqlite_candle_storage_memory: SqliteCandleStorage,
+) -> None:
+    # given storage containing out of date clusters
+    manager = store_manager_mock_memory
+    storage = sqlite_candle_storage_memory
+
+    exchange = Exchange.DYDX_V4
+    markets = ["ETH-USD", "BTC-USD", "SOL-USD"]
+    resolution = ResolutionDetail(Seconds.FOUR_HOURS, "4HOURS")
+    res_sec = resolution.seconds
+
+    start_date = cu.normalized_now(resolution) - timedelta(seconds=res_sec * 10)
+    end_date = cu.normalized_now(resolution) - timedelta(seconds=res_sec * 5)
+    for market in markets:
+        old_cluster = mock_dydx_v4_candle_range(
+            market, resolution, start_date, end_date
+        )
+        await storage.store_candles(old_cluster)
+
+    specs = [ClusterSpec(market, resolution) for market in markets]
+
+    # when
+    results = await manager.update_clusters(specs, concurrency=2)
+
+    # then
+    assert all(result.succeeded for result in results)
+    for market in markets:
+        info = await storage.get_cluster_info(exchange, market, resolution)
+        cluster = await storage.retrieve_cluster(exchange, market, resolution)
+        cluster_dates = [candle.started_at for candle in cluster]
+
+        assert info.is_uptodate
+        assert info.size == 10
+        assert len(cu.detect_missing_dates(cluster_dates, resolution)) == 0
+
+
+@pytest.mark.asyncio
+async def test_update_clusters_reports_failing_cluster(
+    store_manager_mock_memory: StoreManager,
+    sqlite_candle_storage_memory: SqliteCandleStorage,
+) -> None:
+    # given storage containing one out of date cluster and one missing cluster
+    manager = store_manager_mock_memory
+    storage = sqlite_candle_storage_memory
+
+    exchange = Exchange.DYDX_V4
+    resolution = ResolutionDetail(Seconds.FOUR_HOURS, "4HOURS")
+    res_sec = resolution.seconds
+
+    start_date = cu.normalized_now(resolution) - timedelta(seconds=res_sec * 10)
+    end_date = cu.normalized_now(resolution) - timedelta(seconds=res_sec * 5)
+    old_cluster = mock_dydx_v4_candle_range("ETH-USD", resolution, start_date, end_date)
+    await storage.store_candles(old_cluster)
+
+    specs = [ClusterSpec("ETH-USD", resolution), ClusterSpec("BTC-USD", resolution)]
+
+    # when
+    results = await manager.update_clusters(specs)
+
+    # then
+    info = await storage.get_cluster_info(exchange, "ETH-USD", resolution)
+    assert results[0].succeeded
+    assert isinstance(results[1].exception, MissingClusterException)
+    assert info.is_uptodate
+
+
+@pytest.mark.asyncio
+async def test_stream_clusters_fills_gaps_and_stores_closed_candles(
+    store_manager_mock_memory: StoreManager,
+    sqlite_candle_storage_memory: SqliteCandleStorage,
+    dydx_v4_candle_feed_mock: DydxV4CandleFeed,
+    v4_indexer_socket_mock: V4IndexerSocketMock,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    # given an out of date cluster
+    manager = store_manager_mock_memory
+    storage = sqlite_candle_storage_memory
+
+    exchange = Exchange.DYDX_V4
+    market = "ETH-USD"
+    resolution = ResolutionDetail(Seconds.ONE_MINUTE, "1MIN")
+
+    now = cu.normalized_now(resolution)
+    start_date = cu.subtract_n_resolutions(now, resolution, 30)
+    await storage.store_candles(
+        mock_dydx_v4_candles(market, resolution, 20, start_date)
+    )
+    stored = _record_stored_candles(storage, monkeypatch)
+
+    # when the feed connects and the current candle closes
+    streaming = asyncio.create_task(
+        manager.stream_clusters(
+            [ClusterSpec(market, resolution)],
+            dydx_v4_candle_feed_mock,
+        )
+    )
+    await v4_indexer_socket_mock.subscriptions(1)
+    for started_at, close in [
+        (now, "1.5"),
+        (cu.add_one_resolution(now, resolution), "1.7"),
+    ]:
+        candle_dict = mock_v4_candle_dict(market, resolution, started_at, close)
+        await v4_indexer_socket_mock.send_candle(candle_dict)
+    closed = await asyncio.wait_for(stored.get(), 5)
+    streaming.cancel()
+    await asyncio.gather(streaming, return_exceptions=True)
+
+    # then the gap was filled over REST before, and the closed candle replaced the unfinished one
+    cluster = await storage.retrieve_cluster(exchange, market, resolution)
+    cluster_dates = [candle.started_at for candle in cluster]
+    assert [(c.started_at, c.close) for c in closed] == [(now, Decimal("1.5"))]
+    assert cluster_dates[-1] == start_date
+    assert len(cu.detect_missing_dates(cluster_dates, resolution)) == 0
+    assert {c.close for c in cluster if c.started_at == now} == {Decimal("1.5")}
+
+
+@pytest.mark.asyncio
+async def test_stream_clusters_goes_on_when_a_cluster_fails_to_update(
+    store_manager_mock_memory: StoreManager,
+    sqlite_candle_storage_memory: SqliteCandleStorage,
+    dydx_v4_candle_feed_mock: DydxV4CandleFeed,
+    v4_indexer_socket_mock: V4IndexerSocketMock,
+    dydx_v4_fetcher_mock: DydxV4Fetcher,
+    monkeypatch: pytest.MonkeyPatch,
+    capsys: pytest.CaptureFixture[str],
+) -> None:
+    # given two out of date clusters, one of which fails to update
+    manager = store_manager_mock_memory
+    storage = sqlite_candle_storage_memory
+
+    exchange = Exchange.DYDX_V4
+    markets = ["ETH-USD", "BTC-USD"]
+    resolution = ResolutionDetail(Seconds.ONE_MINUTE, "1MIN")
+
+    now = cu.normalized_now(resolution)
+    start_date = cu.subtract_n_resolutions(now, resolution, 30)
+    for market in markets:
+        await storage.store_candles(
+            mock_dydx_v4_candles(market, resolution, 20, start_date)
+        )
+    _fail_market(dydx_v4_fetcher_mock, monkeypatch, "BTC-USD")
+    stored = _record_stored_candles(storage, monkeypatch)
+
+    # when both clusters' current candles close
+    streaming = asyncio.create_task(
+        manager.stream_clusters(
+            [ClusterSpec(market, resolution) for market in markets],
+            dydx_v4_candle_feed_mock,
+        )
+    )
+    await v4_indexer_socket_mock.subscriptions(2)
+    for market in reversed(markets):
+        for started_at in [now, cu.add_one_resolution(now, resolution)]:
+            candle_dict = mock_v4_candle_dict(market, resolution, started_at)
+            await v4_indexer_socket_mock.send_candle(candle_dict)
+    closed = await asyncio.wait_for(stored.get(), 5)
+    streaming.cancel()
+    await asyncio.gather(streaming, return_exceptions=True)
+
+    # then the failure got logged, and only the updated cluster got its closed candle stored
+    out, _ = capsys.readouterr()
+    info = await storage.get_cluster_info(exchange, "BTC-USD", resolution)
+    assert [(c.market, c.started_at) for c in closed] == [("ETH-USD", now)]
+    assert "Updating BTC-USD, 1MIN on DYDX_V4 failed" in out
+    assert info.size == 20
+
+
+@pytest.mark.asyncio
+async def test_stream_clusters_results_in_error(
+    store_manager_mock_memory: StoreManager,
+    sqlite_candle_storage_memory: SqliteCandleStorage,
+    dydx_v4_candle_feed_mock: DydxV4CandleFeed,
+) -> None:
+    # given a spec of a cluster that does not exist
+    manager = store_manager_mock_memory
+    storage = sqlite_candle_storage_memory
+
+    exchange = Exchange.DYDX_V4
+    market = "ETH-USD"
+    resolution = ResolutionDetail(Seconds.ONE_MINUTE, "1MIN")
+
+    # when & then
+    with pytest.raises(MissingClusterException):
+        await manager.stream_clusters(
+            [ClusterSpec(market, resolution)],
+            dydx_v4_candle_feed_mock,
+        )
+    info = await storage.get_cluster_info(exchange, market, resolution)
+    assert not info.newest_candle
+
+
+def _fail_market(
+    api_fetcher: DydxV4Fetcher,
+    monkeypatch: pytest.MonkeyPatch,
+    failing_market: str,
+) -> None:
+    fetch = api_fetcher.fetch
+
+    async def failing_fetch(market: str, *args: Any, **kwargs: Any) -> List[Candle]:
+        if market == failing_market:
+            raise ConnectionError("Connection lost.")
+        return await fetch(market, *args, **kwargs)
+
+    monkeypatch.setattr(api_fetcher, "fetch", failing_fetch)
+
+
+def _track_in_flight(
+    api_fetcher: DydxV4Fetcher,
+    monkeypatch: pytest.MonkeyPatch,
+) -> List[int]:
+    in_flight: List[int] = [0]
+    fetch = api_fetcher.fetch
+
+    async def tracking_fetch(*args: Any, **kwargs: Any) -> List[Candle]:
+        # Requests take a while, as they do over the network
+        in_flight.append(in_flight[-1] + 1)
+        try:
+            await asyncio.sleep(0.01)
+            return await fetch(*args, **kwargs)
+        finally:
+            in_flight.append(in_flight[-1] - 1)
+
+    monkeypatch.setattr(api_fetcher, "fetch", tracking_fetch)
+    return in_flight
+
+
+def _record_horizon_searches(
+    candle_fetcher: DydxCandleFetcher,
+    monkeypatch: pytest.MonkeyPatch,
+) -> List[datetime | None]:
+    hints: List[datetime | None] = []
+    find_horizon = candle_fetcher.find_horizon
+
+    async def recording_find_horizon(
+        market: str,
+        resolution: ResolutionDetail,
+        hint: datetime | None = None,
+    ) -> datetime:
+        hints.append(hint)
+        return await find_horizon(market, resolution, hint)
+
+    monkeypatch.setattr(candle_fetcher, "find_horizon", recording_find_horizon)
+    return hints
+
+
+def _record_fetched_windows(
+    candle_fetcher: DydxCandleFetcher,
+    monkeypatch: pytest.MonkeyPatch,
+    *unavailable: datetime,
+) -> List[Tuple[datetime, datetime]]:
+    # Records the windows fetched via fetch_candles, which lack the candles started at unavailable dates
+    windows: List[Tuple[datetime, datetime]] = []
+    fetch_candles = candle_fetcher.fetch_candles
+
+    async def recording_fetch_candles(
+        market: str,
+        resolution: ResolutionDetail,
+        start_date: datetime,
+        end_date: datetime,
+    ) -> List[Candle]:
+        windows.append((start_date, end_date))
+        candles = await fetch_candles(market, resolution, start_date, end_date)
+        return [c for c in candles if c.started_at not in unavailable]
+
+    monkeypatch.setattr(candle_fetcher, "fetch_candles", recording_fetch_candles)
+    return windows
+
+
+def _record_streamed_ranges(
+    candle_fetcher: DydxCandleFetcher,
+    monkeypatch: pytest.MonkeyPatch,
+) -> List[Tuple[datetime, datetime | None]]:
+    ranges: List[Tuple[datetime, datetime | None]] = []
+    stream_candles = candle_fetcher.stream_candles
+
+    def recording_stream_candles(
+        market: str,
+        resolution: ResolutionDetail,
+        start_date: datetime,
+        end_date: datetime | None = None,
+    ) -> AsyncIterator[List[Candle]]:
+        ranges.append((start_date, end_date))
+        return stream_candles(market, resolution, start_date, end_date)
+
+    monkeypatch.setattr(candle_fetcher, "stream_candles", recording_stream_candles)
+    return ranges
+
+
+def _record_segments(
+    candle_storage: SqliteCandleStorage,
+    monkeypatch: pytest.MonkeyPatch,
+) -> List[Tuple[datetime, datetime]]:
+    segments: List[Tuple[datetime, datetime]] = []
+    retrieve_segment = candle_storage.retrieve_segment
+
+    async def recording_retrieve_segment(
+        exchange: Exchange,
+        market: str,
+        resolution: ResolutionDetail,
+        start_date: datetime,
+        end_date: datetime,
+    ) -> List[Candle]:
+        segments.append((start_date, end_date))
+        return await retrieve_segment(
+            exchange, market, resolution, start_date, end_date
+        )
+
+    monkeypatch.setattr(candle_storage, "retrieve_segment", recording_retrieve_segment)
+    return segments
+
+
+def _record_stored_candles(
+    candle_storage: SqliteCandleStorage,
+    monkeypatch: pytest.MonkeyPatch,
+) -> asyncio.Queue[List[Candle]]:
+    # Hands over the candles of every store_candles call, once they got stored
+    stored: asyncio.Queue[List[Candle]] = asyncio.Queue()
+    store_candles = candle_storage.store_candles
+
+    async def recording_store_candles(
+        candles: List[Candle],
+        on_conflict: OnConflict | None = None,
+    ) -> None:
+        await store_candles(candles, on_conflict)
+        stored.put_nowait(candles)
+
+    monkeypatch.setattr(candle_storage, "store_candles", recording_store_candles)
+    return stored
+
+
+def _closed_buckets(base: List[Candle], resolution: ResolutionDetail) -> List[Candle]:
+    # The buckets of resolution starting at or after the oldest candle of base and ending before its newest one ends
+    start_date = base[-1].started_at
+    end_date = cu.norm_date(
+        cu.add_one_resolution(base[0].started_at, base[0].resolution), resolution
+    )
+    return [
+        c
+        for c in cu.resample(base, resolution)
+        if start_date <= c.started_at < end_date
+    ]
+
+
+def _without_id(candle: Candle) -> Candle:
+    return replace(candle, id=None)
+
+
+def _amount_up_to_head(
+    info: ClusterInfo,
+    start_date: datetime,
+    resolution: ResolutionDetail,
+) -> int:
+    # A new candle may finish while the test runs, so the expected size is derived from the stored head
+    assert info.newest_candle
+    end_date = cu.add_one_resolution(info.newest_candle.started_at, resolution)
+    return cu.amount_of_candles_in_range(start_date, end_date, resolution)
+
+
+def _minutes_after(candle: Candle, date: datetime) -> int:
+    return int((candle.started_at - date).total_seconds() // 60)